@@ -36,6 +36,8 @@ setup(name='feat',
                'bin/feat-couchpy',
                'bin/feat-dbload',
                'bin/feat-locate',
+               'bin/feat-replay',
+               'bin/feat-zygote',
                'bin/feat-service'],
 
       package_data={'': ['src/feat/agencies/net/amqp0-8.xml']},
@@ -450,6 +450,15 @@ class AgencyAgent(log.LogProxy, log.Logger, manhole.Manhole,
         self._store_delayed_call(call_id, call, busy)
         return call_id
 
+    def schedule(self, time_left, method, *args, **kwargs):
+        '''
+        Schedules the call on the timer wheel of the agency, used by
+        the protocols for their timeouts. Unlike call_later() the call is
+        not tracked for the idleness of the agent.
+        @return: L{IDelayedCall}
+        '''
+        return self.agency.call_later(time_left, method, *args, **kwargs)
+
     @replay.named_side_effect('AgencyAgent.cancel_delayed_call')
     def cancel_delayed_call(self, call_id):
         try:
@@ -464,12 +473,17 @@ class AgencyAgent(log.LogProxy, log.Logger, manhole.Manhole,
             self.log('Tried to cancel nonactive call id: %r', call_id)
             return
         call.cancel()
+        self.notify_activity()
 
     #StateMachineMixin
 
     def get_machine_state(self):
         return self._get_machine_state()
 
+    def _set_state(self, state):
+        common.StateMachineMixin._set_state(self, state)
+        self.notify_activity()
+
     ### ITimeProvider Methods ###
 
     @replay.named_side_effect('AgencyAgent.get_time')
@@ -512,6 +526,7 @@ class AgencyAgent(log.LogProxy, log.Logger, manhole.Manhole,
         self.log('Registering protocol guid: %r', protocol.guid)
         assert protocol.guid not in self._protocols
         self._protocols[protocol.guid] = protocol
+        self.notify_activity()
         return protocol
 
     def unregister_protocol(self, protocol):
@@ -522,6 +537,7 @@ class AgencyAgent(log.LogProxy, log.Logger, manhole.Manhole,
                 self._descriptor.doc_id, self._instance_id,
                 protocol.get_agent_side(), protocol.snapshot())
             del self._protocols[protocol.guid]
+            self.notify_activity()
         else:
             self.error('Tried to unregister protocol with guid: %r, '
                         'but not found!', protocol.guid)
@@ -699,6 +715,13 @@ class AgencyAgent(log.LogProxy, log.Logger, manhole.Manhole,
     def has_all_long_running_protocols_idle(self):
         return all(i.is_idle() for i in self._long_running_protocols)
 
+    def notify_activity(self):
+        '''
+        Tells the agency something changed which might have changed
+        if the agent is idle.
+        '''
+        self.agency.notify_activity(self)
+
     @manhole.expose()
     def show_activity(self):
         if self.is_idle():
@@ -758,10 +781,15 @@ class AgencyAgent(log.LogProxy, log.Logger, manhole.Manhole,
         medium = medium_factory(self, *args, **kwargs)
         if ILongRunningProtocol.providedBy(medium):
             self._long_running_protocols.append(medium)
-            cb = lambda _: self._long_running_protocols.remove(medium)
-            medium.notify_finish().addBoth(cb)
+            self.notify_activity()
+            medium.notify_finish().addBoth(self._long_running_finished,
+                                           medium)
         return medium.initiate()
 
+    def _long_running_finished(self, _, medium):
+        self._long_running_protocols.remove(medium)
+        self.notify_activity()
+
     def _subscribe_for_descriptor_changes(self):
         return self._database.changes_listener(
             (self._descriptor.doc_id, ), self._descriptor_changed)
@@ -990,6 +1018,8 @@ class AgencyAgent(log.LogProxy, log.Logger, manhole.Manhole,
         if call.active():
             self.log('Storing delayed call with id %r', call_id)
             self._delayed_calls.set(call_id, (busy, call), call.getTime() + 1)
+            if busy:
+                self.notify_activity()
 
     def _cancel_all_delayed_calls(self):
         for call_id, (_busy, call) in self._delayed_calls.iteritems():
@@ -1012,6 +1042,8 @@ class AgencyAgent(log.LogProxy, log.Logger, manhole.Manhole,
         d = defer.maybeDeferred(method, *args, **kwargs)
         d.addCallback(raise_on_fiber)
         d.addErrback(self._error_handler)
+        # the delayed call is not active anymore
+        self.notify_activity()
         return d
 
     def _release_channels(self):
@@ -1037,6 +1069,9 @@ class Agency(log.LogProxy, log.Logger, manhole.Manhole,
 
     agency_agent_factory = AgencyAgent
 
+    # resolution of the timer wheel shared by the agents in seconds
+    timer_granularity = time.DEFAULT_GRANULARITY
+
     _error_handler = error_handler
 
     def __init__(self):
@@ -1058,6 +1093,8 @@ class Agency(log.LogProxy, log.Logger, manhole.Manhole,
 
         self._backends = {} # {CHANNEL_TYPE: IBackend}
 
+        self._timer_wheel = time.TimerWheel(self.timer_granularity)
+
         self._agency_id = str(uuid.uuid1())
         self.log_name = self._agency_id
 
@@ -1141,6 +1178,7 @@ class Agency(log.LogProxy, log.Logger, manhole.Manhole,
         '''Called when the agency is ordered to shutdown all the agents..'''
         d = defer.DeferredList([x._terminate() for x in self._agents])
         d.addBoth(self._disconnect_backends)
+        d.addBoth(defer.drop_param, self._timer_wheel.stop)
         d.addBoth(defer.override_result, self)
         return d
 
@@ -1152,16 +1190,35 @@ class Agency(log.LogProxy, log.Logger, manhole.Manhole,
         '''Called when the agency process is terminating. (SIGTERM)'''
         d = defer.DeferredList([x.on_killed() for x in self._agents])
         d.addBoth(self._disconnect_backends)
+        d.addBoth(defer.drop_param, self._timer_wheel.stop)
         d.addCallback(defer.override_result, self)
         return d
 
     def register_agent(self, medium):
         self._agents.append(medium)
 
+    def notify_activity(self, medium):
+        '''
+        Called by the agents when something changed which might have
+        changed if they are idle. Used by the simulation to avoid polling.
+        '''
+
+    def call_later(self, _seconds, _method, *args, **kwargs):
+        '''
+        Schedules the call on the timer wheel shared by all the agents,
+        used for the timeouts and the periodic calls of the protocols.
+        @return: L{IDelayedCall}
+        '''
+        return self._timer_wheel.call_later(_seconds, _method,
+                                            *args, **kwargs)
+
     def unregister_agent(self, medium):
         agent_id = medium.get_descriptor().doc_id
         self.debug('Unregistering agent id: %r', agent_id)
         self._agents.remove(medium)
+        if not self._agents:
+            # the protocols of the terminated agents are gone with them
+            self._timer_wheel.stop()
 
         # FIXME: This shouldn't be necessary! Here we are manually getting
         # rid of things which should just be garbage collected (self.registry
@@ -38,8 +38,8 @@ from twisted.internet import reactor
 
 
 def check_options(opts, args):
-    if opts.hostdef and (opts.hostres or opts.hostcat):
-        raise OptionError("Host resources or categories cannot be "
+    if opts.hostdef and (opts.hostres or opts.hostcat or opts.hostplacement):
+        raise OptionError("Host resources, categories or placement cannot be "
                           "specified when specifyin"
                           "a host definition document.")
 
@@ -82,6 +82,13 @@ def check_category(catdef):
     raise OptionError("Invalid host category: %s" % catdef)
 
 
+def check_placement(placement):
+    value = placement.lower()
+    if value in host.Placement.values():
+        return host.Placement.get(value)
+    raise OptionError("Invalid host placement: %s" % placement)
+
+
 def bootstrap(parser=None, args=None, descriptors=None):
     """Bootstrap a feat process, handling command line arguments.
     @param parser: the option parser to use; more options will be
@@ -120,7 +127,8 @@ def bootstrap(parser=None, args=None, descriptors=None):
 
             hostdef = opts.hostdef
 
-            if opts.hostres or opts.hostcat or opts.hostports:
+            if (opts.hostres or opts.hostcat or opts.hostports
+                or opts.hostplacement):
                 hostdef = host.HostDef()
                 for resdef in opts.hostres:
                     parts = resdef.split(":", 1)
@@ -144,6 +152,9 @@ def bootstrap(parser=None, args=None, descriptors=None):
                     group, start, stop = tuple(ports.split(":"))
                     hostdef.ports_ranges[group] = (int(start), int(stop))
 
+                if opts.hostplacement:
+                    hostdef.placement = check_placement(opts.hostplacement)
+
             agency.set_host_def(hostdef)
 
             d = agency.initiate()
@@ -153,9 +164,11 @@ def bootstrap(parser=None, args=None, descriptors=None):
         else:
             # standalone specific
             kwargs = opts.standalone_kwargs or dict()
+            # the descriptor is given when forked by the zygote
+            to_spawn = descriptors[0] if descriptors else opts.agents[0]
             d = agency.initiate()
             d.addCallback(defer.drop_param, agency.spawn_agent,
-                          opts.agents[0], **kwargs)
+                          to_spawn, **kwargs)
         return d
 
 
@@ -55,14 +55,85 @@ class StateAssertationError(RuntimeError):
     pass
 
 
+class EventTable(object):
+    '''
+    Transition table compiled from the event mapping of a state machine.
+
+    The mapping is a dictionary of event class -> decision, or a list of
+    decisions if the event should be handled differently depending on the
+    state. Decision is a dictionary with the keys:
+      - state_before: state or list of states the event is accepted in,
+      - state_after: state to switch to before calling the method,
+      - method: method to call with the event, either a callable or the
+                name of the method of the state machine.
+    '''
+
+    def __init__(self, mapping):
+        # (event class, state) -> decision
+        self._transitions = dict()
+        # (event class, state) -> number of handlers, for ambiguous ones
+        self._ambiguous = dict()
+        # event class -> decision or None if it was given as a list
+        self._decisions = dict()
+
+        for klass, decisions in mapping.iteritems():
+            if isinstance(decisions, list):
+                self._decisions[klass] = None
+            else:
+                self._decisions[klass] = decisions
+                decisions = [decisions]
+
+            for decision in decisions:
+                states = decision['state_before']
+                if not isinstance(states, (list, tuple, )):
+                    states = [states]
+                for state in states:
+                    key = (klass, state)
+                    if key in self._transitions:
+                        self._ambiguous[key] = \
+                            self._ambiguous.get(key, 1) + 1
+                    self._transitions[key] = decision
+
+    def get(self, klass, state):
+        '''
+        Returns the decision for the event class in the given state
+        or None if there is no single one.
+        '''
+        key = (klass, state)
+        if key in self._ambiguous:
+            return None
+        return self._transitions.get(key)
+
+    def knows(self, klass):
+        return klass in self._decisions
+
+    def get_single(self, klass):
+        '''
+        Returns the decision for the event class if it is not state dependent.
+        '''
+        return self._decisions.get(klass)
+
+    def count(self, klass, state):
+        key = (klass, state)
+        if key in self._ambiguous:
+            return self._ambiguous[key]
+        return 1 if key in self._transitions else 0
+
+
 class StateMachineMixin(object):
     '''
     Mixin used by numerous objects. Defines the state and provides utilities
     for making decisions based on state.
+
+    Classes reacting to events define the class attribute _event_mapping
+    (see L{EventTable} for its format) and pass the events to
+    L{_dispatch_event}. The mapping is compiled only once per class.
     '''
 
     _notifier = None
 
+    _event_mapping = None
+
     def __init__(self, state=None):
         self.state = state
         self._notifier = defer.Notifier()
@@ -71,10 +142,8 @@ class StateMachineMixin(object):
     def wait_for_state(self, *states):
         if self.state in states:
             return defer.succeed(self)
-        d = defer.DeferredList(
-            map(lambda state: self._notifier.wait(state), states),
-            fireOnOneCallback=True)
-        d.addCallback(lambda _: self)
+        d = self._notifier.wait_any(*states)
+        d.addCallback(defer.override_result, self)
         return d
 
     def _set_state(self, state):
@@ -85,10 +154,18 @@ class StateMachineMixin(object):
         if self._notifier:
             self._notifier.callback(state, self)
 
+    def _cleanup_notifier(self):
+        '''
+        Forgets the callers waiting for states which will never be reached.
+        Called once the state machine has terminated.
+        '''
+        if self._notifier:
+            self._notifier.clear()
+
     def _cmp_state(self, states):
-        if not isinstance(states, (list, tuple, )):
-            states = [states]
-        return self.state in states
+        if isinstance(states, (list, tuple, )):
+            return self.state in states
+        return self.state == states
 
     def _ensure_state(self, states):
         if self._cmp_state(states):
@@ -99,38 +176,57 @@ class StateMachineMixin(object):
     def _get_machine_state(self):
         return self.state
 
+    def _dispatch_event(self, event):
+        '''
+        Handles the event using the class level _event_mapping.
+        '''
+        cls = type(self)
+        table = cls.__dict__.get('_event_table')
+        if table is None:
+            table = EventTable(cls._event_mapping)
+            cls._event_table = table
+        return self._handle_event(table, event)
+
     def _event_handler(self, mapping, event):
+        '''
+        Handles the event using the mapping given. Prefer defining
+        _event_mapping and calling L{_dispatch_event}, which doesn't need
+        to compile the mapping on every call.
+        '''
+        return self._handle_event(EventTable(mapping), event)
+
+    def _handle_event(self, table, event):
+        klass = event.__class__
+        decision = table.get(klass, self.state)
+        if decision is None:
+            return self._invalid_event(table, event)
+
+        self._set_state(decision['state_after'])
+
+        method = decision['method']
+        if isinstance(method, str):
+            method = getattr(self, method)
+        self._call(method, event)
+
+    def _invalid_event(self, table, event):
         klass = event.__class__
-        decision = mapping.get(klass, None)
-        if not decision:
+        if not table.knows(klass):
             self.warning("Unknown event received %r. Ignoring", event)
             return False
 
-        if isinstance(decision, list):
-            match = filter(
-                lambda x: self._cmp_state(x['state_before']), decision)
-            if len(match) != 1:
-                self.warning("Expected to find excatly one handler for %r in "
-                             "state %r, found %r handlers", event,
-                             self._get_machine_state(),
-                             len(match))
-                return False
-            decision = match[0]
-
-        state_before = decision['state_before']
-        try:
-            self._ensure_state(state_before)
-        except StateAssertationError:
-            self.warning("Received event: %r in state: %r, expected state "
-                         "for this method is: %r",
-                         klass, self._get_machine_state(),
-                         decision['state_before'])
+        decision = table.get_single(klass)
+        if decision is None:
+            self.warning("Expected to find excatly one handler for %r in "
+                         "state %r, found %r handlers", event,
+                         self._get_machine_state(),
+                         table.count(klass, self.state))
             return False
 
-        state_after = decision['state_after']
-        self._set_state(state_after)
-
-        self._call(decision['method'], event)
+        self.warning("Received event: %r in state: %r, expected state "
+                     "for this method is: %r",
+                     klass, self._get_machine_state(),
+                     decision['state_before'])
+        return False
 
     # Make it possible to use mixin without the logging submodule
 
@@ -309,7 +405,7 @@ class ExpirationCallsMixin(object):
             d.addCallback(callback.callback)
 
         result = defer.Deferred()
-        self._expiration_call = time.callLater(
+        self._expiration_call = self.agent.schedule(
             time_left, to_call, result)
         return result
 
@@ -362,6 +458,8 @@ class TransientInitiatorMediumBase(InitiatorMediumBase):
         else:
             self.log("Firing callback of notifier with result: %r.", result)
             self.call_next(self._fnotifier.callback, 'finish', result)
+        if isinstance(self, StateMachineMixin):
+            self.call_next(self._cleanup_notifier)
 
 
 class InterestedMediumBase(object):
@@ -377,6 +475,8 @@ class TransientInterestedMediumBase(InterestedMediumBase):
 
     def _terminate(self, result):
         self.call_next(self._fnotifier.callback, 'finish', result)
+        if isinstance(self, StateMachineMixin):
+            self.call_next(self._cleanup_notifier)
 
     @serialization.freeze_tag('IAgencyProtocol.notify_finish')
     def notify_finish(self):
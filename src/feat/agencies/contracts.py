@@ -27,7 +27,7 @@ from twisted.python import components, failure
 from zope.interface import implements
 
 from feat.agents.base import message, recipient, replay
-from feat.common import log, enum, time, serialization, defer
+from feat.common import log, enum, time, serialization, defer, container
 from feat.agencies import common, protocols
 
 from feat.agencies.interface import *
@@ -60,6 +60,29 @@ class ManagerContractor(common.StateMachineMixin, log.Logger):
     Represents the contractor from the point of view of the manager
     '''
 
+    _event_mapping = {
+        message.Rejection:\
+            {'method': '_send_message',
+             'state_before': ContractorState.bid,
+             'state_after': ContractorState.rejected},
+        message.Grant:\
+            {'method': '_send_message',
+             'state_before': ContractorState.bid,
+             'state_after': ContractorState.granted},
+        message.Cancellation:\
+            {'method': '_send_message',
+             'state_before': [ContractorState.granted,
+                              ContractorState.completed],
+             'state_after': ContractorState.cancelled},
+        message.Acknowledgement:\
+            {'method': '_send_message',
+             'state_before': ContractorState.completed,
+             'state_after': ContractorState.acknowledged},
+        message.FinalReport:\
+            {'method': '_on_report',
+             'state_before': ContractorState.granted,
+             'state_after': ContractorState.completed}}
+
     def __init__(self, manager, bid, state=None):
         log.Logger.__init__(self, manager)
         common.StateMachineMixin.__init__(self)
@@ -75,6 +98,12 @@ class ManagerContractor(common.StateMachineMixin, log.Logger):
 
     ### Private Methods ###
 
+    def _set_state(self, state):
+        old_state = self.state
+        common.StateMachineMixin._set_state(self, state)
+        if old_state != self.state and hasattr(self, 'manager'):
+            self.manager.contractors.state_changed(self, old_state)
+
     def _send_message(self, msg):
         self.log('Sending message: %r to contractor: %r',
                  msg, self.recipient.key)
@@ -90,39 +119,48 @@ class ManagerContractor(common.StateMachineMixin, log.Logger):
         self.report = report
 
     def on_event(self, msg):
-        mapping = {
-            message.Rejection:\
-                {'method': self._send_message,
-                 'state_before': ContractorState.bid,
-                 'state_after': ContractorState.rejected},
-            message.Grant:\
-                {'method': self._send_message,
-                 'state_before': ContractorState.bid,
-                 'state_after': ContractorState.granted},
-            message.Cancellation:\
-                {'method': self._send_message,
-                 'state_before': [ContractorState.granted,
-                                  ContractorState.completed],
-                 'state_after': ContractorState.cancelled},
-            message.Acknowledgement:\
-                {'method': self._send_message,
-                 'state_before': ContractorState.completed,
-                 'state_after': ContractorState.acknowledged},
-            message.FinalReport:\
-                {'method': self._on_report,
-                 'state_before': ContractorState.granted,
-                 'state_after': ContractorState.completed}}
-        self._event_handler(mapping, msg)
+        self._dispatch_event(msg)
 
 
 class ManagerContractors(dict):
+    '''
+    Dictionary of bid -> ManagerContractor. Contractors are additionally
+    indexed by the key of the reply_to field of their bids and grouped by
+    their state, so that matching incoming messages and querying for
+    contractors in given state does not require scanning all of them.
+    '''
+
+    def __init__(self):
+        dict.__init__(self)
+        # reply_to.key -> [bid]
+        self._by_key = dict()
+        # ContractorState -> OrderedDict(bid -> ManagerContractor)
+        self._by_state = dict()
+
+    def __setitem__(self, bid, contractor):
+        if bid in self:
+            self._remove_indexes(bid, self[bid])
+        dict.__setitem__(self, bid, contractor)
+        self._by_key.setdefault(bid.reply_to.key, []).append(bid)
+        self._group(contractor.state)[bid] = contractor
+
+    def __delitem__(self, bid):
+        self._remove_indexes(bid, self[bid])
+        dict.__delitem__(self, bid)
 
     def with_state(self, *states):
-        return filter(lambda x: x.state in states, self.values())
+        result = []
+        for state in states:
+            group = self._by_state.get(state)
+            if group:
+                result.extend(group.itervalues())
+        return result
+
+    def count_state(self, *states):
+        return sum(len(self._by_state.get(state, ())) for state in states)
 
     def by_message(self, msg):
-        key = msg.reply_to.key
-        match = filter(lambda x: x.reply_to.key == key, self.keys())
+        match = self._by_key.get(msg.reply_to.key, ())
         if len(match) != 1:
             raise ValueError("Could not find ManagerContractor for msg: %r",
                              msg)
@@ -131,6 +169,32 @@ class ManagerContractors(dict):
     def get_bids(self):
         return self.with_state(ContractorState.bid)
 
+    def state_changed(self, contractor, old_state):
+        group = self._by_state.get(old_state)
+        if group is None or contractor.bid not in group:
+            # not registered yet
+            return
+        del group[contractor.bid]
+        self._group(contractor.state)[contractor.bid] = contractor
+
+    ### Private Methods ###
+
+    def _group(self, state):
+        group = self._by_state.get(state)
+        if group is None:
+            group = self._by_state[state] = container.OrderedDict()
+        return group
+
+    def _remove_indexes(self, bid, contractor):
+        bids = self._by_key.get(bid.reply_to.key)
+        if bids is not None:
+            bids.remove(bid)
+            if not bids:
+                del self._by_key[bid.reply_to.key]
+        group = self._by_state.get(contractor.state)
+        if group is not None:
+            group.pop(bid, None)
+
 
 class AgencyManager(log.LogProxy, log.Logger, common.StateMachineMixin,
                     common.ExpirationCallsMixin, common.AgencyMiddleMixin,
@@ -143,6 +207,29 @@ class AgencyManager(log.LogProxy, log.Logger, common.StateMachineMixin,
 
     error_state = ContractState.wtf
 
+    _event_mapping = {
+        message.Bid:\
+            {'method': '_on_bid',
+             'state_after': ContractState.announced,
+             'state_before': ContractState.announced},
+        message.Refusal:\
+            {'method': '_on_refusal',
+             'state_after': ContractState.announced,
+             'state_before': ContractState.announced},
+        message.Duplicate:\
+            {'method': '_on_refusal',
+             'state_after': ContractState.announced,
+             'state_before': ContractState.announced},
+        message.FinalReport:\
+            {'method': '_on_report',
+             'state_after': ContractState.granted,
+             'state_before': ContractState.granted},
+        message.Cancellation:\
+            {'method': '_on_cancel',
+             'state_before': ContractState.granted,
+             'state_after': ContractState.cancelled},
+    }
+
     def __init__(self, agency_agent, factory, recipients, *args, **kwargs):
         log.Logger.__init__(self, agency_agent)
         log.LogProxy.__init__(self, agency_agent)
@@ -306,29 +393,7 @@ class AgencyManager(log.LogProxy, log.Logger, common.StateMachineMixin,
     ### IAgencyListenerInternal Methods ###
 
     def on_message(self, msg):
-        mapping = {
-            message.Bid:\
-                {'method': self._on_bid,
-                 'state_after': ContractState.announced,
-                 'state_before': ContractState.announced},
-            message.Refusal:\
-                {'method': self._on_refusal,
-                 'state_after': ContractState.announced,
-                 'state_before': ContractState.announced},
-            message.Duplicate:\
-                {'method': self._on_refusal,
-                 'state_after': ContractState.announced,
-                 'state_before': ContractState.announced},
-            message.FinalReport:\
-                {'method': self._on_report,
-                 'state_after': ContractState.granted,
-                 'state_before': ContractState.granted},
-            message.Cancellation:\
-                {'method': self._on_cancel,
-                 'state_before': ContractState.granted,
-                 'state_after': ContractState.cancelled},
-        }
-        self._event_handler(mapping, msg)
+        self._dispatch_event(msg)
 
     ### ISerializable Methods ###
 
@@ -370,7 +435,7 @@ class AgencyManager(log.LogProxy, log.Logger, common.StateMachineMixin,
             return False
 
         contractor.on_event(report)
-        if len(self.contractors.with_state(ContractorState.granted)) == 0:
+        if self.contractors.count_state(ContractorState.granted) == 0:
             self._on_complete()
 
     def _on_cancel(self, cancellation):
@@ -420,7 +485,7 @@ class AgencyManager(log.LogProxy, log.Logger, common.StateMachineMixin,
             self._goto_closed_or_expired()
 
     def _goto_closed_or_expired(self):
-        if len(self.contractors.with_state(ContractorState.bid)) > 0:
+        if self.contractors.count_state(ContractorState.bid) > 0:
             self._close_announce_period()
         else:
             self._set_state(ContractState.expired)
@@ -474,6 +539,32 @@ class AgencyContractor(log.LogProxy, log.Logger, common.StateMachineMixin,
 
     error_state = ContractState.wtf
 
+    _event_mapping = {
+        message.Announcement:\
+            {'method': '_on_announce',
+             'state_before': ContractState.initiated,
+             'state_after': ContractState.announced},
+        message.Rejection:\
+            {'method': '_on_reject',
+             'state_after': ContractState.rejected,
+             'state_before': ContractState.bid},
+        message.Grant:\
+            {'method': '_on_grant',
+             'state_after': ContractState.granted,
+             'state_before': ContractState.bid},
+        message.Cancellation:\
+            [{'method': '_on_cancel_in_granted',
+             'state_after': ContractState.cancelled,
+             'state_before': ContractState.granted},
+             {'method': '_on_cancel_in_completed',
+             'state_after': ContractState.aborted,
+             'state_before': ContractState.completed}],
+        message.Acknowledgement:\
+            {'method': '_on_ack',
+             'state_after': ContractState.acknowledged,
+             'state_before': ContractState.completed},
+    }
+
     def __init__(self, agency_agent, factory, announcement, *args, **kwargs):
         log.Logger.__init__(self, agency_agent)
         log.LogProxy.__init__(self, agency_agent)
@@ -608,32 +699,7 @@ class AgencyContractor(log.LogProxy, log.Logger, common.StateMachineMixin,
     ### IAgencyListenerInternal Methods ###
 
     def on_message(self, msg):
-        mapping = {
-            message.Announcement:\
-                {'method': self._on_announce,
-                 'state_before': ContractState.initiated,
-                 'state_after': ContractState.announced},
-            message.Rejection:\
-                {'method': self._on_reject,
-                 'state_after': ContractState.rejected,
-                 'state_before': ContractState.bid},
-            message.Grant:\
-                {'method': self._on_grant,
-                 'state_after': ContractState.granted,
-                 'state_before': ContractState.bid},
-            message.Cancellation:\
-                [{'method': self._on_cancel_in_granted,
-                 'state_after': ContractState.cancelled,
-                 'state_before': ContractState.granted},
-                 {'method': self._on_cancel_in_completed,
-                 'state_after': ContractState.aborted,
-                 'state_before': ContractState.completed}],
-            message.Acknowledgement:\
-                {'method': self._on_ack,
-                 'state_after': ContractState.acknowledged,
-                 'state_before': ContractState.completed},
-        }
-        self._event_handler(mapping, msg)
+        self._dispatch_event(msg)
 
     ### ISerializable Methods ###
 
@@ -672,7 +738,7 @@ class AgencyContractor(log.LogProxy, log.Logger, common.StateMachineMixin,
             bind()
 
         def bind():
-            self._reporter_call = time.callLater(frequency, send_report)
+            self._reporter_call = self.agent.schedule(frequency, send_report)
 
         bind()
 
@@ -83,7 +83,7 @@ class Connection(log.Logger):
     def __init__(self, database):
         log.Logger.__init__(self, database)
         self.database = IDatabaseDriver(database)
-        self.serializer = json.Serializer()
+        self.serializer = json.Serializer(compact=True)
         self.unserializer = json.PaisleyUnserializer()
 
         self.listener_id = None
@@ -25,7 +25,7 @@ import functools
 import warnings
 
 from zope.interface import implements
-from feat.common import log, defer
+from feat.common import log, defer, container
 from feat.agencies.messaging import Connection, Queue
 from feat.agencies.interface import IConnectionFactory
 from feat.agencies import common
@@ -52,6 +52,8 @@ class Messaging(common.ConnectionManager, log.Logger, log.FluLogKeeper,
         self._queues = {}
         # name -> exchange
         self._exchanges = {}
+        # callables called when a queue becomes idle
+        self._idle_listeners = []
         self._on_connected()
 
     ### IConnectionFactory ###
@@ -67,6 +69,12 @@ class Messaging(common.ConnectionManager, log.Logger, log.FluLogKeeper,
     def is_idle(self):
         return all(q.is_idle() for q in self._queues.itervalues())
 
+    def add_idle_listener(self, callback):
+        self._idle_listeners.append(callback)
+
+    def remove_idle_listener(self, callback):
+        self._idle_listeners.remove(callback)
+
     # is_disconnected() from common.ConnectionManager
 
     # wait_connected() from common.ConnectionManager
@@ -102,8 +110,9 @@ class Messaging(common.ConnectionManager, log.Logger, log.FluLogKeeper,
         queue = self._get_queue(name)
         if not queue:
             self.increase_stat('queues created')
-            queue = Queue(name, on_deliver=functools.partial(
-                self.increase_stat, 'messages delivered'))
+            queue = Queue(name, on_idle=self._queue_idle,
+                          on_deliver=functools.partial(
+                              self.increase_stat, 'messages delivered'))
 
             self._queues[name] = queue
             self.log("Defining queue: %r" % name)
@@ -131,6 +140,10 @@ class Messaging(common.ConnectionManager, log.Logger, log.FluLogKeeper,
 
     ### private ###
 
+    def _queue_idle(self):
+        for callback in list(self._idle_listeners):
+            callback()
+
     def _get_exchange(self, name):
         return self._exchanges.get(name, None)
 
@@ -142,26 +155,28 @@ class Exchange(object):
 
     def __init__(self, name):
         self.name = name
-        # key -> [ list of queues ]
+        # key -> OrderedDict(queue -> None), so that binding and unbinding
+        # does not depend on the number of queues bound with the key
         self._bindings = {}
 
     def _bind(self, key, queue):
         assert isinstance(queue, Queue)
 
-        list_for_key = self._bindings.get(key, [])
-        if not queue in list_for_key:
-            list_for_key.append(queue)
-        self._bindings[key] = list_for_key
+        queues = self._bindings.get(key)
+        if queues is None:
+            queues = self._bindings[key] = container.OrderedDict()
+        queues[queue] = None
 
     def _unbind(self, key, queue):
-        list_for_key = self._bindings.get(key, [])
-        if queue in list_for_key:
-            list_for_key.remove(queue)
-            if len(list_for_key) == 0:
+        queues = self._bindings.get(key)
+        if queues is not None and queue in queues:
+            del queues[queue]
+            if len(queues) == 0:
                 del(self._bindings[key])
 
     def publish(self, message, key):
         assert message is not None
-        list_for_key = self._bindings.get(key, [])
-        for queue in list_for_key:
-            queue.enqueue(message)
+        queues = self._bindings.get(key)
+        if queues:
+            for queue in queues.keys():
+                queue.enqueue(message)
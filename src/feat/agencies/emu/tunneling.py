@@ -132,10 +132,17 @@ class Bridge(object):
     def __init__(self):
         self._backends = {} # {TUNNEL_ROUTE: Backend}
         self._pending_calls = 0
+        self._idle_listeners = [] # callables called when becoming idle
 
     def is_idle(self):
         return self._pending_calls == 0
 
+    def add_idle_listener(self, callback):
+        self._idle_listeners.append(callback)
+
+    def remove_idle_listener(self, callback):
+        self._idle_listeners.remove(callback)
+
     def add_backend(self, backend):
         assert backend.route not in self._backends, "Backend already added"
         self._backends[backend.route] = backend
@@ -173,3 +180,6 @@ class Bridge(object):
         if target_backend.route in self._backends:
             if self._backends[target_backend.route] is target_backend:
                 target_backend._dispatch(recip, message)
+        if self._pending_calls == 0:
+            for callback in list(self._idle_listeners):
+                callback()
@@ -21,6 +21,7 @@
 # Headers in this file shall remain intact.
 # -*- Mode: Python -*-
 # vi:si:et:sw=4:sts=4:ts=4
+import os
 import sqlite3
 import operator
 import types
@@ -30,6 +31,7 @@ from twisted.enterprise import adbapi
 from twisted.spread import pb
 from twisted.internet import reactor
 from twisted.python import log as twisted_log
+from twisted.python.failure import Failure
 
 from feat.common import (log, text_helper, error_handler, defer,
                          formatable, enum, decorator, time, manhole,
@@ -53,6 +55,147 @@ class State(enum.Enum):
     (disconnected, connected, ) = range(2)
 
 
+DEFAULT_KEEP_ROTATED = 5
+
+# created with the schema and added to journals lacking them when opened
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS snapshot_idx "
+    "ON entries(history_id, function_id)",
+    "CREATE INDEX IF NOT EXISTS logs_timestamp_idx ON logs(timestamp)",
+    "CREATE INDEX IF NOT EXISTS logs_category_timestamp_idx "
+    "ON logs(category, timestamp)",
+    "CREATE INDEX IF NOT EXISTS logs_name_timestamp_idx "
+    "ON logs(category, log_name, timestamp)"]
+
+# dropped from journals when opened, superseded by the INDEXES
+OBSOLETE_INDEXES = [
+    "DROP INDEX IF EXISTS logs_category_idx"]
+
+# number of log entries returned by a single page
+DEFAULT_LOG_PAGE = 1000
+
+
+def entries_query(history_id, start_date=0, limit=None, from_snapshot=False):
+    '''
+    Gives the SQL command and its parameters selecting the journal entries
+    of the given history in the order they were recorded.
+    '''
+    command = text_helper.format_block("""
+    SELECT histories.agent_id,
+           histories.instance_id,
+           entries.journal_id,
+           entries.function_id,
+           entries.fiber_id,
+           entries.fiber_depth,
+           entries.args,
+           entries.kwargs,
+           entries.side_effects,
+           entries.result,
+           entries.timestamp
+      FROM entries
+      LEFT JOIN histories ON histories.id = entries.history_id
+      WHERE entries.history_id = ?""")
+    params = (history_id, )
+    if from_snapshot:
+        # seeks through the snapshot_idx, the function_id of the agency
+        # entries never clashes with the canonical names of the methods
+        command += (" AND entries.rowid >= COALESCE("
+                    "(SELECT MAX(rowid) FROM entries"
+                    " WHERE history_id = ? AND function_id = 'snapshot'), 0)")
+        params += (history_id, )
+    if start_date:
+        command += " AND entries.timestamp >= ?"
+        params += (int(start_date), )
+    command += " ORDER BY entries.rowid ASC"
+    if limit:
+        command += " LIMIT ?"
+        params += (int(limit), )
+    return command, params
+
+
+def logs_condition(start_date=None, end_date=None, filters=list()):
+    '''
+    Gives the WHERE clause and its parameters selecting the log entries
+    matching the time range and the filters, see
+    L{SqliteWriter.get_log_entries}.
+    '''
+    conditions = []
+    params = ()
+    if start_date is not None:
+        conditions.append("logs.timestamp >= ?")
+        params += (int(start_date), )
+    if end_date is not None:
+        conditions.append("logs.timestamp <= ?")
+        params += (int(end_date), )
+
+    alternatives = []
+    for filter in filters:
+        level = filter.get('level', None)
+        if level is None:
+            raise AttributeError("level is mandatory parameter.")
+        alternative = ["logs.level <= ?"]
+        params += (int(level), )
+        for key, column in (('category', 'category'), ('name', 'log_name')):
+            value = filter.get(key, None)
+            if value is not None:
+                alternative.append("logs.%s = ?" % (column, ))
+                params += (value, )
+        alternatives.append("(%s)" % (" AND ".join(alternative), ))
+    if alternatives:
+        conditions.append("(%s)" % (" OR ".join(alternatives), ))
+
+    if not conditions:
+        return "1", params
+    return " AND ".join(conditions), params
+
+
+def logs_query(start_date=None, end_date=None, filters=list(),
+               after=None, limit=None):
+    '''
+    Gives the SQL command and its parameters selecting the log entries
+    ordered by their timestamp and rowid. The rowid is selected as the last
+    column, the pair of them is the cursor the entries following
+    a page are selected with.
+    @param after: (timestamp, rowid) of the last entry of the previous page
+    '''
+    condition, params = logs_condition(start_date, end_date, filters)
+    command = text_helper.format_block("""
+    SELECT logs.message,
+           logs.level,
+           logs.category,
+           logs.log_name,
+           logs.file_path,
+           logs.line_num,
+           logs.timestamp,
+           logs.rowid
+      FROM logs
+      WHERE """) + condition
+    if after is not None:
+        timestamp, rowid = after
+        command += (" AND (logs.timestamp > ?"
+                    " OR (logs.timestamp = ? AND logs.rowid > ?))")
+        params += (timestamp, timestamp, rowid)
+    command += " ORDER BY logs.timestamp ASC, logs.rowid ASC"
+    if limit is not None:
+        command += " LIMIT ?"
+        params += (int(limit), )
+    return command, params
+
+
+def decode_row(row, encoding=None):
+    '''
+    Takes the row returned by sqlite. Returns it in readable format.
+    '''
+    row = list(row)
+    for index, value in enumerate(row):
+        if isinstance(value, types.BufferType):
+            value = str(value)
+            if encoding:
+                value = value.decode(encoding)
+            row[index] = value
+    return row
+
+
 class EntriesCache(object):
     '''
     Helper class storing the data and giving the back in transactional way.
@@ -173,8 +316,8 @@ class Journaler(log.Logger, common.StateMachineMixin):
         return self._writer.get_histories()
 
     @in_state(State.connected)
-    def get_entries(self, history):
-        return self._writer.get_entries(history)
+    def get_entries(self, history, from_snapshot=False):
+        return self._writer.get_entries(history, from_snapshot=from_snapshot)
 
     def insert_entry(self, **data):
         self._cache.append(data)
@@ -214,7 +357,7 @@ class Journaler(log.Logger, common.StateMachineMixin):
         level = int(level)
         if category is None:
             category = 'feat'
-        if level > flulog.getCategoryLevel(category):
+        if not log.is_enabled(category, level):
             return
 
         if file_path is None and line_num is None:
@@ -239,6 +382,9 @@ class Journaler(log.Logger, common.StateMachineMixin):
             flulog.doLog(level, object, category, format, args,
                          where=depth, filePath=file_path, line=line_num)
 
+    def is_enabled(self, category, level):
+        return log.is_enabled(category, level)
+
     ### private ###
 
     def _schedule_flush(self):
@@ -315,8 +461,9 @@ class BrokerProxyWriter(log.Logger, common.StateMachineMixin):
         return self._writer.callRemote('get_histories')
 
     @in_state(State.connected)
-    def get_entries(self, history):
-        return self._writer.callRemote('get_entries', history)
+    def get_entries(self, history, from_snapshot=False):
+        return self._writer.callRemote('get_entries', history,
+                                       from_snapshot=from_snapshot)
 
     def insert_entries(self, entries):
         for data in entries:
@@ -374,12 +521,18 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
     _error_handler = error_handler
 
     def __init__(self, logger, filename=":memory:", encoding=None,
-                 on_rotate=None):
+                 on_rotate=None, max_size=None, max_age=None,
+                 keep_rotated=DEFAULT_KEEP_ROTATED):
         '''
         @param encoding: Optional encoding to be used for blob fields.
         @type encoding: Should be a valid parameter for str.encode() method.
         @param filename: File to use for entries. Defaults to :memory:
         @param logger: ILogger to use
+        @param on_rotate: Callable called after the journal is rotated.
+        @param max_size: Size of the file in bytes triggering the rotation.
+        @param max_age: Age of the file in seconds triggering the rotation.
+        @param keep_rotated: Number of rotated files to keep, they are named
+                             filename.1 (the newest) to filename.N.
         '''
         log.Logger.__init__(self, logger)
         log.LogProxy.__init__(self, logger)
@@ -397,6 +550,12 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
         self._sighup_installed = False
 
         self._on_rotate_cb = on_rotate
+        self._max_size = max_size
+        self._max_age = max_age
+        self._keep_rotated = keep_rotated
+        # epoch time the journal file was created at
+        self._created = None
+        self._rotating = False
 
     def initiate(self):
         self._db = adbapi.ConnectionPool('sqlite3', self._filename,
@@ -427,41 +586,27 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
 
     @manhole.expose()
     @in_state(State.connected)
-    def get_entries(self, history, start_date=0, limit=None):
+    def get_entries(self, history, start_date=0, limit=None,
+                    from_snapshot=False):
         '''
         Returns a list of journal entries  for the given history_id.
+        With from_snapshot=True the entries before the latest snapshot
+        of the history are skipped.
         '''
         if not isinstance(history, History):
             raise AttributeError(
                 'First paremeter is expected to be History instance, got %r'
                 % history)
 
-        command = text_helper.format_block("""
-        SELECT histories.agent_id,
-               histories.instance_id,
-               entries.journal_id,
-               entries.function_id,
-               entries.fiber_id,
-               entries.fiber_depth,
-               entries.args,
-               entries.kwargs,
-               entries.side_effects,
-               entries.result,
-               entries.timestamp
-          FROM entries
-          LEFT JOIN histories ON histories.id = entries.history_id
-          WHERE entries.history_id = ?""")
-        if start_date:
-            command += " AND entries.timestamp >= %s" % (start_date, )
-        command += " ORDER BY entries.rowid ASC"
-        if limit:
-            command += " LIMIT %s" % (limit, )
-        d = self._db.runQuery(command, (history.history_id, ))
+        command, params = entries_query(history.history_id, start_date,
+                                        limit, from_snapshot)
+        d = self._db.runQuery(command, params)
         d.addCallback(self._decode)
         return d
 
     @in_state(State.connected)
-    def get_log_entries(self, start_date=None, end_date=None, filters=list()):
+    def get_log_entries(self, start_date=None, end_date=None, filters=list(),
+                        limit=None):
         '''
         @param start_date: epoch time to start search
         @param end_date: epoch time to end search
@@ -472,39 +617,28 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
                         Leaving optional fields blank will match all the
                         entries. The entries in this list are combined with
                         OR operator.
+        @param limit: maximum number of entries returned, use
+                      L{get_log_page} to fetch the following ones.
         '''
-        query = text_helper.format_block('''
-        SELECT logs.message,
-               logs.level,
-               logs.category,
-               logs.log_name,
-               logs.file_path,
-               logs.line_num,
-               logs.timestamp
-        FROM logs
-        WHERE 1
-        ''')
-        query = self._add_timestamp_condition_sql(query, start_date, end_date)
-
-        def transform_filter(filter):
-            level = filter.get('level', None)
-            category = filter.get('category', None)
-            name = filter.get('name', None)
-            if level is None:
-                raise AttributeError("level is mandatory parameter.")
-            resp = "(logs.level <= %d" % (int(level), )
-            if category is not None:
-                resp += " AND logs.category == '%s'" % (category, )
-            if name is not None:
-                resp += " AND logs.log_name == '%s'" % (name, )
-            resp += ')'
-            return resp
-
-        filter_strings = map(transform_filter, filters)
-        if filter_strings:
-            query += " AND (%s)\n" % (' OR '.join(filter_strings), )
-        d = self._db.runQuery(query)
-        d.addCallback(self._decode)
+        d = self.get_log_page(start_date, end_date, filters, limit=limit)
+        d.addCallback(operator.itemgetter(0))
+        return d
+
+    @in_state(State.connected)
+    def get_log_page(self, start_date=None, end_date=None, filters=list(),
+                     after=None, limit=DEFAULT_LOG_PAGE):
+        '''
+        Fetches the log entries ordered by time, at most limit of them,
+        following the cursor given. The parameters are the same as for
+        L{get_log_entries}.
+        @param after: cursor returned with the previous page.
+        @returns: Deferred triggered with the tuple (entries, cursor),
+                  the cursor is None when there are no more entries.
+        '''
+        command, params = logs_query(start_date, end_date, filters,
+                                     after, limit)
+        d = self._db.runQuery(command, params)
+        d.addCallback(self._decode_log_page, limit)
         return d
 
     @in_state(State.connected)
@@ -513,13 +647,12 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
         @param start_date: epoch time to start search
         @param end_date: epoch time to end search
         '''
+        condition, params = logs_condition(start_date, end_date)
         query = text_helper.format_block('''
         SELECT DISTINCT logs.category
         FROM logs
-        WHERE 1
-        ''')
-        query = self._add_timestamp_condition_sql(query, start_date, end_date)
-        d = self._db.runQuery(query)
+        WHERE ''') + condition
+        d = self._db.runQuery(query, params)
 
         def unpack(res):
             return map(operator.itemgetter(0), res)
@@ -533,13 +666,12 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
         @param start_date: epoch time to start search
         @param end_date: epoch time to end search
         '''
+        condition, params = logs_condition(start_date, end_date)
         query = text_helper.format_block('''
         SELECT DISTINCT logs.log_name
         FROM logs
-        WHERE category = ?
-        ''')
-        query = self._add_timestamp_condition_sql(query, start_date, end_date)
-        d = self._db.runQuery(query, (category, ))
+        WHERE logs.category = ? AND ''') + condition
+        d = self._db.runQuery(query, (category, ) + params)
 
         def unpack(res):
             return map(operator.itemgetter(0), res)
@@ -568,7 +700,54 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
     def insert_entries(self, entries):
         for data in entries:
             self._cache.append(data)
-        return self._flush_next()
+        d = self._flush_next()
+        d.addCallback(defer.drop_param, self._check_rotation)
+        return d
+
+    @manhole.expose()
+    def rotate(self):
+        '''
+        Moves the journal to filename.1, shifting the older rotated files,
+        and starts a new one.
+        '''
+        if self._filename == ':memory:' or self._rotating:
+            return defer.succeed(None)
+        self.log("Rotating the journal %r.", self._filename)
+        self._rotating = True
+        d = self.close()
+        d.addCallback(defer.drop_param, self._shift_rotated)
+        d.addCallback(defer.drop_param, self.initiate)
+        d.addBoth(self._rotated)
+        return d
+
+    @manhole.expose()
+    @in_state(State.connected)
+    def compact(self, log_retention=None):
+        '''
+        Drops the entries of each history recorded before its latest
+        snapshot, and the logs older than log_retention seconds.
+        The file is vacuumed afterwards to give the space back.
+        '''
+
+        def do_compact(connection):
+            connection.execute(text_helper.format_block("""
+            DELETE FROM entries
+              WHERE rowid < (SELECT MAX(snapshots.rowid)
+                               FROM entries AS snapshots
+                              WHERE snapshots.history_id = entries.history_id
+                                AND snapshots.function_id = 'snapshot')
+            """))
+            if log_retention is not None:
+                connection.execute(
+                    "DELETE FROM logs WHERE timestamp < "
+                    "CAST(strftime('%s', 'now') AS INTEGER) - ?",
+                    (int(log_retention), ))
+
+        d = self._semaphore.run(self._db.runInteraction, do_compact)
+        # VACUUM cannot run inside of the transaction of the interaction
+        d.addCallback(defer.drop_param, self._semaphore.run,
+                      self._db.runWithConnection, self._run_all, ["VACUUM"])
+        return d
 
     @manhole.expose()
     def get_filename(self):
@@ -581,17 +760,38 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
 
     ### Private ###
 
-    def _add_timestamp_condition_sql(self, query, start_date, end_date):
-        if start_date is not None:
-            query += "  AND logs.timestamp >= %d\n" % (int(start_date), )
-        if end_date is not None:
-            query += "  AND logs.timestamp <= %d\n" % (int(end_date), )
-        return query
-
     def _reset_history_id_cache(self):
         # (agent_id, instance_id, ) -> history_id
         self._history_id_cache = dict()
 
+    def _check_rotation(self):
+        if self._rotating or self._filename == ':memory:':
+            return
+        if self._max_size is not None:
+            if os.path.getsize(self._filename) >= self._max_size:
+                return self.rotate()
+        if self._max_age is not None and self._created is not None:
+            if time.time() - self._created >= self._max_age:
+                return self.rotate()
+
+    def _shift_rotated(self):
+        for index in range(self._keep_rotated - 1, 0, -1):
+            older = "%s.%d" % (self._filename, index)
+            if os.path.exists(older):
+                os.rename(older, "%s.%d" % (self._filename, index + 1))
+        if self._keep_rotated > 0:
+            os.rename(self._filename, "%s.1" % (self._filename, ))
+        else:
+            os.remove(self._filename)
+
+    def _rotated(self, result):
+        self._rotating = False
+        if isinstance(result, Failure):
+            self._error_handler(result)
+            return
+        if callable(self._on_rotate_cb):
+            self._on_rotate_cb()
+
     def _sighup_handler(self, signum, frame):
         self.log("Received SIGHUP, reopening the journal.")
         self.close()
@@ -624,18 +824,13 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
         Takes the list of rows returned by sqlite.
         Returns rows in readable format.
         '''
+        return [decode_row(row, self._encoding) for row in entries]
 
-        def decode_blobs(row):
-            row = list(row)
-            for index, value in zip(range(len(row)), row):
-                if isinstance(value, types.BufferType):
-                    value = str(value)
-                    if self._encoding:
-                        value = value.decode(self._encoding)
-                    row[index] = value
-            return row
-
-        return map(decode_blobs, entries)
+    def _decode_log_page(self, rows, limit):
+        cursor = None
+        if rows and limit is not None and len(rows) >= limit:
+            cursor = (rows[-1][-2], rows[-1][-1])
+        return [decode_row(row[:-1], self._encoding) for row in rows], cursor
 
     def _encode(self, data):
         result = dict()
@@ -672,13 +867,13 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
         return result
 
     def _check_schema(self):
-        d = self._db.runQuery(
-            'SELECT value FROM metadata WHERE name = "encoding"')
-        d.addCallbacks(self._got_encoding, self._create_schema)
+        d = self._db.runQuery('SELECT name, value FROM metadata')
+        d.addCallbacks(self._got_metadata, self._create_schema)
         return d
 
-    def _got_encoding(self, res):
-        encoding = res[0][0]
+    def _got_metadata(self, res):
+        metadata = dict(res)
+        encoding = metadata['encoding']
         if encoding == 'None':
             encoding = None
         if self._encoding is not None and encoding != self._encoding:
@@ -687,7 +882,18 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
                          "the value of: %r",
                          self._encoding, encoding, encoding)
         self._encoding = encoding
-        self._initiated_ok()
+
+        # journals created by older versions lack these
+        commands = OBSOLETE_INDEXES + INDEXES
+        if 'created' in metadata:
+            self._created = float(metadata['created'])
+        else:
+            self._created = time.time()
+            commands += [self._insert_meta('created', repr(self._created))]
+
+        d = self._db.runWithConnection(self._run_all, commands)
+        d.addCallbacks(self._initiated_ok, self._error_handler)
+        return d
 
     def _create_schema(self, fail):
         fail.trap(sqlite3.OperationalError)
@@ -736,24 +942,29 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
             text_helper.format_block("""
             CREATE INDEX instance_idx ON histories(agent_id, instance_id)
             """)]
+        commands += INDEXES
 
-        def run_all(connection, commands):
-            for command in commands:
-                self.log('Executing command:\n %s', command)
-                connection.execute(command)
-
-        insert_meta = "INSERT INTO metadata VALUES('%s', '%s')"
-        commands += [insert_meta % (u'encoding', self._encoding, )]
+        self._created = time.time()
+        commands += [self._insert_meta(u'encoding', self._encoding),
+                     self._insert_meta(u'created', repr(self._created))]
 
         self._reset_history_id_cache()
         # insert_history = "INSERT INTO histories VALUES(%d, '%s', %d)"
         # for (a_id, i_id), h_id in self._history_id_cache.iteritems():
         #     commands += [insert_history % (h_id, a_id, i_id)]
 
-        d = self._db.runWithConnection(run_all, commands)
+        d = self._db.runWithConnection(self._run_all, commands)
         d.addCallbacks(self._initiated_ok, self._error_handler)
         return d
 
+    def _run_all(self, connection, commands):
+        for command in commands:
+            self.log('Executing command:\n %s', command)
+            connection.execute(command)
+
+    def _insert_meta(self, name, value):
+        return "INSERT INTO metadata VALUES('%s', '%s')" % (name, value, )
+
     def _initiated_ok(self, *_):
         self.log('Journaler initiated correctly for the filename %r',
                  self._filename)
@@ -843,6 +1054,48 @@ class SqliteWriter(log.Logger, log.LogProxy, common.StateMachineMixin,
             return d
 
 
+class JournalReader(object):
+    '''
+    Synchronous read-only access to the journal file, used to validate
+    the journal outside of the reactor. Entries are streamed from
+    the database cursor, they are never loaded into memory all at once.
+    '''
+
+    def __init__(self, filename):
+        self._filename = filename
+        self._db = sqlite3.connect(filename)
+        cursor = self._db.execute(
+            'SELECT value FROM metadata WHERE name = "encoding"')
+        encoding = cursor.fetchone()[0]
+        self._encoding = None if encoding == 'None' else encoding
+
+    def get_histories(self):
+        cursor = self._db.execute(
+            "SELECT id, agent_id, instance_id FROM histories")
+        return History._parse_resp(cursor)
+
+    def iter_entries(self, history, from_snapshot=False):
+        history_id = (history.history_id if isinstance(history, History)
+                      else history)
+        command, params = entries_query(history_id,
+                                        from_snapshot=from_snapshot)
+        for row in self._db.execute(command, params):
+            yield decode_row(row, self._encoding)
+
+    def iter_log_entries(self, start_date=None, end_date=None,
+                         filters=list()):
+        '''
+        Iterates over the log entries ordered by time, the parameters are
+        the same as for L{SqliteWriter.get_log_entries}.
+        '''
+        command, params = logs_query(start_date, end_date, filters)
+        for row in self._db.execute(command, params):
+            yield decode_row(row[:-1], self._encoding)
+
+    def close(self):
+        self._db.close()
+
+
 class Record(object):
     implements(IRecord)
 
@@ -21,6 +21,7 @@
 # Headers in this file shall remain intact.
 # -*- Mode: Python -*-
 # vi:si:et:sw=4:sts=4:ts=4
+import collections
 import warnings
 
 from zope.interface import implements
@@ -297,12 +298,15 @@ class PersonalBinding(BaseBinding):
 
 class Queue(object):
 
-    def __init__(self, name, on_deliver=None):
+    def __init__(self, name, on_deliver=None, on_idle=None):
         self.name = name
-        self._messages = []
+        self._messages = collections.deque()
         self.on_deliver = on_deliver
+        self.on_idle = on_idle
 
-        self._consumers = []
+        # FIFO of the Deferreds given by get(), the ones fired by someone
+        # else (disconnected consumers) are skipped when delivering
+        self._consumers = collections.deque()
         self._send_task = None
 
     def get(self, *_):
@@ -316,7 +320,10 @@ class Queue(object):
                and self._send_task is None
 
     def has_waiting_consumers(self):
-        return len([x for x in self._consumers if not x.called]) > 0
+        consumers = self._consumers
+        while consumers and consumers[0].called:
+            consumers.popleft()
+        return len(consumers) > 0
 
     def enqueue(self, message):
         self._messages.append(message)
@@ -324,19 +331,15 @@ class Queue(object):
 
     def _send_messages(self):
         self._send_task = None
-        try:
-            while len(self._messages) > 0 and len(self._consumers) > 0:
-                consumer = None
-                while not (consumer and not consumer.called):
-                    consumer = self._consumers.pop(0)
-                message = self._messages.pop(0)
-                consumer.callback(message)
-                if callable(self.on_deliver):
-                    self.on_deliver()
-        except IndexError:
-            # we had consumers but they disconnected,
-            # this is expected, just pass
-            pass
+        messages = self._messages
+        consumers = self._consumers
+        while messages and self.has_waiting_consumers():
+            consumer = consumers.popleft()
+            consumer.callback(messages.popleft())
+            if callable(self.on_deliver):
+                self.on_deliver()
+        if callable(self.on_idle) and self.is_idle():
+            self.on_idle()
 
     def _schedule_sending(self):
         if self._send_task is None:
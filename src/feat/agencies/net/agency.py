@@ -34,8 +34,8 @@ from feat.agencies import agency, journaler
 from feat.agencies.net import ssh, broker
 from feat.common import log, defer, time, first, error, run
 from feat.common import manhole, text_helper
-from feat.process import standalone
-from feat.process.base import ProcessState
+from feat.process import standalone, zygote
+from feat.process.base import ProcessState, DependencyError
 from feat.gateway import gateway
 from feat.utils import locate
 
@@ -83,9 +83,16 @@ class Agency(agency.Agency):
                  authorized_keys=options.DEFAULT_MH_AUTH,
                  manhole_port=options.DEFAULT_MH_PORT,
                  agency_journal=options.DEFAULT_JOURFILE,
+                 journal_max_size=options.DEFAULT_JOURNAL_MAX_SIZE,
+                 journal_max_age=options.DEFAULT_JOURNAL_MAX_AGE,
+                 journal_keep=options.DEFAULT_JOURNAL_KEEP,
+                 journal_compact=options.DEFAULT_JOURNAL_COMPACT,
+                 log_retention=options.DEFAULT_LOG_RETENTION,
                  socket_path=options.DEFAULT_SOCKET_PATH,
                  gateway_port=options.DEFAULT_GW_PORT,
                  enable_spawning_slave=options.DEFAULT_ENABLE_SPAWNING_SLAVE,
+                 enable_zygote=options.DEFAULT_ENABLE_ZYGOTE,
+                 zygote_spares=options.DEFAULT_ZYGOTE_SPARES,
                  rundir=None,
                  logdir=None,
                  daemonize=options.DEFAULT_DAEMONIZE,
@@ -111,9 +118,16 @@ class Agency(agency.Agency):
                           authorized_keys=authorized_keys,
                           manhole_port=manhole_port,
                           agency_journal=agency_journal,
+                          journal_max_size=journal_max_size,
+                          journal_max_age=journal_max_age,
+                          journal_keep=journal_keep,
+                          journal_compact=journal_compact,
+                          log_retention=log_retention,
                           socket_path=socket_path,
                           gateway_port=gateway_port,
                           enable_spawning_slave=enable_spawning_slave,
+                          enable_zygote=enable_zygote,
+                          zygote_spares=zygote_spares,
                           rundir=rundir,
                           logdir=logdir,
                           daemonize=daemonize,
@@ -122,6 +136,8 @@ class Agency(agency.Agency):
         self._ssh = None
         self._broker = None
         self._gateway = None
+        # template process forking standalone agents, see feat.process.zygote
+        self._zygote = None
 
         # this is default mode for the dependency modules
         self._set_default_mode(ExecMode.production)
@@ -265,12 +281,19 @@ class Agency(agency.Agency):
         self._ssh.start_listening()
         filename = os.path.join(self.config['agency']['rundir'],
                                 self.config['agency']['journal'])
+        ac = self.config['agency']
+        max_size = ac['journal_max_size']
+        max_age = ac['journal_max_age']
         self._journal_writer = journaler.SqliteWriter(
             self, filename=filename, encoding='zip',
-            on_rotate=self._force_snapshot_agents)
+            on_rotate=self._force_snapshot_agents,
+            max_size=int(max_size) if max_size is not None else None,
+            max_age=int(max_age) if max_age is not None else None,
+            keep_rotated=int(ac['journal_keep']))
         self._journaler.configure_with(self._journal_writer)
         self._journal_writer.initiate()
         self._start_master_gateway()
+        self._start_zygote()
 
         self._redirect_text_log()
         self._create_pid_file()
@@ -378,6 +401,7 @@ class Agency(agency.Agency):
 
     def _disconnect(self):
         d = defer.succeed(None)
+        d.addCallback(defer.drop_param, self._stop_zygote)
         d.addCallback(defer.drop_param, self._ssh.stop_listening)
         d.addCallback(defer.drop_param, self._gateway.cleanup)
         d.addCallback(defer.drop_param, self._journaler.close)
@@ -425,8 +449,13 @@ class Agency(agency.Agency):
         d = self._broker.wait_event(recp.key, 'started')
         d.addCallback(lambda _: recp)
 
-        p = standalone.Process(self, cmd, cmd_args, env)
-        p.restart()
+        if self._zygote is not None and self._zygote.can_spawn(cmd):
+            self.log("Forking standalone agent %s from the zygote",
+                     descriptor.doc_id)
+            self._zygote.spawn(cmd, cmd_args, env, descriptor)
+        else:
+            p = standalone.Process(self, cmd, cmd_args, env)
+            p.restart()
 
         return d
 
@@ -524,8 +553,12 @@ class Agency(agency.Agency):
                      db_host=None, db_port=None, db_name=None,
                      public_key=None, private_key=None,
                      authorized_keys=None, manhole_port=None,
-                     agency_journal=None, socket_path=None,
+                     agency_journal=None, journal_max_size=None,
+                     journal_max_age=None, journal_keep=None,
+                     journal_compact=None, log_retention=None,
+                     socket_path=None,
                      gateway_port=None, enable_spawning_slave=None,
+                     enable_zygote=None, zygote_spares=None,
                      rundir=None, logdir=None, daemonize=None,
                      force_host_restart=None):
 
@@ -547,10 +580,17 @@ class Agency(agency.Agency):
             socket_path = os.path.join(rundir, socket_path)
 
         agency_conf = dict(journal=agency_journal,
+                           journal_max_size=journal_max_size,
+                           journal_max_age=journal_max_age,
+                           journal_keep=journal_keep,
+                           journal_compact=journal_compact,
+                           log_retention=log_retention,
                            socket_path=socket_path,
                            rundir=rundir,
                            logdir=logdir,
                            enable_spawning_slave=enable_spawning_slave,
+                           enable_zygote=enable_zygote,
+                           zygote_spares=zygote_spares,
                            daemonize=daemonize,
                            force_host_restart=force_host_restart)
 
@@ -725,6 +765,7 @@ class Agency(agency.Agency):
     def _trigger_snapshot(self):
         self.log("Snapshoting all the agents.")
         self.snapshot_agents()
+        self._compact_journal()
         self._snapshot_task = None
         self._setup_snapshoter()
 
@@ -733,6 +774,20 @@ class Agency(agency.Agency):
         # TODO: Mind also the agents running in slave agencies
         self.snapshot_agents(force=True)
 
+    def _is_enabled(self, option):
+        enabled = self.config['agency'][option]
+        # values read from the environment are strings
+        return enabled not in (None, False, 'False')
+
+    def _compact_journal(self):
+        if not self._is_enabled('journal_compact'):
+            return
+        # only the master agency owns the journal file
+        if isinstance(self._journal_writer, journaler.SqliteWriter):
+            retention = self.config['agency']['log_retention']
+            self._journal_writer.compact(
+                int(retention) if retention is not None else None)
+
     def _cancel_snapshoter(self):
         if self._snapshot_task is not None and self._snapshot_task.active():
             self._snapshot_task.cancel()
@@ -757,6 +812,27 @@ class Agency(agency.Agency):
         path = run.write_pidfile(rundir, file=pid_file)
         self.log("Written pid file %s" % path)
 
+    def _start_zygote(self):
+        if not self._is_enabled('enable_zygote'):
+            return
+        spares = int(self.config['agency']['zygote_spares'])
+        env = dict(PYTHONPATH=":".join(sys.path),
+                   FEAT_DEBUG=self.get_logging_filter(),
+                   PATH=os.environ.get("PATH", ""))
+        try:
+            self._zygote = zygote.Process(self, spares=spares, env=env)
+        except DependencyError as e:
+            self.warning("Cannot start the zygote, standalone agents will be "
+                         "spawned as new processes: %s", e)
+            return
+        d = self._zygote.restart()
+        d.addErrback(self._error_handler)
+
+    def _stop_zygote(self):
+        if self._zygote is not None:
+            process, self._zygote = self._zygote, None
+            return process.terminate()
+
     def _spawn_backup_agency(self):
 
         def get_cmd_line():
@@ -33,6 +33,12 @@ DEFAULT_MSG_USER = "guest"
 DEFAULT_MSG_PASSWORD = "guest"
 
 DEFAULT_JOURFILE = 'journal.sqlite3'
+# The journal is neither rotated nor compacted unless configured to
+DEFAULT_JOURNAL_MAX_SIZE = None
+DEFAULT_JOURNAL_MAX_AGE = None
+DEFAULT_JOURNAL_KEEP = 5
+DEFAULT_JOURNAL_COMPACT = False
+DEFAULT_LOG_RETENTION = None
 DEFAULT_GW_PORT = 5500
 
 # Only for command-line options
@@ -42,6 +48,8 @@ DEFAULT_MH_AUTH = "authorized_keys"
 DEFAULT_MH_PORT = 6000
 
 DEFAULT_ENABLE_SPAWNING_SLAVE = True
+DEFAULT_ENABLE_ZYGOTE = False
+DEFAULT_ZYGOTE_SPARES = 2
 DEFAULT_RUNDIR = "/var/run/feat"
 DEFAULT_LOGDIR = "/var/log/feat"
 DEFAULT_DAEMONIZE = False
@@ -81,6 +89,27 @@ def add_agency_options(parser):
                      action="store", dest="agency_journal",
                      help=("journal filename (default: %s)"
                            % DEFAULT_JOURFILE))
+    group.add_option('--journal-max-size', type="int",
+                     action="store", dest="agency_journal_max_size",
+                     help=("size of the journal in bytes after which it is "
+                           "rotated (default: no rotation)"))
+    group.add_option('--journal-max-age', type="int",
+                     action="store", dest="agency_journal_max_age",
+                     help=("age of the journal in seconds after which it is "
+                           "rotated (default: no rotation)"))
+    group.add_option('--journal-keep', type="int",
+                     action="store", dest="agency_journal_keep",
+                     help=("number of rotated journals to keep "
+                           "(default: %s)" % DEFAULT_JOURNAL_KEEP))
+    group.add_option('--journal-compact',
+                     dest="agency_journal_compact", action="store_true",
+                     help=("drop the journal entries preceding the latest "
+                           "snapshot of the agents after each periodic "
+                           "snapshot and vacuum the file"))
+    group.add_option('--log-retention', type="int",
+                     action="store", dest="agency_log_retention",
+                     help=("seconds the logs are kept in the journal when "
+                           "it is compacted (default: forever)"))
     group.add_option('-S', '--socket-path', dest="agency_socket_path",
                      help=("path to the unix socket used by the agency"
                            "(default: %s)" % DEFAULT_SOCKET_PATH),
@@ -88,6 +117,14 @@ def add_agency_options(parser):
     group.add_option('-b', '--no-slave',
                      dest="agency_enable_spawning_slave", action="store_false",
                      help=("Disable spawning slave agency"))
+    group.add_option('--zygote',
+                     dest="agency_enable_zygote", action="store_true",
+                     help=("spawn standalone agents by forking them from "
+                           "a preloaded template process"))
+    group.add_option('--zygote-spares', type="int",
+                     action="store", dest="agency_zygote_spares",
+                     help=("number of forked processes kept waiting by the "
+                           "template (default: %s)" % DEFAULT_ZYGOTE_SPARES))
     group.add_option('-R', '--rundir',
                      action="store", dest="agency_rundir",
                      help=("Rundir of the agency (default: %s)" %
@@ -203,6 +240,11 @@ def add_host_options(parser):
                     help="Add a category to the host agent. "
                          "Format: CAT_NAME:CAT_VALUE.",
                     metavar="HOST_DEF_ID", action="append", default=[])
+    parser.add_option('--host-placement', dest="hostplacement",
+                      help="Placement strategy used by the host agent to "
+                           "price its allocation bids: none (default), "
+                           "packing or spreading.",
+                      metavar="PLACEMENT", default=None)
 
 
 def _load_module(option, opt, value, parser):
@@ -24,6 +24,7 @@ import os
 from twisted.internet import reactor
 
 from feat.agencies.net import agency, broker
+from feat.agents.base import descriptor
 from feat.common import manhole, defer
 
 from feat.interface.recipient import IRecipient
@@ -67,8 +68,13 @@ class Agency(agency.Agency):
         if self._to_spawn:
             aid, kwargs = self._to_spawn.pop(0)
             d = self.wait_running()
-            d.addCallback(lambda _: self._database.get_connection())
-            d.addCallback(defer.call_param, 'get_document', aid)
+            if isinstance(aid, descriptor.Descriptor):
+                # Passed by the agency which forked us from the zygote
+                desc, aid = aid, aid.doc_id
+                d.addCallback(defer.override_result, desc)
+            else:
+                d.addCallback(lambda _: self._database.get_connection())
+                d.addCallback(defer.call_param, 'get_document', aid)
             d.addCallback(self.start_agent_locally, **kwargs)
             d.addCallbacks(self.notify_running, self.notify_failed,
                            errbackArgs=(aid, ))
@@ -22,7 +22,7 @@
 from zope.interface import implements, classProvides
 
 from feat.agencies import common
-from feat.common import log, defer, time
+from feat.common import log, defer
 from feat.common import serialization, error_handler
 
 from feat.agencies.interface import *
@@ -145,4 +145,5 @@ class PeriodicProtocol(common.InitiatorMediumBase, log.Logger):
         return d
 
     def _schedule_protocol(self, _):
-        self._delayed_call = time.callLater(self.period, self._start_protocol)
+        self._delayed_call = self.medium.schedule(
+            self.period, self._start_protocol)
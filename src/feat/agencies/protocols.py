@@ -203,6 +203,8 @@ class BaseInterest(log.Logger):
     def _process_message(self, message):
         assert not self._concurrency or self._active < self._concurrency
         self._active += 1
+        if self._active == 1:
+            self.agency_agent.notify_activity()
 
     def _message_processed(self, message):
         self.debug('Message %s for protocol %s processed',
@@ -219,6 +221,7 @@ class BaseInterest(log.Logger):
         if self._active == 0:
             # All protocols terminated and empty queue
             self._notifier.callback("finished", self)
+            self.agency_agent.notify_activity()
 
 
 class DialogInterest(BaseInterest):
@@ -19,11 +19,16 @@
 # See "LICENSE.GPL" in the source distribution for more information.
 
 # Headers in this file shall remain intact.
+import multiprocessing
+import optparse
+import resource
+import time
 from pprint import pformat
 
 from zope.interface import implements, classProvides
 
-from feat.common import serialization, log, text_helper
+from feat.common import serialization, log, text_helper, formatable
+from feat.agencies import journaler
 from feat.agents.base import replay
 from feat.common.serialization import banana
 
@@ -997,3 +1002,104 @@ class PeriodicProtocol(AgencyProtocol):
     @serialization.freeze_tag('PeriodicProtocol.cancel')
     def cancel(self):
         pass
+
+
+### offline validation ###
+
+
+class ValidationReport(formatable.Formatable):
+
+    formatable.field('histories', 0)
+    formatable.field('entries', 0)
+    # history_id -> error message
+    formatable.field('failures', dict())
+    formatable.field('elapsed', 0)
+    # peak resident set size in KiB of the validating processes
+    formatable.field('peak_rss', 0)
+
+
+def validate_history(filename, history, from_snapshot=True):
+    '''
+    Replays the history stored in the journal file, streaming its entries.
+    Returns the number of entries applied, raises ReplayError if the replay
+    does not match the journal.
+    '''
+    reader = journaler.JournalReader(filename)
+    try:
+        entries = reader.iter_entries(history, from_snapshot=from_snapshot)
+        count = 0
+        for entry in Replay(entries, history.agent_id):
+            entry.apply()
+            count += 1
+        return count
+    finally:
+        reader.close()
+
+
+def validate_journal(filename, from_snapshot=True, processes=None):
+    '''
+    Validates all the histories of the journal file. Histories are
+    independent, they are replayed in a pool of processes.
+    The agent modules have to be imported before calling it.
+    '''
+    reader = journaler.JournalReader(filename)
+    try:
+        histories = reader.get_histories()
+    finally:
+        reader.close()
+
+    started = time.time()
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = pool.map(_validate_history,
+                           [(filename, h, from_snapshot) for h in histories])
+    finally:
+        pool.close()
+        pool.join()
+
+    report = ValidationReport(histories=len(histories),
+                              elapsed=time.time() - started,
+                              failures=dict())
+    for history, (count, error) in zip(histories, results):
+        report.entries += count
+        if error is not None:
+            report.failures[history.history_id] = error
+    report.peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return report
+
+
+def script():
+    parser = optparse.OptionParser(
+        usage="%prog [options] JOURNAL_FILE")
+    parser.add_option('-a', '--all-entries', dest='from_snapshot',
+                      action='store_false', default=True,
+                      help="replay the whole histories instead of "
+                           "starting from the latest snapshots")
+    parser.add_option('-p', '--processes', dest='processes',
+                      type='int', default=None,
+                      help="number of validating processes, "
+                           "defaults to the number of CPUs")
+    opts, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error("expecting the journal file to validate")
+
+    log.FluLogKeeper.init()
+    report = validate_journal(args[0], opts.from_snapshot, opts.processes)
+    for history_id, error in report.failures.iteritems():
+        log.error('script', "History %s failed: %s", history_id, error)
+    log.info('script', "Validated %d entries of %d histories in %.2f s, "
+             "peak RSS %d KiB, %d failures.", report.entries,
+             report.histories, report.elapsed, report.peak_rss,
+             len(report.failures))
+    return 1 if report.failures else 0
+
+
+def _validate_history(args):
+    # run in the pool, the errors have to be sent back as text
+    filename, history, from_snapshot = args
+    try:
+        return validate_history(filename, history, from_snapshot), None
+    except Exception as e:
+        return 0, "%s: %s" % (type(e).__name__, e)
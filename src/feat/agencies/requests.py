@@ -50,6 +50,12 @@ class AgencyRequester(log.LogProxy, log.Logger, common.StateMachineMixin,
 
     error_state = RequestState.wtf
 
+    _event_mapping = {
+        message.ResponseMessage:\
+            {'state_before': RequestState.requested,
+             'state_after': RequestState.requested,
+             'method': '_on_reply'}}
+
     def __init__(self, agency_agent, factory, recipients, *args, **kwargs):
         log.Logger.__init__(self, agency_agent)
         log.LogProxy.__init__(self, agency_agent)
@@ -114,12 +120,7 @@ class AgencyRequester(log.LogProxy, log.Logger, common.StateMachineMixin,
     ### IAgencyListenerInternal Methods ###
 
     def on_message(self, msg):
-        mapping = {
-            message.ResponseMessage:\
-                {'state_before': RequestState.requested,
-                 'state_after': RequestState.requested,
-                 'method': self._on_reply}}
-        self._event_handler(mapping, msg)
+        self._dispatch_event(msg)
 
     ### ISerializable Methods ###
 
@@ -162,6 +163,12 @@ class AgencyReplier(log.LogProxy, log.Logger, common.StateMachineMixin,
 
     error_state = RequestState.wtf
 
+    _event_mapping = {
+        message.RequestMessage:\
+        {'state_before': RequestState.requested,
+         'state_after': RequestState.requested,
+         'method': '_requested'}}
+
     def __init__(self, agency_agent, factory, message):
         log.Logger.__init__(self, agency_agent)
         log.LogProxy.__init__(self, agency_agent)
@@ -212,12 +219,7 @@ class AgencyReplier(log.LogProxy, log.Logger, common.StateMachineMixin,
     ### IAgencyListenerInternal Methods ###
 
     def on_message(self, msg):
-        mapping = {
-            message.RequestMessage:\
-            {'state_before': RequestState.requested,
-             'state_after': RequestState.requested,
-             'method': self._requested}}
-        self._event_handler(mapping, msg)
+        self._dispatch_event(msg)
 
     ### ISerializable Methods ###
 
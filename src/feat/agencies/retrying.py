@@ -162,6 +162,9 @@ class RetryingProtocol(common.TransientInitiatorMediumBase, log.Logger):
                   self.medium.get_full_id(), self.factory)
 
         self._initiator = None
+        if not self.busy:
+            # idle until the next attempt
+            self.medium.notify_activity()
 
         # check if we are done
         if self.max_retries is not None and self.attempt > self.max_retries:
@@ -30,7 +30,8 @@ from feat.common import (log, decorator, serialization, fiber,
 from feat.interface import generic, agent, protocols
 from feat.agencies import retrying
 from feat.agents.base import (recipient, replay, requester,
-                              replier, partners, dependency, manager, )
+                              replier, partners, dependency, manager,
+                              contractor, directory, )
 from feat.agents.common import monitor, rpc, export
 
 from feat.interface.agent import AgencyAgentState
@@ -121,6 +122,13 @@ class BaseAgent(mro.MroMixin, log.Logger, log.LogProxy, replay.Replayable,
     def init_state(self, state, medium):
         state.medium = agent.IAgencyAgent(medium)
         state.partners = self.partners_class(self)
+        state.service_directory = directory.ServiceDirectory(self)
+        # discovery protocol_id -> [interest, bound to lobby]
+        state.services = dict()
+        # (discovery protocol_id, shard) -> announcement poster
+        state.service_posters = dict()
+        # discovery protocol_id -> announcement collector interest
+        state.service_collectors = dict()
 
     @replay.immutable
     def get_status(self, state):
@@ -137,7 +145,9 @@ class BaseAgent(mro.MroMixin, log.Logger, log.LogProxy, replay.Replayable,
 
     @replay.journaled
     def startup_agent(self, state):
-        return self.call_mro('startup')
+        f = self.call_mro('startup')
+        f.add_callback(fiber.drop_param, self._startup_services)
+        return f
 
     @replay.journaled
     def shutdown_agent(self, state):
@@ -335,6 +345,10 @@ class BaseAgent(mro.MroMixin, log.Logger, log.LogProxy, replay.Replayable,
         return state.partners.receive_notification(
             recp, notification_type, payload, sender)
 
+    @replay.mutable
+    def partner_sent_notifications(self, state, notifications, sender):
+        return state.partners.receive_notifications(notifications, sender)
+
     @manhole.expose()
     @replay.immutable
     def query_partners(self, state, name_or_class):
@@ -411,7 +425,17 @@ class BaseAgent(mro.MroMixin, log.Logger, log.LogProxy, replay.Replayable,
     @replay.journaled
     def discover_service(self, state, string_or_factory,
                          timeout=3, shard='lobby'):
+        '''
+        Gives the list of recipients of the agents providing the service.
+        The answer comes from the service directory, the broadcast
+        discovery taking the whole timeout is only done if the directory
+        does not know the service.
+        '''
         initiator = manager.DiscoverService(string_or_factory, timeout)
+        providers = state.service_directory.get(initiator.protocol_id, shard)
+        if providers is not None:
+            return fiber.succeed(providers)
+
         recp = recipient.Broadcast(route=shard,
                                    protocol_id=initiator.protocol_id)
 
@@ -421,8 +445,56 @@ class BaseAgent(mro.MroMixin, log.Logger, log.LogProxy, replay.Replayable,
         # rejecting all it gets
         f.add_callback(manager.ServiceDiscoveryManager.notify_finish)
         f.add_errback(self._expire_handler)
+        f.add_callback(self._service_discovered,
+                       initiator.protocol_id, shard)
         return f
 
+    @replay.mutable
+    def register_service(self, state, string_or_factory):
+        '''
+        Registers the interest in the discovery of the service and
+        announces it to the service directories of the agents of the shard.
+        '''
+        service = contractor.Service(string_or_factory)
+        interest = state.medium.register_interest(service)
+        state.services[service.protocol_id] = [interest, False]
+        return interest
+
+    @replay.mutable
+    def bind_service_to_lobby(self, state, string_or_factory):
+        service = contractor.Service(string_or_factory)
+        entry = state.services[service.protocol_id]
+        entry[0].bind_to_lobby()
+        if not entry[1]:
+            entry[1] = True
+            self._announce_service(service.protocol_id, 'lobby')
+
+    @replay.mutable
+    def unbind_service_from_lobby(self, state, string_or_factory):
+        service = contractor.Service(string_or_factory)
+        entry = state.services[service.protocol_id]
+        entry[0].unbind_from_lobby()
+        if entry[1]:
+            entry[1] = False
+            self._announce_service(service.protocol_id, 'lobby',
+                                   withdrawn=True)
+
+    @replay.mutable
+    def announce_services(self, state):
+        shard = self.get_shard_id()
+        for protocol_id, (_interest, lobby) in state.services.iteritems():
+            self._announce_service(protocol_id, shard)
+            if lobby and shard != 'lobby':
+                self._announce_service(protocol_id, 'lobby')
+
+    @replay.immutable
+    def service_announced(self, state, protocol_id, shard, recp):
+        state.service_directory.refresh(protocol_id, shard, recp)
+
+    @replay.immutable
+    def service_withdrawn(self, state, protocol_id, shard, recp):
+        state.service_directory.remove(protocol_id, shard, recp)
+
     @replay.immutable
     def call_next(self, state, method, *args, **kwargs):
         return state.medium.call_next(method, *args, **kwargs)
@@ -441,6 +513,34 @@ class BaseAgent(mro.MroMixin, log.Logger, log.LogProxy, replay.Replayable,
 
     ### Private Methods ###
 
+    @replay.mutable
+    def _startup_services(self, state):
+        if state.services:
+            state.medium.initiate_protocol(directory.ServiceAnnouncementTask,
+                                           directory.SERVICE_PERIOD)
+
+    @replay.mutable
+    def _announce_service(self, state, protocol_id, shard, withdrawn=False):
+        poster = state.service_posters.get((protocol_id, shard))
+        if poster is None:
+            recp = recipient.Broadcast(
+                directory.get_announcement_id(protocol_id), shard)
+            poster = self.initiate_protocol(
+                directory.AnnounceService(protocol_id), recp)
+            state.service_posters[(protocol_id, shard)] = poster
+        poster.notify(shard, withdrawn)
+
+    @replay.mutable
+    def _service_discovered(self, state, providers, protocol_id, shard):
+        state.service_directory.update(protocol_id, shard, providers)
+        if protocol_id not in state.service_collectors:
+            interest = state.medium.register_interest(
+                directory.ServiceAnnouncements(protocol_id))
+            state.service_collectors[protocol_id] = interest
+        if shard == 'lobby' and self.get_shard_id() != 'lobby':
+            state.service_collectors[protocol_id].bind_to_lobby()
+        return providers
+
     def _expire_handler(self, fail):
         if fail.check(protocols.ProtocolFailed):
             return fail.value.args[0]
@@ -456,6 +556,9 @@ class BaseAgent(mro.MroMixin, log.Logger, log.LogProxy, replay.Replayable,
         f.add_callback(fiber.drop_param,
                        state.medium.register_interest,
                        replier.PartnershipProtocol)
+        f.add_callback(fiber.drop_param,
+                       state.medium.register_interest,
+                       replier.PartnershipBatchProtocol)
         f.add_callback(fiber.drop_param,
                        state.medium.register_interest,
                        replier.ProposalReceiver)
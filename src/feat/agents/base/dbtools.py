@@ -24,7 +24,7 @@ import optparse
 
 from twisted.internet import reactor
 
-from feat.agents.base import document, view
+from feat.agents.base import document, view, registry
 from feat.agencies.net import options, database
 from feat.agencies.interface import ConflictError
 from feat.common import log, defer
@@ -41,6 +41,8 @@ def reset_documents(documents):
 
 def get_current_initials():
     global _documents
+    # include the documents of the agents not loaded yet
+    registry.load_all()
     return copy.deepcopy(_documents)
 
 
@@ -69,6 +71,8 @@ def create_connection(host, port, name):
 def push_initial_data(connection):
     global _documents
 
+    # the agents not loaded yet declare initial documents as well
+    registry.load_all()
     for doc in _documents:
         try:
             yield connection.save_document(doc)
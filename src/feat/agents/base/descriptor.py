@@ -38,7 +38,10 @@ def register(klass, name):
 
 
 def lookup(name):
-    return document.lookup(name)
+    factory = document.lookup(name)
+    if factory is None and registry.load(name):
+        factory = document.lookup(name)
+    return factory
 
 
 @document.register
@@ -0,0 +1,197 @@
+# F3AT - Flumotion Asynchronous Autonomous Agent Toolkit
+# Copyright (C) 2010,2011 Flumotion Services, S.A.
+# All rights reserved.
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# See "LICENSE.GPL" in the source distribution for more information.
+
+# Headers in this file shall remain intact.
+from zope.interface import implements
+
+from feat.agents.base import (labour, message, replay, task,
+                              poster, collector, )
+from feat.common import container, serialization
+
+from feat.interface.collector import ICollectorFactory
+from feat.interface.poster import IPosterFactory
+from feat.interface.protocols import InterestType
+
+__all__ = ['ServiceDirectory', 'AnnounceService', 'ServiceAnnouncements',
+           'ServiceAnnouncementTask', 'SERVICE_PERIOD', 'SERVICE_TTL']
+
+
+# Period in which agents announce the services they provide
+SERVICE_PERIOD = 10
+# Time after which a provider which stopped announcing is forgotten
+SERVICE_TTL = 3 * SERVICE_PERIOD
+
+
+def get_announcement_id(protocol_id):
+    '''
+    Gives the protocol id used to announce the service discovered
+    with the given protocol id.
+    '''
+    return 'announce:' + protocol_id
+
+
+@serialization.register
+class ServiceDirectory(labour.BaseLabour):
+    '''
+    Soft state directory of the service providers, keyed by the discovery
+    protocol id and the shard. Entries are created with the complete list
+    of providers given by a broadcast discovery, afterwards the providers
+    are kept alive by their announcements and expire when they stop.
+    '''
+
+    def __init__(self, patron):
+        labour.BaseLabour.__init__(self, patron)
+        # (protocol_id, shard) -> ExpDict(recipient key -> recipient)
+        self._services = dict()
+
+    @replay.side_effect
+    def get(self, protocol_id, shard):
+        '''
+        Returns the list of the known providers or None if the directory
+        cannot answer for the service.
+        '''
+        providers = self._services.get((protocol_id, shard))
+        if providers is None:
+            return None
+        result = providers.values()
+        if not result:
+            del self._services[(protocol_id, shard)]
+            return None
+        return result
+
+    @replay.side_effect
+    def update(self, protocol_id, shard, recipients):
+        '''
+        Replaces the providers with the result of a broadcast discovery.
+        '''
+        if not recipients:
+            self._services.pop((protocol_id, shard), None)
+            return
+        providers = container.ExpDict(self.patron)
+        for recp in recipients:
+            providers.set(recp.key, recp,
+                          expiration=SERVICE_TTL, relative=True)
+        self._services[(protocol_id, shard)] = providers
+
+    @replay.side_effect
+    def refresh(self, protocol_id, shard, recp):
+        '''
+        Adds or refreshes a provider which announced itself. Services which
+        have not been discovered yet are ignored, only a broadcast can tell
+        the complete list of their providers.
+        '''
+        providers = self._services.get((protocol_id, shard))
+        if providers is None:
+            return
+        providers.set(recp.key, recp, expiration=SERVICE_TTL, relative=True)
+
+    @replay.side_effect
+    def remove(self, protocol_id, shard, recp):
+        providers = self._services.get((protocol_id, shard))
+        if providers is not None:
+            providers.pop(recp.key, None)
+
+
+class ServiceAnnouncementPoster(poster.BasePoster):
+
+    notification_timeout = SERVICE_PERIOD
+
+    @replay.immutable
+    def pack_payload(self, state, shard, withdrawn=False):
+        return dict(recipient=state.agent.get_own_address(),
+                    shard=shard, withdrawn=withdrawn)
+
+
+@serialization.register
+class AnnounceService(serialization.Serializable):
+    '''
+    Poster factory announcing the service discovered with the given
+    protocol id.
+    '''
+
+    implements(IPosterFactory)
+
+    protocol_type = "Notification"
+
+    def __init__(self, protocol_id):
+        self.protocol_id = get_announcement_id(protocol_id)
+
+    def __call__(self, agent, medium):
+        instance = ServiceAnnouncementPoster(agent, medium)
+        instance.protocol_id = self.protocol_id
+        return instance
+
+
+class ServiceAnnouncementCollector(collector.BaseCollector):
+
+    interest_type = InterestType.public
+
+    @replay.immutable
+    def notified(self, state, msg):
+        payload = msg.payload
+        if payload['withdrawn']:
+            state.agent.service_withdrawn(self.service_id, payload['shard'],
+                                          payload['recipient'])
+        else:
+            state.agent.service_announced(self.service_id, payload['shard'],
+                                          payload['recipient'])
+
+
+@serialization.register
+class ServiceAnnouncements(serialization.Serializable):
+    '''
+    Collector factory keeping the service directory up to date with the
+    announcements of the service discovered with the given protocol id.
+    '''
+
+    implements(ICollectorFactory)
+
+    protocol_type = "Notification"
+    interest_type = InterestType.public
+    initiator = message.Notification
+
+    def __init__(self, protocol_id):
+        self.service_id = protocol_id
+        self.protocol_id = get_announcement_id(protocol_id)
+
+    def __call__(self, agent, medium):
+        instance = ServiceAnnouncementCollector(agent, medium)
+        instance.protocol_id = self.protocol_id
+        instance.service_id = self.service_id
+        return instance
+
+    def __eq__(self, other):
+        if type(self) != type(other):
+            return NotImplemented
+        return self.protocol_id == other.protocol_id
+
+    def __ne__(self, other):
+        if type(self) != type(other):
+            return NotImplemented
+        return not self.__eq__(other)
+
+
+class ServiceAnnouncementTask(task.StealthPeriodicTask):
+
+    protocol_id = "agent:service-announcement"
+
+    @replay.immutable
+    def run(self, state):
+        state.agent.announce_services()
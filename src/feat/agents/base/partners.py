@@ -392,6 +392,22 @@ class Partners(log.Logger, log.LogProxy, replay.Replayable):
                            (notification_type, )))
         return handler(partner, blackbox, sender)
 
+    @replay.mutable
+    def receive_notifications(self, state, notifications, sender):
+        '''
+        Applies the batch of notifications in the order they were given.
+        Failing notifications are logged and skipped, the same way
+        the replier of a single notification consumes them.
+        @param notifications: list of tuples
+                              (recp, notification_type, blackbox)
+        @return: Fiber fired with the number of processed notifications.
+        '''
+        f = fiber.succeed(0)
+        for recp, notification_type, blackbox in notifications:
+            f.add_callback(self._receive_batched, recp, notification_type,
+                           blackbox, sender)
+        return f
+
     @replay.mutable
     def remove(self, state, partner):
         # FIXME: Two subsequent updates of descriptor.
@@ -440,6 +456,16 @@ class Partners(log.Logger, log.LogProxy, replay.Replayable):
 
     # private
 
+    @replay.mutable
+    def _receive_batched(self, state, done, recp, notification_type,
+                         blackbox, sender):
+        f = fiber.succeed()
+        f.add_callback(fiber.drop_param, self.receive_notification,
+                       recp, notification_type, blackbox, sender)
+        f.add_errback(self._error_handler)
+        f.add_callback(fiber.override_result, done + 1)
+        return f
+
     def _do_breakup(self, partner):
         return self._remove_and_trigger_cb(partner, 'on_breakup')
 
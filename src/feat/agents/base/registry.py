@@ -19,7 +19,7 @@
 # See "LICENSE.GPL" in the source distribution for more information.
 
 # Headers in this file shall remain intact.
-from feat.common import decorator, serialization
+from feat.common import decorator, serialization, reflect
 
 registry = dict()
 
@@ -38,4 +38,61 @@ def register(klass, name, configuration_id=None):
 
 def registry_lookup(name):
     global registry
+    if name not in registry:
+        load(name)
     return registry.get(name, None)
+
+
+def register_lazy(module, *names):
+    '''
+    Declares the agent, descriptor, document, view and type names
+    registered by the module given by its canonical name. The module is
+    imported on the first lookup of one of these names instead of at
+    the start-up. Lookups of the types with canonical names inside
+    the package of the module import it as well.
+    '''
+    global _lazy_names, _lazy_modules
+    for name in names:
+        _lazy_names[name] = module
+    if module not in _lazy_modules:
+        _lazy_modules.append(module)
+
+
+def load(name):
+    '''
+    Imports the module registering the given name if it has been declared
+    with register_lazy() and is not imported yet.
+    @returns: True if a module has been imported.
+    '''
+    global _lazy_names, _lazy_modules
+    module = _lazy_names.get(name)
+    if module is None:
+        for candidate in _lazy_modules:
+            if name.startswith(candidate.rsplit('.', 1)[0] + '.'):
+                module = candidate
+                break
+    if module not in _lazy_modules:
+        return False
+    _lazy_modules.remove(module)
+    reflect.named_module(module)
+    return True
+
+
+def load_all():
+    '''
+    Imports all the modules declared with register_lazy(), needed before
+    iterating over everything registered.
+    '''
+    global _lazy_modules
+    while _lazy_modules:
+        reflect.named_module(_lazy_modules.pop(0))
+
+
+### private ###
+
+# name -> canonical name of the module registering it
+_lazy_names = dict()
+# canonical names of the modules declared lazily and not imported yet
+_lazy_modules = list()
+
+serialization.get_registry().add_loader(load)
@@ -76,6 +76,27 @@ class PartnershipProtocol(BaseReplier):
         state.medium.reply(msg)
 
 
+class PartnershipBatchProtocol(BaseReplier):
+
+    protocol_id = 'partner-notification-batch'
+
+    @replay.journaled
+    def requested(self, state, request):
+        notifications = [(x['origin'], x['type'], x['blackbox'])
+                         for x in request.payload['notifications']]
+        sender = request.reply_to
+
+        f = fiber.succeed(notifications)
+        f.add_callback(state.agent.partner_sent_notifications, sender)
+        f.add_callback(self._send_reply)
+        return f
+
+    @replay.immutable
+    def _send_reply(self, state, done):
+        msg = message.ResponseMessage(payload={"done": done})
+        state.medium.reply(msg)
+
+
 class ProposalReceiver(BaseReplier):
 
     protocol_id = 'lets-pair-up'
@@ -65,6 +65,22 @@ def notify_partner(agent, recp, notification_type, origin, payload,
     return f
 
 
+def notify_partner_batch(agent, recp, notifications, consume_error=False):
+    '''
+    Sends several notifications to the same recipient in a single request.
+    @param notifications: list of tuples (notification_type, origin, payload)
+    @return: Fiber fired with the number of notifications processed
+             by the receiver, the failing ones are logged and skipped
+             there the same way as with L{notify_partner}.
+    '''
+    req = agent.initiate_protocol(PartnershipBatchProtocol, recp,
+                                  notifications)
+    f = req.notify_finish()
+    if consume_error:
+        f.add_errback(Failure.trap, ProtocolFailed)
+    return f
+
+
 ### Private ###
 
 
@@ -140,6 +156,34 @@ class PartnershipProtocol(BaseRequester):
         self.log('Notification expired')
 
 
+class PartnershipBatchProtocol(BaseRequester):
+
+    timeout = 3
+    protocol_id = 'partner-notification-batch'
+
+    @replay.entry_point
+    def initiate(self, state, notifications):
+        batch = list()
+        for notification_type, origin, blackbox in notifications:
+            if notification_type not in PartnershipProtocol.known_types:
+                raise AttributeError(
+                    'Expected notification type to be in %r, got %r' %\
+                    (PartnershipProtocol.known_types, notification_type, ))
+            batch.append({'type': notification_type,
+                          'blackbox': blackbox,
+                          'origin': recipient.IRecipient(origin)})
+        msg = message.RequestMessage(payload={'notifications': batch})
+        state.medium.request(msg)
+
+    @replay.journaled
+    def got_reply(self, state, reply):
+        return reply.payload['done']
+
+    @replay.journaled
+    def closed(self, state):
+        self.log('Batch notification expired')
+
+
 class Propose(BaseRequester):
 
     timeout = 3
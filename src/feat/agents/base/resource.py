@@ -482,6 +482,10 @@ class AgentMixin(object):
     def allocate_resource(self, state, **params):
         return state.resources.allocate(**params)
 
+    @replay.immutable
+    def has_preallocations(self, state):
+        return state.resources.has_preallocations()
+
     @replay.immutable
     def check_allocation_exists(self, state, allocation_id):
         return state.resources.check_allocated(allocation_id)
@@ -583,11 +587,18 @@ class Resources(log.Logger, log.LogProxy, replay.Replayable):
 
     @replay.mutable
     def confirm(self, state, allocation_id):
-        alloc = state.modifications.pop(allocation_id, None)
+        '''
+        The allocation stays reserved in the modifications until the
+        descriptor is updated, so that the preallocations done meanwhile
+        cannot take the same resources.
+        '''
+        alloc = state.modifications.get(allocation_id, None)
         if alloc is None:
             raise AllocationNotFound("Allocation with id=%s not found" %
                                      allocation_id)
-        return self._append_to_descriptor(alloc)
+        f = self._append_to_descriptor(alloc)
+        f.add_both(self._confirmed, allocation_id)
+        return f
 
     @replay.mutable
     def allocate(self, state, **params):
@@ -610,6 +621,14 @@ class Resources(log.Logger, log.LogProxy, replay.Replayable):
         except NotEnoughResource:
             return None
 
+    @replay.immutable
+    def has_preallocations(self, state):
+        '''
+        Check if there are preallocations or modifications which are still
+        waiting to be confirmed or released.
+        '''
+        return len(state.modifications) > 0
+
     @replay.immutable
     def check_allocated(self, state, allocation_id):
         '''
@@ -722,10 +741,25 @@ class Resources(log.Logger, log.LogProxy, replay.Replayable):
 
     ### private ###
 
+    @replay.mutable
+    def _confirmed(self, state, result, allocation_id):
+        state.modifications.pop(allocation_id, None)
+        return result
+
     @replay.immutable
     def _get_confirmed(self, state):
         return state.agent.get_descriptor().allocations
 
+    @replay.immutable
+    def _get_transient(self, state, confirmed):
+        '''
+        Gives the modifications which are not in the confirmed allocations
+        yet, the ones being confirmed are already there once the descriptor
+        is updated.
+        '''
+        return [x for x in state.modifications.itervalues()
+                if x.id not in confirmed]
+
     @replay.immutable
     def _generate_allocation(self, state, **params):
         '''
@@ -782,8 +816,8 @@ class Resources(log.Logger, log.LogProxy, replay.Replayable):
         Gives list of IAllocatedResource objects for the given resource name.
         '''
         resp = list()
-        allocations = self._get_confirmed().values() + \
-                      state.modifications.values()
+        confirmed = self._get_confirmed()
+        allocations = confirmed.values() + self._get_transient(confirmed)
         for alloc in allocations:
             resp.append(alloc.allocated_for(name))
         return filter(None, resp)
@@ -791,7 +825,7 @@ class Resources(log.Logger, log.LogProxy, replay.Replayable):
     @replay.immutable
     def _get_modified(self, state, name):
         allocs = [a.allocated_for(name)
-                  for a in state.modifications.itervalues()]
+                  for a in self._get_transient(self._get_confirmed())]
         return filter(None, allocs)
 
     ### python specific ###
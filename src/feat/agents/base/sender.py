@@ -68,6 +68,10 @@ class NotificationSender(task.StealthPeriodicTask):
 
     protocol_id = 'notification-sender'
 
+    # maximum number of notifications sent in a single request, processing
+    # of the batch on the receiver side has to fit in the request timeout
+    batch_size = 50
+
     @replay.entry_point
     def initiate(self, state, clerk=None, period=None):
         state.clerk = clerk and IClerk(clerk)
@@ -107,20 +111,23 @@ class NotificationSender(task.StealthPeriodicTask):
 
     @replay.mutable
     def _flush_next(self, state, agent_id):
-        notification = self._get_first_pending(agent_id)
-        if notification:
-            recp = notification.recipient
-            f = requester.notify_partner(
-                state.agent, recp, notification.type,
-                notification.origin, notification.payload)
+        notifications = self._get_pending(agent_id)[:type(self).batch_size]
+        if notifications:
+            recp = notifications[0].recipient
+            batch = [(x.type, x.origin, x.payload) for x in notifications]
+            f = requester.notify_partner_batch(state.agent, recp, batch)
             f.add_callbacks(fiber.drop_param, self._sending_failed,
-                            cbargs=(self._sending_cb, recp, notification, ),
+                            cbargs=(self._sending_cb, recp, notifications, ),
                             ebargs=(recp, ))
             return f
 
     @replay.mutable
-    def _sending_cb(self, state, recp, notification):
-        f = self._remove_notification(recp, notification)
+    def _sending_cb(self, state, recp, notifications):
+        # the receiver processes the whole batch, the failing notifications
+        # are logged and skipped on its side
+        f = self._remove_notifications(recp, notifications)
+        # send the rest of the queue and the notifications which might
+        # have been scheduled in the meantime
         f.add_both(fiber.drop_param, self._flush_next, str(recp.key))
         return f
 
@@ -175,27 +182,27 @@ class NotificationSender(task.StealthPeriodicTask):
         return desc.pending_notifications.iteritems()
 
     @replay.immutable
-    def _get_first_pending(self, state, agent_id):
+    def _get_pending(self, state, agent_id):
         desc = state.agent.get_descriptor()
-        pending = desc.pending_notifications.get(agent_id, list())
-        if pending:
-            return pending[0]
+        return list(desc.pending_notifications.get(agent_id, list()))
 
     @replay.journaled
-    def _remove_notification(self, state, recp, notification):
-
-        def do_remove(desc, recp, notification):
-            try:
-                desc.pending_notifications[recp.key].remove(notification)
-                if not desc.pending_notifications[recp.key]:
-                    del(desc.pending_notifications[recp.key])
-            except (ValueError, KeyError, ):
-                self.warning("Tried to remove notification %r for "
-                             "agent_id %r from %r, but not found",
-                             notification, recp.key,
-                             desc.pending_notifications)
-
-        return state.agent.update_descriptor(do_remove, recp, notification)
+    def _remove_notifications(self, state, recp, notifications):
+
+        def do_remove(desc, recp, notifications):
+            pending = desc.pending_notifications.get(recp.key, list())
+            for notification in notifications:
+                try:
+                    pending.remove(notification)
+                except ValueError:
+                    self.warning("Tried to remove notification %r for "
+                                 "agent_id %r from %r, but not found",
+                                 notification, recp.key,
+                                 desc.pending_notifications)
+            if recp.key in desc.pending_notifications and not pending:
+                del(desc.pending_notifications[recp.key])
+
+        return state.agent.update_descriptor(do_remove, recp, notifications)
 
     @replay.journaled
     def _forget_recipient(self, state, recp):
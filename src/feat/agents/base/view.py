@@ -25,7 +25,7 @@ import inspect
 from zope.interface import directlyProvides
 
 from feat.common import formatable, decorator, log, annotate
-from feat.agents.base import document
+from feat.agents.base import document, registry
 
 from feat.interface.view import *
 
@@ -73,21 +73,8 @@ class BaseView(annotate.Annotable):
 
     @classmethod
     def _querymethod(cls, func):
-        source_lines, _ = inspect.getsourcelines(func)
-        decorator_line = re.compile('\A\s*@')
-        leading_whitespace = re.compile('\A\s*')
-        source_lines = [x for x in source_lines
-                        if not decorator_line.search(x)]
-        found = leading_whitespace.search(source_lines[0])
-        if found:
-            count = len(found.group(0))
-            source_lines = [x[count:-1] for x in source_lines
-                            if x and len(x) >= count]
-
-        source = '\n'.join(source_lines)
-        setattr(func, 'source', source)
-        res = staticmethod(func)
-        return res
+        # the source is only extracted when generating the design document
+        return staticmethod(func)
 
 
 class FormatableView(BaseView, formatable.Formatable):
@@ -147,16 +134,42 @@ class DesignDocument(document.Document):
         for view in views:
             view = IViewFactory(view)
             entry = dict()
-            entry['map'] = unicode(view.map.source)
+            entry['map'] = unicode(get_source(view.map))
             if view.use_reduce:
                 if isinstance(view.reduce, (str, unicode, )):
                     red = unicode(view.reduce)
                 else:
-                    red = unicode(view.reduce.source)
+                    red = unicode(get_source(view.reduce))
                 entry['reduce'] = red
             instance.views[view.name] = entry
         return instance
 
 
 def generate_design_doc():
+    # views of the agents not loaded yet have to be included
+    registry.load_all()
     return DesignDocument.generate_from_views(_iterviews())
+
+
+def get_source(func):
+    '''
+    Gives the source of the map or reduce function of a view without
+    the decorators and the indentation, the result is cached.
+    '''
+    source = getattr(func, 'source', None)
+    if source is not None:
+        return source
+    source_lines, _ = inspect.getsourcelines(func)
+    decorator_line = re.compile('\A\s*@')
+    leading_whitespace = re.compile('\A\s*')
+    source_lines = [x for x in source_lines
+                    if not decorator_line.search(x)]
+    found = leading_whitespace.search(source_lines[0])
+    if found:
+        count = len(found.group(0))
+        source_lines = [x[count:-1] for x in source_lines
+                        if x and len(x) >= count]
+
+    source = '\n'.join(source_lines)
+    setattr(func, 'source', source)
+    return source
@@ -21,13 +21,14 @@
 # Headers in this file shall remain intact.
 from feat.agents.base import (requester, replay, message, document,
                               manager, descriptor, )
-from feat.common import fiber
+from feat.common import fiber, enum
 from feat.interface.agent import Access, Address, Storage
 from feat.interface.recipient import IRecipient
 
 
 __all__ = ['start_agent', 'start_agent_in_shard', 'check_categories',
-           'HostDef', 'NoHostFound', 'Descriptor']
+           'match_categories', 'HostDef', 'NoHostFound', 'Descriptor',
+           'Placement', 'get_allocation_cost']
 
 
 class SpecialHostPartnerMixin(object):
@@ -98,6 +99,22 @@ DEFAULT_CATEGORIES = {'access': Access.none,
 DEFAULT_PORTS_RANGES = {'misc': (8000, 9000)}
 
 
+class Placement(enum.Enum):
+    '''
+    Strategy used by the host to price its bids for resource allocation.
+    none      - every bid costs the same, the allocation goes to whichever
+                host is picked first
+    packing   - the fuller the host the cheaper, so that big allocations
+                still find an empty host later on
+    spreading - the emptier the host the cheaper, so that the load is
+                balanced among the hosts
+    '''
+    none, packing, spreading = range(3)
+
+
+DEFAULT_PLACEMENT = Placement.none
+
+
 @document.register
 class HostDef(document.Document):
 
@@ -109,6 +126,8 @@ class HostDef(document.Document):
     # List of ports ranges used for allocating new ports
     # name -> (first, last)
     document.field('ports_ranges', DEFAULT_PORTS_RANGES)
+    # Strategy used to compute the cost of the allocation bids
+    document.field('placement', DEFAULT_PLACEMENT)
 
 
 def start_agent(agent, recp, desc, allocation_id=None, *args, **kwargs):
@@ -140,19 +159,53 @@ def start_agent_in_shard(agent, desc, shard, **kwargs):
 
 
 def check_categories(host, categories):
+    return match_categories(host._get_state().categories, categories)
+
+
+def match_categories(host_categories, categories):
     for name, val in categories.iteritems():
         if ((isinstance(val, Access) and val == Access.none) or
             (isinstance(val, Address) and val == Address.none) or
             (isinstance(val, Storage) and val == Storage.none)):
             continue
 
-        host_categories = host._get_state().categories
         if not (name in host_categories.keys() and
                 host_categories[name] == val):
                 return False
     return True
 
 
+def get_allocation_cost(usage, resources, placement=DEFAULT_PLACEMENT):
+    '''
+    Gives the cost of allocating the resources on a host, the lower the
+    better. It is based on the fraction of the requested resources which
+    would be in use after the allocation.
+    @param usage: resource usage as given by Resources.get_usage()
+    @param resources: dictionary of the resources to allocate
+    @param placement: L{Placement} strategy of the host
+    '''
+    if placement == Placement.none:
+        return 0.0
+    ratios = list()
+    for name, value in resources.iteritems():
+        if name not in usage:
+            continue
+        # the allocated amount already includes the preallocated one
+        total, allocated, _preallocated = usage[name]
+        if not all(isinstance(x, (int, long)) for x in (total, allocated)):
+            # ranges do not tell how full the host is
+            continue
+        if not total:
+            continue
+        ratios.append(float(allocated + value) / total)
+    if not ratios:
+        return 0.0
+    used = sum(ratios) / len(ratios)
+    if placement == Placement.spreading:
+        return used
+    return 1.0 - used
+
+
 def premodify_allocation(agent, host_agent_recipient, allocation_id, **delta):
     return agent.call_remote(host_agent_recipient, "premodify_allocation",
                              allocation_id, **delta)
@@ -19,10 +19,17 @@
 # See "LICENSE.GPL" in the source distribution for more information.
 
 # Headers in this file shall remain intact.
-from feat.agents.base import manager, replay, message, descriptor
+from feat.agents.base import manager, replay, message, descriptor, poster
 from feat.common import error
 
-__all__ = ['allocate_resource', 'AllocationManager', 'discover', 'Descriptor']
+__all__ = ['allocate_resource', 'AllocationManager', 'discover', 'Descriptor',
+           'ResourceSummaryPoster', 'SUMMARY_PERIOD', 'SUMMARY_TTL']
+
+
+# Period in which host agents publish the summary of their resources
+SUMMARY_PERIOD = 10
+# Time after which RAAGE forgets about the host which stopped publishing
+SUMMARY_TTL = 3 * SUMMARY_PERIOD
 
 
 class AllocationFailedError(error.FeatError):
@@ -98,6 +105,21 @@ class AllocationManager(manager.BaseManager):
         return report.payload['allocation_id'], report.reply_to
 
 
+class ResourceSummaryPoster(poster.BasePoster):
+    '''
+    Used by host agents to publish the usage of their resources to
+    the RAAGE of their shard.
+    '''
+
+    protocol_id = 'resource-summary'
+
+    @replay.immutable
+    def pack_payload(self, state, usage, categories, placement=None):
+        return dict(recipient=state.agent.get_own_address(),
+                    usage=usage, categories=categories,
+                    placement=placement)
+
+
 @descriptor.register("raage_agent")
 class Descriptor(descriptor.Descriptor):
     pass
@@ -23,7 +23,8 @@ from zope.interface import Interface, implements
 
 from feat.common import (annotate, decorator, fiber, defer, container,
                          error_handler, serialization, )
-from feat.agents.base import replay, message, requester, replier
+from feat.agents.base import (replay, message, requester, replier,
+                              recipient, )
 
 
 class IRPCClient(Interface):
@@ -58,9 +59,15 @@ class AgentMixin(object):
 
     _published = container.MroDict("_mro_published")
 
-    @replay.immutable
+    # when set, the calls done to the same recipient in one reactor turn
+    # are sent in a single request
+    rpc_pipeline = False
+
+    @replay.mutable
     def initiate(self, state):
         state.medium.register_interest(RPCReplier)
+        state.medium.register_interest(RPCBatchReplier)
+        state.rpc_pipeline = RPCPipeline(self)
 
 
     ### IRPCClient Methods ###
@@ -69,29 +76,46 @@ class AgentMixin(object):
         #FIXME: _timeout should be made deprecated
         timeout = kwargs.pop('_timeout', 10)
         return self.call_remote_ex(recipient, fun_id, args, kwargs,
-                                   timeout=timeout)
+                                   timeout=timeout,
+                                   pipeline=type(self).rpc_pipeline)
 
     @replay.journaled
     def call_remote_ex(self, state, recipient, fun_id,
-                       args=None, kwargs=None, timeout=10):
+                       args=None, kwargs=None, timeout=10, pipeline=False):
         args = args or ()
         kwargs = kwargs or {}
 
+        if pipeline:
+            return state.rpc_pipeline.call(recipient, fun_id,
+                                           args, kwargs, timeout)
+
         f = fiber.Fiber()
         f.add_callback(self.initiate_protocol,
                        recipient, fun_id, *args, **kwargs)
         f.add_callback(RPCRequester.notify_finish)
         return f.succeed(RPCRequesterFactory(timeout))
 
+    @replay.journaled
+    def call_remote_batch(self, state, recipient, calls, timeout=10):
+        '''
+        Performs all the calls given as a list of (fun_id, args, kwargs)
+        in a single request. Results in a list of (succeed, value) tuples,
+        where the value is the exception of the call if it failed.
+        '''
+        f = fiber.Fiber()
+        f.add_callback(self.initiate_protocol, recipient, calls)
+        f.add_callback(RPCBatchRequester.notify_finish)
+        return f.succeed(RPCBatchRequesterFactory(timeout))
+
     ### IRPCServer Methods ###
 
     def call_local(self, fun_id, *args, **kwargs):
-        if not fun_id in self._published:
+        function = self._published.get(fun_id)
+        if function is None:
             raise NotPublishedError("Agent %s do not have any published "
                                     "function named '%s'"
                                     % (type(self).__name__, fun_id))
-        value = self._published[fun_id](self, *args, **kwargs)
-        return value
+        return function(self, *args, **kwargs)
 
     ### Private Methods ###
 
@@ -118,6 +142,98 @@ class RPCRequesterFactory(serialization.Serializable):
         return instance
 
 
+@serialization.register
+class RPCBatchRequesterFactory(RPCRequesterFactory):
+
+    protocol_id = 'rpc-batch'
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.protocol_id = RPCBatchRequester.protocol_id
+
+    def __call__(self, agent, medium):
+        instance = RPCBatchRequester(agent, medium)
+        instance.timeout = self.timeout
+        return instance
+
+
+@serialization.register
+class RPCPipeline(serialization.Serializable):
+    '''
+    I'm an internal object to store the calls waiting to be sent.
+    The calls done to the same recipient in one reactor turn are flushed
+    together in a single batch request.
+    '''
+
+    def __init__(self, agent):
+        # (key, route) -> PendingBatch
+        self._pending = dict()
+        self.agent = agent
+
+    def call(self, recp, fun_id, args, kwargs, timeout):
+        return fiber.wrap_defer(self._enqueue, recp, fun_id,
+                                args, kwargs, timeout)
+
+    ### Private methods ###
+
+    def _enqueue(self, recp, fun_id, args, kwargs, timeout):
+        # Creation of Deferred needs to be outside the ball.
+        # This method should be only run from the fiber
+        recp = recipient.IRecipient(recp)
+        key = (recp.key, recp.route)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = PendingBatch(recp)
+            self._pending[key] = batch
+            self.agent.call_next(self._flush, key)
+        return batch.add(fun_id, args, kwargs, timeout)
+
+    def _flush(self, key):
+        batch = self._pending.pop(key)
+        d = self.agent.call_remote_batch(batch.recipient, batch.calls,
+                                         timeout=batch.timeout)
+        d.addCallbacks(batch.dispatch, batch.fail)
+        return d
+
+    def __eq__(self, other):
+        if type(self) != type(other):
+            return NotImplemented
+        return True
+
+    def __ne__(self, other):
+        if type(self) != type(other):
+            return NotImplemented
+        return False
+
+
+class PendingBatch(object):
+    '''I'm an internal object to store data inside the RPCPipeline.'''
+
+    def __init__(self, recp):
+        self.recipient = recp
+        self.calls = list()
+        self.deferreds = list()
+        self.timeout = 0
+
+    def add(self, fun_id, args, kwargs, timeout):
+        self.calls.append((fun_id, args, kwargs))
+        self.timeout = max(self.timeout, timeout)
+        d = defer.Deferred()
+        self.deferreds.append(d)
+        return d
+
+    def dispatch(self, results):
+        for d, (succeed, value) in zip(self.deferreds, results):
+            if succeed:
+                d.callback(value)
+            else:
+                d.errback(value)
+
+    def fail(self, failure):
+        for d in self.deferreds:
+            d.errback(failure)
+
+
 class RPCRequester(requester.BaseRequester):
 
     protocol_id = 'rpc'
@@ -143,6 +259,23 @@ class RPCRequester(requester.BaseRequester):
         return defer.fail(exc("REMOTE: " + str(msg)))
 
 
+class RPCBatchRequester(requester.BaseRequester):
+
+    protocol_id = 'rpc-batch'
+
+    def init_state(self, state, agent, med):
+        requester.BaseRequester.init_state(self, state, IRPCClient(agent), med)
+
+    @replay.entry_point
+    def initiate(self, state, calls):
+        msg = message.RequestMessage()
+        msg.payload['calls'] = calls
+        state.medium.request(msg)
+
+    def got_reply(self, reply):
+        return [unpack_result(result) for result in reply.payload['results']]
+
+
 class RPCReplier(replier.BaseReplier):
 
     protocol_id = 'rpc'
@@ -175,3 +308,67 @@ class RPCReplier(replier.BaseReplier):
         msg.payload['exception'] = type(failure.value)
         msg.payload['message'] = failure.getErrorMessage()
         state.medium.reply(msg)
+
+
+class RPCBatchReplier(replier.BaseReplier):
+
+    protocol_id = 'rpc-batch'
+
+    def init_state(self, state, agent, medium):
+        replier.BaseReplier.init_state(self, state, IRPCServer(agent), medium)
+
+    @replay.entry_point
+    def requested(self, state, request):
+        f = fiber.succeed(list())
+        for fun_id, args, kwargs in request.payload['calls']:
+            f.add_callback(self._call, fun_id, args, kwargs)
+        f.add_callback(self.got_results)
+        return f
+
+    @replay.journaled
+    def got_results(self, state, results):
+        msg = message.ResponseMessage()
+        msg.payload['results'] = results
+        state.medium.reply(msg)
+
+    ### Private Methods ###
+
+    @replay.immutable
+    def _call(self, state, results, fun_id, args, kwargs):
+        f = fiber.succeed(fun_id)
+        f.add_callback(state.agent.call_local, *args, **kwargs)
+        f.add_callbacks(callback=pack_result, errback=self._pack_failure)
+        f.add_callback(append_result, results)
+        return f
+
+    @replay.immutable
+    def _pack_failure(self, state, failure):
+        error_handler(self, failure)
+        return pack_failure(failure)
+
+
+### Private ###
+
+
+def pack_result(result):
+    return dict(succeed=True, result=result)
+
+
+def pack_failure(failure):
+    return dict(succeed=False, exception=type(failure.value),
+                message=failure.getErrorMessage())
+
+
+def unpack_result(result):
+    if result['succeed']:
+        return True, result['result']
+    exc = result['exception']
+    msg = result['message']
+    if issubclass(exc, RPCException):
+        return False, exc(msg)
+    return False, exc("REMOTE: " + str(msg))
+
+
+def append_result(result, results):
+    results.append(result)
+    return results
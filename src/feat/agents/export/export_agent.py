@@ -24,7 +24,7 @@ import uuid
 import copy
 
 import feat
-from feat.agents.base import (agent, replay, manager, contractor,
+from feat.agents.base import (agent, replay, manager,
                               message, task, document, dbtools, sender, )
 from feat.agents.common import (rpc, export, host, start_agent, )
 from feat.common import (formatable, serialization, log, fiber,
@@ -59,9 +59,8 @@ class ExportAgent(agent.BaseAgent, sender.AgentMixin):
         state.known_migrations = dict()
 
         state.medium.register_interest(protocol.Replier)
-        i = state.medium.register_interest(
-            contractor.Service(protocol.Replier))
-        i.bind_to_lobby()
+        self.register_service(protocol.Replier)
+        self.bind_service_to_lobby(protocol.Replier)
 
     ### methods called by Migration Agent ###
 
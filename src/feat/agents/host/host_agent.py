@@ -27,7 +27,7 @@ from feat.agents.base import (agent, contractor, recipient, message,
                               replay, descriptor, replier,
                               partners, resource, document, notifier,
                               problem, task, requester, )
-from feat.agents.common import host, rpc, monitor, export
+from feat.agents.common import host, rpc, monitor, export, raage
 from feat.agents.common import shard as common_shard
 from feat.agents.common.host import check_categories
 from feat.common import fiber, manhole, serialization, defer
@@ -116,14 +116,21 @@ class HostAgent(agent.BaseAgent, notifier.AgentMixin, resource.AgentMixin):
     def initiate(self, state, hostdef=None):
         state.medium.register_interest(StartAgentReplier)
         state.medium.register_interest(StartAgentContractor)
-        state.medium.register_interest(
-            contractor.Service(StartAgentContractor))
+        self.register_service(StartAgentContractor)
         state.medium.register_interest(HostAllocationContractor)
         state.medium.register_interest(
             problem.SolveProblemInterest(MissingShard))
         state.medium.register_interest(
             problem.SolveProblemInterest(RestartShard))
 
+        state.summary_poster = None
+        state.summary_shard = None
+        state.placement = host.DEFAULT_PLACEMENT
+        # [(event name, resources, expiration time)] of the allocations
+        # waiting for the outstanding preallocations to be resolved
+        state.preallocation_queue = list()
+        state.preallocation_counter = 0
+
         f = fiber.Fiber()
         f.add_callback(fiber.drop_param, self._load_definition, hostdef)
         return f.succeed()
@@ -136,6 +143,7 @@ class HostAgent(agent.BaseAgent, notifier.AgentMixin, resource.AgentMixin):
         if state.partners.shard is None:
             f.add_callback(fiber.drop_param, self.start_join_shard_manager)
         f.add_callback(fiber.drop_param, self.startup_monitoring)
+        f.add_callback(fiber.drop_param, self.startup_resource_summary)
 
         # this agent is restarted by the agency not the monitor agent
         # for this reason we need to mind the restarted notifications
@@ -277,6 +285,57 @@ class HostAgent(agent.BaseAgent, notifier.AgentMixin, resource.AgentMixin):
     def get_ip(self, state):
         return state.medium.get_ip()
 
+    @replay.immutable
+    def get_categories(self, state):
+        return dict(state.categories)
+
+    @replay.immutable
+    def get_placement(self, state):
+        return state.placement
+
+    @replay.immutable
+    def get_allocation_cost(self, state, resources):
+        '''
+        Gives the cost of allocating the resources on this host, taking
+        into account the allocations and preallocations done so far.
+        '''
+        return host.get_allocation_cost(self.get_resource_usage(),
+                                        resources, state.placement)
+
+    @replay.mutable
+    def queue_preallocation(self, state, resources, expiration_time):
+        '''
+        Queues the preallocation of resources which don't fit because of the
+        preallocations still outstanding. The fiber fires with the
+        preallocation or with None if there is nothing left to wait for.
+        '''
+        time_left = expiration_time - self.get_time()
+        if time_left <= 0:
+            return fiber.succeed(None)
+        state.preallocation_counter += 1
+        name = 'preallocation_%d' % (state.preallocation_counter, )
+        state.preallocation_queue.append((name, resources, expiration_time))
+        return self.wait_for_event(name, time_left)
+
+    @replay.mutable
+    def preallocations_resolved(self, state):
+        '''
+        Called when outstanding preallocations are released or confirmed.
+        Serves the queued preallocations in order.
+        '''
+        queue = state.preallocation_queue
+        now = self.get_time()
+        while queue:
+            name, resources, expiration_time = queue[0]
+            # the expired ones have already timed out waiting
+            if expiration_time > now:
+                preallocation = self.preallocate_resource(**resources)
+                if preallocation is None and self.has_preallocations():
+                    # the following ones keep waiting behind this one
+                    break
+                self.callback_event(name, preallocation)
+            del queue[0]
+
     @rpc.publish
     def premodify_allocation(self, allocation_id, **delta):
         return resource.AgentMixin.premodify_allocation(self,
@@ -326,6 +385,27 @@ class HostAgent(agent.BaseAgent, notifier.AgentMixin, resource.AgentMixin):
                 result.append(partner.recipient)
         defer.returnValue(result)
 
+    @replay.mutable
+    def startup_resource_summary(self, state):
+        state.medium.initiate_protocol(ResourceSummaryTask,
+                                       raage.SUMMARY_PERIOD)
+
+    @replay.mutable
+    def publish_resource_summary(self, state):
+        '''
+        Posts the resource usage of the host to the RAAGE of its shard.
+        '''
+        shard = self.get_shard_id()
+        if state.summary_poster is None or state.summary_shard != shard:
+            recp = recipient.Broadcast(
+                raage.ResourceSummaryPoster.protocol_id, shard)
+            state.summary_poster = self.initiate_protocol(
+                raage.ResourceSummaryPoster, recp)
+            state.summary_shard = shard
+        state.summary_poster.notify(self.get_resource_usage(),
+                                    self.get_categories(),
+                                    self.get_placement())
+
     @replay.immutable
     def _load_definition(self, state, hostdef=None):
         if not hostdef:
@@ -351,6 +431,7 @@ class HostAgent(agent.BaseAgent, notifier.AgentMixin, resource.AgentMixin):
         self._setup_resources(hostdef.resources)
         self._setup_categories(hostdef.categories)
         self._setup_ports_ranges(hostdef.ports_ranges)
+        self._setup_placement(hostdef.placement)
 
     @replay.mutable
     def _setup_resources(self, state, resources):
@@ -389,6 +470,14 @@ class HostAgent(agent.BaseAgent, notifier.AgentMixin, resource.AgentMixin):
         for name, (first, last) in ports_ranges.items():
             state.resources.define(name, resource.Range, first, last)
 
+    @replay.mutable
+    def _setup_placement(self, state, placement):
+        if placement is None:
+            return
+
+        self.info("Setting host placement strategy to: %s", placement.name)
+        state.placement = placement
+
     @replay.immutable
     def check_requirements(self, state, doc):
         agnt = agent.registry_lookup(doc.document_type)
@@ -400,6 +489,15 @@ class HostAgent(agent.BaseAgent, notifier.AgentMixin, resource.AgentMixin):
         return doc
 
 
+class ResourceSummaryTask(task.StealthPeriodicTask):
+
+    protocol_id = "host:resource-summary"
+
+    @replay.immutable
+    def run(self, state):
+        state.agent.publish_resource_summary()
+
+
 class StartAgent(task.BaseTask):
 
     timeout = 10
@@ -552,10 +650,15 @@ class HostAllocationContractor(contractor.BaseContractor):
 
     protocol_id = 'allocate-resources'
     interest_type = InterestType.private
-    concurrency = 1
+    # Every announcement being handled keeps its preallocation until the
+    # contract is granted or rejected. Announcements which don't fit meanwhile
+    # are queued by the agent until these preallocations are resolved.
+    concurrency = None
 
     @replay.entry_point
     def announced(self, state, announcement):
+        state.preallocation_id = None
+        state.closed = False
         categories = announcement.payload['categories']
         ret = check_categories(state.agent, categories)
         if state.agent.is_migrating():
@@ -567,23 +670,21 @@ class HostAllocationContractor(contractor.BaseContractor):
             return
 
         resources = announcement.payload['resources']
+        cost = self._get_cost(resources)
         try:
             preallocation = state.agent.preallocate_resource(**resources)
         except resource.UnknownResource:
             self._refuse("Unknown resource! WTF?")
             return
 
-        if preallocation is None:
-            self._refuse("Not enough resource")
-            return
-
-        state.preallocation_id = preallocation.id
-        # Create a bid
-        bid = message.Bid()
-        bid.payload['allocation_id'] = state.preallocation_id
-
-        bid = self._get_cost(bid)
-        state.medium.bid(bid)
+        if preallocation is None and state.agent.has_preallocations():
+            # The bids of the other contracts will mostly be rejected,
+            # releasing their preallocations.
+            f = state.agent.queue_preallocation(resources,
+                                                announcement.expiration_time)
+            f.add_callbacks(self._bid, self._queue_timeout, cbargs=(cost, ))
+            return f
+        return self._bid(preallocation, cost)
 
     @replay.immutable
     def _refuse(self, state, reason):
@@ -591,10 +692,21 @@ class HostAllocationContractor(contractor.BaseContractor):
 
     @replay.mutable
     def release_preallocation(self, state, *_):
-        if state.preallocation_id is not None:
-            return state.agent.release_resource(state.preallocation_id)
+        if state.preallocation_id is None:
+            return
+        allocation_id, state.preallocation_id = state.preallocation_id, None
+        try:
+            return state.agent.release_resource(allocation_id)
+        except resource.AllocationNotFound:
+            self.log("Preallocation %s has already expired.", allocation_id)
+        finally:
+            state.agent.preallocations_resolved()
+
+    @replay.mutable
+    def announce_expired(self, state):
+        state.closed = True
+        return self.release_preallocation()
 
-    announce_expired = release_preallocation
     rejected = release_preallocation
     expired = release_preallocation
 
@@ -607,6 +719,28 @@ class HostAllocationContractor(contractor.BaseContractor):
 
     ### Private ###
 
+    @replay.mutable
+    def _bid(self, state, preallocation, cost):
+        if preallocation is None:
+            self._refuse("Not enough resource")
+            return
+
+        state.preallocation_id = preallocation.id
+        if state.closed:
+            # the announcement expired while the preallocation was queued
+            return self.release_preallocation()
+
+        # Create a bid
+        bid = message.Bid()
+        bid.payload['allocation_id'] = state.preallocation_id
+        bid.payload['cost'] = cost
+        state.medium.bid(bid)
+
+    @replay.immutable
+    def _queue_timeout(self, state, fail):
+        fail.trap(notifier.TimeoutError)
+        self.log("None of the preallocations has been released in time.")
+
     @replay.mutable
     def _granted_failed(self, state, fail):
         msg = "Granted failed with failure %r" % (fail, )
@@ -617,14 +751,16 @@ class HostAllocationContractor(contractor.BaseContractor):
 
     @replay.mutable
     def _finalize(self, state, allocation):
+        state.agent.preallocations_resolved()
         report = message.FinalReport()
         report.payload['allocation_id'] = allocation.id
         state.medium.finalize(report)
 
     @replay.immutable
-    def _get_cost(self, state, bid):
-        bid.payload['cost'] = 0
-        return bid
+    def _get_cost(self, state, resources):
+        # computed before the preallocation is made, it is then included
+        # in the usage of the host
+        return state.agent.get_allocation_cost(resources)
 
 
 class StartAgentReplier(replier.BaseReplier):
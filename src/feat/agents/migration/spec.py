@@ -63,14 +63,21 @@ class ShardStructure(view.FormatableView):
     name = "shard_structure"
 
     def map(doc):
+
+        def text(value):
+            # strings are marked with their type depending on the format
+            # the document was serialized with
+            if isinstance(value, list):
+                return value[-1]
+            return value
+
         if doc['.type'] == 'shard_agent':
             hosts = list()
             for p in doc['partners']:
                 if p['.type'] == 'shard->host':
-                    hosts.append(p['recipient']['key'])
-            yield doc['shard'], dict(agent_id=doc['_id'],
-                                     shard=doc['shard'],
-                                     hosts=hosts)
+                    hosts.append(text(p['recipient']['key']))
+            shard = text(doc['shard'])
+            yield shard, dict(agent_id=doc['_id'], shard=shard, hosts=hosts)
     view.field('agent_id', None)
     view.field('shard', None)
     view.field('hosts', list())
@@ -43,6 +43,10 @@ class Location(object):
         self._paused = False
         self._patients = {} # {AGENT_ID: PatientStatus}
         self._dead = set() # set([AGENT_ID])
+        # Counters updated on each patient state transition
+        self._tracked = {} # {AGENT_ID: (PatientState, PERIOD)}
+        self._counts = {} # {PatientState: COUNT}
+        self._periods = {} # {PatientState: {PERIOD: COUNT}}
 
     ### ILocationStatus ###
 
@@ -56,7 +60,9 @@ class Location(object):
                 if state is None or p.state is state)
 
     def count_patients(self, state=None):
-        return len(list(self.iter_patients(state)))
+        if state is None:
+            return len(self._patients)
+        return self._counts.get(state, 0)
 
     def count_alive(self):
         return self.count_patients(PatientState.alive)
@@ -68,7 +74,7 @@ class Location(object):
         return self.count_patients(PatientState.dead)
 
     def get_recovery_time(self):
-        return max(p.period for p in self._patients.itervalues())
+        return max(self._iter_periods(*self._periods.keys()))
 
     ### protected ###
 
@@ -77,11 +83,15 @@ class Location(object):
         assert agent_id not in self._patients, \
                "Patient already added to location"
         self._patients[agent_id] = patient
+        self._update_counters(patient)
 
     def _remove_patient(self, patient):
         agent_id = patient.recipient.key
         if agent_id in self._patients:
             del self._patients[agent_id]
+        if agent_id in self._tracked:
+            state, period = self._tracked.pop(agent_id)
+            self._count(state, period, -1)
         if agent_id in self._dead:
             self._dead.remove(agent_id)
 
@@ -95,10 +105,12 @@ class Location(object):
     def _patient_dying(self, patient):
         assert patient.recipient.key in self._patients, \
                "Unknown patient dying"
+        self._update_counters(patient)
 
     def _patient_died(self, patient):
         assert patient.recipient.key in self._patients, \
                "Unknown patient died"
+        self._update_counters(patient)
 
         if not self._quarantine_enabled:
             self._notify_death(patient)
@@ -117,6 +129,7 @@ class Location(object):
         agent_id = patient.recipient.key
         assert agent_id in self._patients, \
                "Unknown patient resurrected"
+        self._update_counters(patient)
 
         if agent_id in self._dead:
             # not dead anymore, so cleanup notification flag
@@ -182,8 +195,8 @@ class Location(object):
         if self.count_dead() > 0 or self.count_dying() > 0:
             if self.state is not LocationState.recovering:
                 self._set_state(LocationState.recovering)
-            return max(p.period for p in self._patients.itervalues()
-                       if p.state is not PatientState.alive)
+            return max(self._iter_periods(PatientState.dying,
+                                          PatientState.dead))
         return 0
 
     def _quarantine_lifted(self):
@@ -196,6 +209,31 @@ class Location(object):
         self.state = state
         self._clerk._location_state_changed(self)
 
+    def _update_counters(self, patient):
+        agent_id = patient.recipient.key
+        current = (patient.state, patient.period)
+        previous = self._tracked.get(agent_id)
+        if previous == current:
+            return
+        if previous is not None:
+            self._count(previous[0], previous[1], -1)
+        self._count(current[0], current[1], 1)
+        self._tracked[agent_id] = current
+
+    def _count(self, state, period, delta):
+        self._counts[state] = self._counts.get(state, 0) + delta
+        periods = self._periods.setdefault(state, {})
+        count = periods.get(period, 0) + delta
+        if count:
+            periods[period] = count
+        else:
+            del periods[period]
+
+    def _iter_periods(self, *states):
+        for state in states:
+            for period in self._periods.get(state, ()):
+                yield period
+
     def _notify_death(self, patient):
         if self._paused:
             # We are paused, do not notify any death
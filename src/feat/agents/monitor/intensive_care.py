@@ -167,11 +167,10 @@ class IntensiveCare(labour.BaseLabour):
             if before == after:
                 continue
 
-            if before == PatientState.alive:
-                if after == PatientState.dying:
-                    self.log("Agent %s heart not responding", agent_id)
-                    self._doctor.on_patient_dying(patient)
-                    continue
+            if after == PatientState.dying:
+                self.log("Agent %s heart not responding", agent_id)
+                self._doctor.on_patient_dying(patient)
+                continue
 
             if after == PatientState.dead:
                 self.log("Agent %s heart failed", agent_id)
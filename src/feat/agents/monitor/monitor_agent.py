@@ -27,7 +27,7 @@ import operator
 from zope.interface import implements
 
 from feat.agents.base import agent, partners, document, replay
-from feat.agents.base import dependency, problem, task, contractor, requester
+from feat.agents.base import dependency, problem, task, requester
 from feat.agents.base import dbtools, sender
 from feat.agents.common import host, rpc, shard, monitor, export, start_agent
 from feat.agents.monitor import intensive_care, clerk, simulation
@@ -194,9 +194,8 @@ class MonitorAgent(agent.BaseAgent, sender.AgentMixin,
         shard.register_for_notifications(self)
 
         solver = problem.SolveProblemInterest(DeadAgent())
-        service = contractor.Service("monitoring")
         state.medium.register_interest(solver)
-        state.medium.register_interest(service)
+        self.register_service("monitoring")
 
         config = state.medium.get_configuration()
         control_period = config.control_period
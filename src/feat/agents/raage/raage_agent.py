@@ -23,9 +23,9 @@
 # vi:si:et:sw=4:sts=4:ts=4
 
 from feat.agents.base import (agent, contractor, manager, partners,
-                              message, replay, )
-from feat.agents.common import rpc, shard, monitor, export
-from feat.common import fiber, serialization
+                              message, replay, collector, labour, )
+from feat.agents.common import rpc, shard, monitor, export, host, raage
+from feat.common import fiber, serialization, container
 from feat.interface.contracts import ContractState
 from feat.interface.protocols import InterestType
 
@@ -50,11 +50,16 @@ class ResourcesAllocationAgent(agent.BaseAgent):
 
     migratability = export.Migratability.locally
 
+    # number of hosts taken from the capacity index to ask for allocation
+    candidates_count = 3
+
     @replay.mutable
     def initiate(self, state):
-        state.medium.register_interest(
-            contractor.Service(AllocationContractor))
+        state.capacity_index = CapacityIndex(self)
+
+        self.register_service(AllocationContractor)
         state.medium.register_interest(AllocationContractor)
+        state.medium.register_interest(ResourceSummaryCollector)
 
     def startup(self):
         self.startup_monitoring()
@@ -67,6 +72,111 @@ class ResourcesAllocationAgent(agent.BaseAgent):
     def get_neighbours(self, state):
         return shard.query_structure(self, 'raage_agent', distance=1)
 
+    @replay.immutable
+    def update_capacity(self, state, summary):
+        state.capacity_index.update(summary)
+
+    @replay.immutable
+    def reserve_capacity(self, state, recp, resources):
+        state.capacity_index.reserve(recp, resources)
+
+    @replay.immutable
+    def get_allocation_candidates(self, state, resources, categories):
+        return state.capacity_index.get_candidates(
+            resources, categories, type(self).candidates_count)
+
+
+@serialization.register
+class CapacityIndex(labour.BaseLabour):
+    '''
+    Soft state index of the resources of the hosts in the shard, fed by the
+    summaries the hosts publish periodically. Entries of the hosts which
+    stopped publishing expire. It is kept out of the agent state, the same
+    way the monitor keeps the heart beats of its patients.
+    '''
+
+    def __init__(self, patron):
+        labour.BaseLabour.__init__(self, patron)
+        # host agent_id -> resource summary published by the host
+        self._summaries = container.ExpDict(patron)
+
+    @replay.side_effect
+    def update(self, summary):
+        self._summaries.set(summary['recipient'].key, summary,
+                            expiration=raage.SUMMARY_TTL, relative=True)
+
+    @replay.side_effect
+    def reserve(self, recp, resources):
+        '''
+        Accounts the allocation in the index so that the following
+        allocations don't pick the host basing on the outdated summary.
+        '''
+        summary = self._summaries.get(recp.key)
+        if summary is None:
+            return
+        usage = summary['usage']
+        for name, value in resources.iteritems():
+            if name in usage and _is_scalar(usage[name]):
+                total, allocated, preallocated = usage[name]
+                usage[name] = (total, allocated + value, preallocated)
+
+    @replay.side_effect
+    def get_candidates(self, resources, categories, count):
+        '''
+        Returns the list of recipients of at most count hosts which can fit
+        the resources, the cheapest first according to the cost they
+        would bid with their placement strategy. Hosts bidding the same
+        cost are ordered by their free capacity.
+        '''
+        candidates = list()
+        for key, summary in self._summaries.iteritems():
+            if not host.match_categories(summary['categories'], categories):
+                continue
+            usage = summary['usage']
+            free = _get_free_ratio(usage, resources)
+            if free is None:
+                continue
+            placement = summary.get('placement') or host.DEFAULT_PLACEMENT
+            cost = host.get_allocation_cost(usage, resources, placement)
+            candidates.append((cost, -free, key, summary['recipient']))
+        candidates.sort()
+        return [x[3] for x in candidates[:count]]
+
+
+def _is_scalar(usage):
+    return all(isinstance(x, (int, long)) for x in usage)
+
+
+def _get_free_ratio(usage, resources):
+    '''
+    Returns the fraction of the requested resources which would remain free
+    after the allocation or None if the resources do not fit.
+    '''
+    ratios = list()
+    for name, value in resources.iteritems():
+        if name not in usage:
+            return None
+        if not _is_scalar(usage[name]):
+            # ranges are checked by the host itself
+            continue
+        # the allocated amount already includes the preallocated one
+        total, allocated, _preallocated = usage[name]
+        free = total - allocated - value
+        if free < 0:
+            return None
+        ratios.append(float(free) / total if total else 0.0)
+    return min(ratios) if ratios else 0.0
+
+
+class ResourceSummaryCollector(collector.BaseCollector):
+
+    protocol_id = raage.ResourceSummaryPoster.protocol_id
+    interest_type = InterestType.public
+
+    @replay.immutable
+    def notified(self, state, msg):
+        state.agent.update_capacity(msg.payload)
+
 
 class EmptyBids(Exception):
     pass
@@ -79,6 +189,7 @@ class AllocationContractor(contractor.NestingContractor):
 
     @replay.entry_point
     def announced(self, state, announcement):
+        state.resources = announcement.payload['resources']
         f = fiber.Fiber()
         f.add_callback(fiber.drop_param,
                        self._ask_own_shard, announcement)
@@ -90,6 +201,27 @@ class AllocationContractor(contractor.NestingContractor):
 
     @replay.mutable
     def _ask_own_shard(self, state, announcement):
+        resources = announcement.payload['resources']
+        categories = announcement.payload['categories']
+        candidates = state.agent.get_allocation_candidates(resources,
+                                                           categories)
+        if not candidates:
+            return self._ask_all_hosts(announcement)
+
+        f = self._start_manager(candidates, announcement.duplicate())
+        f.add_callback(self._check_candidates_bids, announcement)
+        return f
+
+    @replay.mutable
+    def _check_candidates_bids(self, state, bids, announcement):
+        if bids:
+            return bids
+        self.log("None of the hosts picked from the capacity index bid, "
+                 "asking all the hosts in the shard.")
+        return self._ask_all_hosts(announcement)
+
+    @replay.mutable
+    def _ask_all_hosts(self, state, announcement):
         f = state.agent.get_list_of_hosts_in_shard()
         f.add_callback(self._start_manager, announcement.duplicate())
         return f
@@ -126,6 +258,7 @@ class AllocationContractor(contractor.NestingContractor):
         else:
             state.host_manager.elect(bid)
             state.host_manager.terminate()
+            state.agent.reserve_capacity(bid.reply_to, state.resources)
             self.handover(bid)
 
 
@@ -186,14 +186,11 @@ class ShardAgent(agent.BaseAgent, notifier.AgentMixin, resource.AgentMixin,
         state.resources.define('neighbours',
                                resource.Scalar, config.neighbours)
 
-        state.join_interest =\
-            state.medium.register_interest(
-            contractor.Service(JoinShardContractor))
+        state.join_interest = self.register_service(JoinShardContractor)
         state.medium.register_interest(JoinShardContractor)
 
-        state.neighbour_interest =\
-            state.medium.register_interest(
-            contractor.Service(FindNeighboursContractor))
+        state.neighbour_interest = \
+            self.register_service(FindNeighboursContractor)
         state.medium.register_interest(FindNeighboursContractor)
 
         state.medium.register_interest(QueryStructureContractor)
@@ -365,15 +362,15 @@ class ShardAgent(agent.BaseAgent, notifier.AgentMixin, resource.AgentMixin,
     @replay.mutable
     def become_king(self, state):
         if not self.is_king():
-            state.neighbour_interest.bind_to_lobby()
-            state.join_interest.bind_to_lobby()
+            self.bind_service_to_lobby(FindNeighboursContractor)
+            self.bind_service_to_lobby(JoinShardContractor)
             state.role = ShardAgentRole.king
 
     @replay.mutable
     def become_peasant(self, state):
         if not self.is_peasant():
-            state.neighbour_interest.unbind_from_lobby()
-            state.join_interest.unbind_from_lobby()
+            self.unbind_service_from_lobby(FindNeighboursContractor)
+            self.unbind_service_from_lobby(JoinShardContractor)
             state.role = ShardAgentRole.peasant
 
     @replay.immutable
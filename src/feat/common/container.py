@@ -20,6 +20,7 @@
 
 # Headers in this file shall remain intact.
 import heapq
+import weakref
 
 from zope.interface import implements, classProvides
 
@@ -27,7 +28,7 @@ from feat.common import serialization
 from feat.interface.generic import *
 
 
-__all__ = ("MroDict", "Empty", "ExpDict", "ExpQueue")
+__all__ = ("MroDict", "Empty", "ExpDict", "ExpQueue", "OrderedDict")
 
 PRECISION = 1e3
 MAX_LAZY_PACK_PER_SECOND = 1
@@ -39,25 +40,34 @@ class MroDict(object):
     I'm aware of MRO and show different values depending from which class
     i'm accessed.
 
-    NOTE: Keep in mind that accessible mro dictionary in results in two
-    dictionaries being instantiated. The is expensive operation, in case of
-    performing multiple operations in single method it is recommended to
-    assign it to local variable.
+    The resolved dictionary is cached per owner class, the cache is dropped
+    whenever one of the classes sharing me is modified through the returned
+    dictionary. NOTE: Keep in mind that the returned dictionary is shared
+    between all the accesses done from the same class, do not modify it
+    other way than setting or deleting items.
     """
 
     def __init__(self, tag):
         self._tag = tag
+        # owner class -> ProxyDict
+        self._cache = weakref.WeakKeyDictionary()
 
     ### descriptor protocol ###
 
     def __get__(self, obj, owner):
+        result = self._cache.get(owner)
+        if result is not None:
+            return result
+
         klasses = owner.mro()
         klasses.reverse()
 
         kwargs = dict()
         for klass in klasses:
             kwargs.update(getattr(klass, self._tag, dict()))
-        return ProxyDict(self._get_tag(owner), kwargs)
+        result = ProxyDict(self._get_tag(owner), kwargs, self._invalidate)
+        self._cache[owner] = result
+        return result
 
     def __set__(self, instance, value):
         return NotImplemetedError(
@@ -74,23 +84,121 @@ class MroDict(object):
             setattr(cls, self._tag, dict())
         return getattr(cls, self._tag)
 
+    def _invalidate(self):
+        # a change in a base class is visible from all its subclasses
+        self._cache.clear()
+
 
 class ProxyDict(dict):
     '''
     Delegates mutating methods to the owner which is part of the big object.
     '''
 
-    def __init__(self, owner, kwargs):
+    def __init__(self, owner, kwargs, on_change=None):
         dict.__init__(self, kwargs.iteritems())
         self._owner = owner
+        self._on_change = on_change
 
     def __setitem__(self, key, value):
         self._owner.__setitem__(key, value)
         dict.__setitem__(self, key, value)
+        self._changed()
 
     def __delitem__(self, key):
         self._owner.__delitem__(key)
         dict.__delitem__(self, key)
+        self._changed()
+
+    def _changed(self):
+        if self._on_change is not None:
+            self._on_change()
+
+
+class _OrderedDict(dict):
+    """
+    Dictionary remembering the insertion order of its keys, used as
+    OrderedDict with Python 2.6 which does not provide one.
+    Only the methods used in feat are supported, all of them in
+    constant time except the iterations.
+    """
+
+    def __init__(self):
+        dict.__init__(self)
+        # key -> [previous link, next link, key], the circular list
+        # starts and ends with the sentinel
+        self._links = {}
+        self._root = root = []
+        root[:] = [root, root, None]
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            root = self._root
+            last = root[0]
+            last[1] = root[0] = self._links[key] = [last, root, key]
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        prev_link, next_link, _ = self._links.pop(key)
+        prev_link[1] = next_link
+        next_link[0] = prev_link
+
+    def __iter__(self):
+        root = self._root
+        link = root[1]
+        while link is not root:
+            yield link[2]
+            link = link[1]
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.items())
+
+    def clear(self):
+        dict.clear(self)
+        self._links.clear()
+        root = self._root
+        root[:] = [root, root, None]
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def popitem(self, last=True):
+        if not self:
+            raise KeyError('dictionary is empty')
+        link = self._root[0] if last else self._root[1]
+        key = link[2]
+        return key, self.pop(key)
+
+    iterkeys = __iter__
+
+    def keys(self):
+        return list(self)
+
+    def itervalues(self):
+        for key in self:
+            yield self[key]
+
+    def values(self):
+        return list(self.itervalues())
+
+    def iteritems(self):
+        for key in self:
+            yield key, self[key]
+
+    def items(self):
+        return list(self.iteritems())
+
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    OrderedDict = _OrderedDict
 
 
 class Empty(Exception):
@@ -181,6 +181,26 @@ class Notifier(object):
         self._store(notification, d)
         return d
 
+    def wait_any(self, *notifications):
+        '''
+        Returns a Deferred fired by the first of the notifications.
+        When it fires it is unregistered from the other notifications,
+        so they do not keep references to it until they happen.
+        '''
+        d = Deferred()
+        notifications = set(notifications)
+        for notification in notifications:
+            self._store(notification, d)
+        if len(notifications) > 1:
+            d.addBoth(self._discard, d, notifications)
+        return d
+
+    def clear(self):
+        '''
+        Forgets all the pending Deferreds, they will never be fired.
+        '''
+        self._notifications.clear()
+
     def callback(self, notification, result):
         notifications = self._pop(notification)
         if notifications:
@@ -201,3 +221,12 @@ class Notifier(object):
     def _pop(self, notification):
         if notification in self._notifications:
             return self._notifications.pop(notification)
+
+    def _discard(self, result, d, notifications):
+        for notification in notifications:
+            pending = self._notifications.get(notification)
+            if pending and d in pending:
+                pending.remove(d)
+                if not pending:
+                    del self._notifications[notification]
+        return result
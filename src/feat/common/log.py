@@ -43,6 +43,21 @@ def get_default():
     return _default_keeper
 
 
+def is_enabled(category, level):
+    '''
+    Tells if the entries of given category and level pass the filter
+    set with FluLogKeeper.set_debug(). The level of the categories is
+    cached until the filter changes.
+    '''
+    global _category_levels
+    try:
+        return level <= _category_levels[category]
+    except KeyError:
+        threshold = _get_category_level(category)
+        _category_levels[category] = threshold
+        return level <= threshold
+
+
 def create_logger(category="feat"):
     global _default_keeper
     return Logger(_default_keeper, log_category=category)
@@ -58,27 +73,32 @@ def logex(category, level, format, args=(), depth=1, log_name=None,
 
 def log(category, format, *args):
     global _default_keeper
-    _default_keeper.do_log(LogLevel.log, None, category, format, args)
+    if _default_keeper.is_enabled(category, LogLevel.log):
+        _default_keeper.do_log(LogLevel.log, None, category, format, args)
 
 
 def debug(category, format, *args):
     global _default_keeper
-    _default_keeper.do_log(LogLevel.debug, None, category, format, args)
+    if _default_keeper.is_enabled(category, LogLevel.debug):
+        _default_keeper.do_log(LogLevel.debug, None, category, format, args)
 
 
 def info(category, format, *args):
     global _default_keeper
-    _default_keeper.do_log(LogLevel.info, None, category, format, args)
+    if _default_keeper.is_enabled(category, LogLevel.info):
+        _default_keeper.do_log(LogLevel.info, None, category, format, args)
 
 
 def warning(category, format, *args):
     global _default_keeper
-    _default_keeper.do_log(LogLevel.warning, None, category, format, args)
+    if _default_keeper.is_enabled(category, LogLevel.warning):
+        _default_keeper.do_log(LogLevel.warning, None, category, format, args)
 
 
 def error(category, format, *args):
     global _default_keeper
-    _default_keeper.do_log(LogLevel.error, None, category, format, args)
+    if _default_keeper.is_enabled(category, LogLevel.error):
+        _default_keeper.do_log(LogLevel.error, None, category, format, args)
 
 
 class Logger(object):
@@ -108,29 +128,36 @@ class Logger(object):
 
     def logex(self, level, format, args, depth=1,
               file_path=None, line_num=None):
-        self._logger.do_log(level, self.log_name,
-                            self.log_category, format, args, depth=depth+1,
-                            file_path=file_path, line_num=line_num)
+        if self._logger.is_enabled(self.log_category, level):
+            self._logger.do_log(level, self.log_name,
+                                self.log_category, format, args,
+                                depth=depth+1, file_path=file_path,
+                                line_num=line_num)
 
     def log(self, format, *args):
-        self._logger.do_log(LogLevel.log, self.log_name,
-                            self.log_category, format, args)
+        if self._logger.is_enabled(self.log_category, LogLevel.log):
+            self._logger.do_log(LogLevel.log, self.log_name,
+                                self.log_category, format, args)
 
     def debug(self, format, *args):
-        self._logger.do_log(LogLevel.debug, self.log_name,
-                            self.log_category, format, args)
+        if self._logger.is_enabled(self.log_category, LogLevel.debug):
+            self._logger.do_log(LogLevel.debug, self.log_name,
+                                self.log_category, format, args)
 
     def info(self, format, *args):
-        self._logger.do_log(LogLevel.info, self.log_name,
-                            self.log_category, format, args)
+        if self._logger.is_enabled(self.log_category, LogLevel.info):
+            self._logger.do_log(LogLevel.info, self.log_name,
+                                self.log_category, format, args)
 
     def warning(self, format, *args):
-        self._logger.do_log(LogLevel.warning, self.log_name,
-                            self.log_category, format, args)
+        if self._logger.is_enabled(self.log_category, LogLevel.warning):
+            self._logger.do_log(LogLevel.warning, self.log_name,
+                                self.log_category, format, args)
 
     def error(self, format, *args):
-        self._logger.do_log(LogLevel.error, self.log_name,
-                            self.log_category, format, args)
+        if self._logger.is_enabled(self.log_category, LogLevel.error):
+            self._logger.do_log(LogLevel.error, self.log_name,
+                                self.log_category, format, args)
 
 
 class LogProxy(object):
@@ -146,6 +173,9 @@ class LogProxy(object):
         self._logkeeper.do_log(level, object, category, format, args,
                depth=depth+1, file_path=file_path, line_num=line_num)
 
+    def is_enabled(self, category, level):
+        return self._logkeeper.is_enabled(category, level)
+
     def redirect_log(self, logkeeper):
         self._logkeeper = ILogKeeper(logkeeper)
 
@@ -157,6 +187,9 @@ class VoidLogKeeper(object):
     def do_log(self, *args):
         pass
 
+    def is_enabled(self, category, level):
+        return False
+
 
 class FluLogKeeper(object):
     '''Log keeper using flumotion logging library.
@@ -186,6 +219,7 @@ class FluLogKeeper(object):
             if get_default() is None:
                 set_default(cls())
             cls._initialized = True
+            _category_levels.clear()
 
     @classmethod
     def redirect_to(cls, stdout, stderr):
@@ -206,6 +240,7 @@ class FluLogKeeper(object):
     def set_debug(self, string):
         global flulog
         flulog.setDebug(string)
+        _category_levels.clear()
 
     @classmethod
     def get_debug(self):
@@ -217,8 +252,26 @@ class FluLogKeeper(object):
     def do_log(self, level, object, category, format, args,
                depth=-1, file_path=None, line_num=None):
         global flulog
+        if not is_enabled(category, level):
+            return
         flulog.doLog(int(level), object, category, format, args,
                      where=depth, filePath=file_path, line=line_num)
 
+    def is_enabled(self, category, level):
+        return is_enabled(category, level)
+
+
+### private ###
 
 _default_keeper = None
+
+# category -> maximum level logged
+_category_levels = {}
+
+
+def _get_category_level(category):
+    global flulog
+    if not FluLogKeeper._initialized:
+        # nothing is filtered before the library is initialized
+        return int(LogLevel.log)
+    return flulog.getCategoryLevel(category or 'feat')
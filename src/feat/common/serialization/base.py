@@ -93,7 +93,7 @@ def register(restorator):
 
 def lookup(type_name):
     global _global_registry
-    return _global_registry.lookup_restorator(type_name)
+    return _global_registry.lookup(type_name)
 
 
 def get_registry():
@@ -220,6 +220,13 @@ class Registry(object):
 
     def __init__(self):
         self._restorators = {} # {TYPE_NAME: IRestorator}
+        self._loaders = []
+
+    def add_loader(self, loader):
+        """Adds a callable called with the type name when looking up
+        a type not registered yet. It should load the module registering
+        the type and return True if it has loaded anything."""
+        self._loaders.append(loader)
 
     ### IRegistry ###
 
@@ -228,7 +235,12 @@ class Registry(object):
         self._restorators[r.type_name] = r
 
     def lookup(self, type_name):
-        return self._restorators.get(type_name)
+        restorator = self._restorators.get(type_name)
+        if restorator is None:
+            for loader in self._loaders:
+                if loader(type_name):
+                    return self._restorators.get(type_name)
+        return restorator
 
 
 class Externalizer(object):
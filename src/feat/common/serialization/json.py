@@ -39,6 +39,8 @@ TYPE_ATOM = u".type"
 EXTERNAL_ATOM = u".ext"
 REFERENCE_ATOM = u".ref"
 DEREFERENCE_ATOM = u".deref"
+UNICODE_ATOM = u".unicode"
+FORMAT_ATOM = u".format"
 
 INSTANCE_TYPE_ATOM = u".type"
 INSTANCE_STATE_ATOM = u".state"
@@ -46,6 +48,17 @@ INSTANCE_STATE_ATOM = u".state"
 DEFAULT_ENCODING = "UTF8"
 ALLOWED_CODECS = set(["UTF8", "UTF-8", "utf8"])
 
+# Format of the documents where the byte strings are plain JSON strings
+# and the unicode values are marked, documents without format are
+# considered to use the original encoding where it is the other way round.
+COMPACT_FORMAT = 2
+
+# Byte strings with these values have to be encoded to not be mistaken
+# for an atom when they are the first element of a list.
+ATOMS = set([TUPLE_ATOM, BYTES_ATOM, ENCODED_ATOM, SET_ATOM, ENUM_ATOM,
+             TYPE_ATOM, EXTERNAL_ATOM, REFERENCE_ATOM, DEREFERENCE_ATOM,
+             UNICODE_ATOM])
+
 JSON_CONVERTER_CAPS = set([Capabilities.int_values,
                            Capabilities.long_values,
                            Capabilities.enum_values,
@@ -73,11 +86,19 @@ JSON_FREEZER_CAPS = JSON_CONVERTER_CAPS \
 
 
 class Serializer(base.Serializer):
+    """
+    If compact is True the documents (dictionaries and instances) are
+    serialized in the compact format, where the byte strings valid in the
+    default encoding are plain JSON strings. The document is marked with
+    the format and the unicode values are marked instead, except for
+    the CouchDB reserved fields of the document (starting with underscore)
+    which are always unicode.
+    """
 
     pack_dict = dict
 
     def __init__(self, indent=None, separators=None, externalizer=None,
-                 source_ver=None, target_ver=None):
+                 source_ver=None, target_ver=None, compact=False):
         base.Serializer.__init__(self, converter_caps=JSON_CONVERTER_CAPS,
                                  freezer_caps=JSON_FREEZER_CAPS,
                                  externalizer=externalizer,
@@ -85,10 +106,30 @@ class Serializer(base.Serializer):
                                  target_ver=target_ver)
         self._indent = indent
         self._separators = separators
+        self._compact = compact
+        self._compacting = False
+
+    ### IConverter ###
+
+    def convert(self, data):
+        if not (self._compact and _is_document(data)):
+            return base.Serializer.convert(self, data)
+        self._compacting = True
+        try:
+            return base.Serializer.convert(self, data)
+        finally:
+            self._compacting = False
 
     ### Overridden Methods ###
 
     def post_convertion(self, data):
+        if self._compacting:
+            document = _get_document(data)
+            for key, value in document.iteritems():
+                if key.startswith("_") and isinstance(value, list) \
+                   and value and value[0] == UNICODE_ATOM:
+                    document[key] = value[1]
+            document[FORMAT_ATOM] = COMPACT_FORMAT
         return json.dumps(data, indent=self._indent,
                           separators=self._separators)
 
@@ -97,8 +138,9 @@ class Serializer(base.Serializer):
             raise TypeError("Serializer %s is not capable of serializing "
                             "non-string dictionary keys: %r"
                             % (reflect.canonical_name(self), key))
-        # Flatten it as unicode by using the selected encoding
-        return self.pack_unicode, key.decode(DEFAULT_ENCODING)
+        # JSON module decodes byte strings using the default encoding
+        # and keys are always byte strings when unserializing
+        return None, key
 
     def pack_tuple(self, data):
         # JSON do not support tuple so we just fake it
@@ -108,10 +150,17 @@ class Serializer(base.Serializer):
         # we try to decode the string from default encoding
         try:
             value = data.decode(DEFAULT_ENCODING)
-            return [ENCODED_ATOM, DEFAULT_ENCODING, value]
         except UnicodeDecodeError:
             # if it fail store it as base64 encoded bytes
             return [BYTES_ATOM, data.encode(BYTES_ENCODING).strip()]
+        if self._compacting and value not in ATOMS:
+            return value
+        return [ENCODED_ATOM, DEFAULT_ENCODING, value]
+
+    def pack_unicode(self, data):
+        if self._compacting:
+            return [UNICODE_ATOM, data]
+        return data
 
     def pack_set(self, data):
         return [SET_ATOM] + data
@@ -165,6 +214,9 @@ class Unserializer(base.Unserializer):
     pass_through_types = set([str, unicode, int, long,
                               float, bool, type(None)])
 
+    # in compact documents plain strings have to be encoded back
+    compact_pass_through_types = pass_through_types - set([unicode])
+
     def __init__(self, registry=None, externalizer=None,
                  source_ver=None, target_ver=None):
         base.Unserializer.__init__(self, converter_caps=JSON_CONVERTER_CAPS,
@@ -176,9 +228,29 @@ class Unserializer(base.Unserializer):
     ### Overridden Methods ###
 
     def pre_convertion(self, data):
-        return json.loads(data)
+        return self.check_format(json.loads(data))
+
+    def reset(self):
+        base.Unserializer.reset(self)
+        self.pass_through_types = type(self).pass_through_types
+
+    def check_format(self, data):
+        document = _get_document(data)
+        if document is None or FORMAT_ATOM not in document:
+            return data
+        version = document.pop(FORMAT_ATOM)
+        if version != COMPACT_FORMAT:
+            raise ValueError("Unsupported document format: %r" % version)
+        for key, value in document.iteritems():
+            if key.startswith("_") and isinstance(value, unicode):
+                document[key] = [UNICODE_ATOM, value]
+        self.pass_through_types = self.compact_pass_through_types
+        return data
 
     def analyse_data(self, data):
+        if isinstance(data, unicode):
+            return None, Unserializer.unpack_str
+
         if isinstance(data, dict):
             if INSTANCE_TYPE_ATOM in data:
                 return data[INSTANCE_TYPE_ATOM], Unserializer.unpack_instance
@@ -235,6 +307,13 @@ class Unserializer(base.Unserializer):
             raise ValueError("Unsupported codec: %r" % codec)
         return bytes.encode(codec)
 
+    def unpack_str(self, data):
+        return data.encode(DEFAULT_ENCODING)
+
+    def unpack_unicode(self, data):
+        _, value = data
+        return value
+
     def unpack_bytes(self, data):
         _, bytes = data
         return bytes.decode(BYTES_ENCODING)
@@ -254,6 +333,7 @@ class Unserializer(base.Unserializer):
 
     _list_unpackers = {BYTES_ATOM: (None, unpack_bytes),
                        ENCODED_ATOM: (None, unpack_encoded),
+                       UNICODE_ATOM: (None, unpack_unicode),
                        ENUM_ATOM: (None, unpack_enum),
                        TYPE_ATOM: (None, unpack_type),
                        TUPLE_ATOM: (None, unpack_tuple),
@@ -267,7 +347,7 @@ class PaisleyUnserializer(Unserializer):
     '''Hack to cope with Paisley performing json.loads on its own.'''
 
     def pre_convertion(self, data):
-        return data
+        return self.check_format(data)
 
 
 def serialize(value):
@@ -287,5 +367,19 @@ def unserialize(data):
 
 ### Private Stuff ###
 
+
+def _is_document(value):
+    return isinstance(value, dict) or ISerializable.providedBy(value)
+
+
+def _get_document(data):
+    # the top level instance is wrapped in a reference
+    # if it is referenced from inside itself
+    if isinstance(data, list) and len(data) == 3 \
+       and data[0] == REFERENCE_ATOM:
+        data = data[2]
+    if isinstance(data, dict):
+        return data
+
 _serializer = Serializer()
 _unserializer = Unserializer()
@@ -107,7 +107,8 @@ def _handler_int(signum, frame):
 
     old_handler, handlers = _handlers[signum]
 
-    for handler in handlers:
+    # the handlers may unregister and register themselves again
+    for handler in list(handlers):
         handler(signum, frame)
     if callable(old_handler):
         old_handler(signum, frame)
@@ -21,10 +21,14 @@
 # Headers in this file shall remain intact.
 # -*- Mode: Python -*-
 # vi:si:et:sw=4:sts=4:ts=4
+import heapq
+import math
 import sys
+import weakref
 
 from zope.interface import implements
-from twisted.internet import reactor
+from twisted.internet import reactor, error
+from twisted.python import log as twisted_log
 
 from feat import hacks
 from feat.common import defer
@@ -33,6 +37,10 @@ from feat.agents.base import replay
 from twisted.internet.interfaces import IDelayedCall
 
 
+# Default resolution of the timer wheels in seconds
+DEFAULT_GRANULARITY = 0.1
+
+
 def scale(factor):
     '''
     Scale time by the factor.
@@ -54,6 +62,8 @@ def time():
              time scaling mechanism.
     @rtype: float
     '''
+    if _virtual_clock is not None:
+        return _virtual_clock.seconds()
     real_time = reactor.seconds()
     return real_time / _get_scale()
 
@@ -95,6 +105,8 @@ def call_later(_seconds, _f, *args, **kwargs):
     This method should always be used instead directly touching the reactor.
     See: L{twisted.internet.interfaces.IDelayedCall.callLater}.
     '''
+    if _virtual_clock is not None:
+        return _virtual_clock.call_later(_seconds, _f, *args, **kwargs)
     cur_scale = _get_scale()
     if cur_scale == 1:
         return reactor.callLater(_seconds, _f, *args, **kwargs)
@@ -104,12 +116,52 @@ def call_later(_seconds, _f, *args, **kwargs):
         return ScaledDelayedCall(cur_scale, call)
 
 
+def virtualize():
+    '''
+    Replaces the real time by a virtual clock for time(), callLater()
+    and call_next(), see L{VirtualClock}. Calls scheduled before keep
+    using the real time. Undone by reset().
+    @return: The virtual clock in use.
+    @rtype: L{VirtualClock}
+    '''
+    global _virtual_clock
+    if _virtual_clock is None:
+        _virtual_clock = VirtualClock(reactor.seconds())
+    return _virtual_clock
+
+
+def is_virtual():
+    return _virtual_clock is not None
+
+
+def add_idle_check(check):
+    '''
+    Registers a callable telling whether the work it stands for is done.
+    The virtual clock only jumps to the next scheduled call when all of
+    them return True, it is meant for the work it cannot see by itself,
+    like the calls running in threads or the I/O with other processes.
+    Forgotten by reset().
+    '''
+    _idle_checks.append(check)
+
+
+def remove_idle_check(check):
+    if check in _idle_checks:
+        _idle_checks.remove(check)
+
+
 def reset():
     '''
     Reset any manipulations done by the module.
     '''
-    global _time_scale
+    global _time_scale, _virtual_clock
+    for wheel in _wheels.keys():
+        wheel.stop()
     _time_scale = 1
+    del _idle_checks[:]
+    if _virtual_clock is not None:
+        _virtual_clock.stop()
+        _virtual_clock = None
 
 
 @defer.inlineCallbacks
@@ -136,6 +188,10 @@ def wait_for(logger, check, timeout, freq=0.5):
 ### private ###
 
 _time_scale = None
+_virtual_clock = None
+_idle_checks = []
+# TimerWheel -> True
+_wheels = weakref.WeakKeyDictionary()
 _python_time = hacks.import_time()
 clock = _python_time.clock
 
@@ -145,6 +201,26 @@ def _get_scale():
     return _time_scale
 
 
+def _get_call_time():
+    # time of the delayed calls scheduled by callLater()
+    if _virtual_clock is not None:
+        return _virtual_clock.seconds()
+    return reactor.seconds()
+
+
+def _get_call_scale():
+    if _virtual_clock is not None:
+        return 1
+    return _get_scale()
+
+
+def _call_later(_seconds, _f, *args, **kwargs):
+    # callLater() with the delay already scaled
+    if _virtual_clock is not None:
+        return _virtual_clock.call_later(_seconds, _f, *args, **kwargs)
+    return reactor.callLater(_seconds, _f, *args, **kwargs)
+
+
 class ScaledDelayedCall(object):
     implements(IDelayedCall)
 
@@ -170,6 +246,377 @@ class ScaledDelayedCall(object):
         return self._call.active()
 
 
+class VirtualClock(object):
+    '''
+    Clock used instead of the real time in simulations. Scheduled calls
+    are run in the order of their time and, for the same time, in the order
+    they were scheduled, so the order of events does not depend on how
+    long the calls take. When the reactor has nothing else to do right
+    away, the time jumps to the next scheduled call instead of waiting.
+
+    The clock only sees the calls due in the reactor and the results of
+    the threads already handed back to it. The I/O not ready yet and
+    the calls still running in threads are invisible, their owners have
+    to declare them with L{add_idle_check}, otherwise the time may jump
+    before they complete.
+    '''
+
+    def __init__(self, now):
+        self._now = now
+        self._sequence = 0
+        # heap of (time, sequence, VirtualDelayedCall)
+        self._calls = []
+        # reactor call running the due calls
+        self._pump = None
+
+    def seconds(self):
+        return self._now
+
+    def call_later(self, _seconds, _f, *args, **kwargs):
+        call = VirtualDelayedCall(self, _f, args, kwargs)
+        self._schedule(call, self._now + max(_seconds, 0))
+        return call
+
+    def advance(self):
+        '''
+        Jumps to the time of the next scheduled call and runs the calls
+        due at that time.
+        @return: False if there is no call scheduled.
+        '''
+        self._discard_inactive()
+        if not self._calls:
+            return False
+        self._now = max(self._now, self._calls[0][0])
+        self._run_due()
+        return True
+
+    def stop(self):
+        '''
+        Forgets all the scheduled calls, they will never be run.
+        '''
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+        del self._calls[:]
+
+    ### used by VirtualDelayedCall ###
+
+    def _schedule(self, call, moment):
+        self._sequence += 1
+        call._time = moment
+        call._sequence = self._sequence
+        heapq.heappush(self._calls, (moment, self._sequence, call))
+        if self._pump is None:
+            self._pump = reactor.callLater(0, self._run)
+
+    ### private ###
+
+    def _run(self):
+        self._pump = None
+        self._discard_inactive()
+        if not self._calls:
+            return
+        if self._calls[0][0] <= self._now:
+            self._run_due()
+        elif self._is_reactor_idle():
+            self._now = self._calls[0][0]
+            self._run_due()
+        self._discard_inactive()
+        if self._calls and self._pump is None:
+            self._pump = reactor.callLater(0, self._run)
+
+    def _run_due(self):
+        # Like the reactor, calls scheduled for now by the calls
+        # being run are left for the next iteration.
+        last = self._sequence
+        calls = self._calls
+        while calls and calls[0][0] <= self._now and calls[0][1] <= last:
+            _time, sequence, call = heapq.heappop(calls)
+            if call._is_scheduled(sequence):
+                call._run()
+
+    def _discard_inactive(self):
+        calls = self._calls
+        while calls and not calls[0][2]._is_scheduled(calls[0][1]):
+            heapq.heappop(calls)
+
+    def _is_reactor_idle(self):
+        if getattr(reactor, 'threadCallQueue', None):
+            # results of the threads waiting to be processed
+            return False
+        now = reactor.seconds()
+        for call in reactor.getDelayedCalls():
+            if call.active() and call.getTime() <= now:
+                return False
+        return all([check() for check in _idle_checks])
+
+
+class VirtualDelayedCall(object):
+    implements(IDelayedCall)
+
+    def __init__(self, clock, func, args, kwargs):
+        self._clock = clock
+        self._time = None
+        self._sequence = None
+        self.func = func
+        self.args = args
+        self.kw = kwargs
+        self.cancelled = False
+        self.called = False
+
+    ### IDelayedCall ###
+
+    def getTime(self):
+        return self._time
+
+    def cancel(self):
+        self._check_active()
+        self.cancelled = True
+
+    def delay(self, secondsLater):
+        self._check_active()
+        self._clock._schedule(self, self._time + secondsLater)
+
+    def reset(self, secondsFromNow):
+        self._check_active()
+        self._clock._schedule(self, self._clock.seconds() + secondsFromNow)
+
+    def active(self):
+        return not (self.cancelled or self.called)
+
+    ### used by VirtualClock ###
+
+    def _is_scheduled(self, sequence):
+        return self.active() and sequence == self._sequence
+
+    def _run(self):
+        self.called = True
+        try:
+            self.func(*self.args, **self.kw)
+        except:
+            twisted_log.deferr()
+
+    ### private ###
+
+    def _check_active(self):
+        if self.cancelled:
+            raise error.AlreadyCancelled()
+        if self.called:
+            raise error.AlreadyCalled()
+
+
+class TimerWheel(object):
+    '''
+    Hashed timer wheel sharing a single delayed call between all the calls
+    scheduled with it. The calls are hashed by the tick of the granularity
+    they are due at into buckets. The first call of a bucket is run at
+    the beginning of the tick, the others follow it in the order of their
+    time and as far apart as they were due. Scheduling and
+    cancelling a call do not touch any ordered structure, only the ticks
+    having a bucket are kept in a heap. Calls delayed less than
+    the granularity are scheduled directly with callLater(), the same
+    goes for the calls reset or delayed to less than the granularity
+    from now, so that expiring something right now is not postponed to
+    the next tick.
+    The ticks are kept in the time of the delayed calls, the real or
+    the virtual one, like callLater() the delays are scaled when they
+    are scheduled. The wheels are stopped by reset().
+    '''
+
+    def __init__(self, granularity=DEFAULT_GRANULARITY):
+        assert 0 < granularity, "%r is not greater than 0" % (granularity, )
+        self.granularity = float(granularity)
+        # length of a tick in the time of the delayed calls
+        self._tick_length = self.granularity * _get_call_scale()
+        self._sequence = 0
+        # tick -> {sequence: WheelCall}
+        self._buckets = {}
+        # heap of the ticks having a bucket, may contain stale ticks
+        self._ticks = []
+        # delayed call running the wheel and the tick it is due at
+        self._pump = None
+        self._pump_tick = None
+        # WheelCall -> delayed call of the calls bypassing the wheel
+        self._direct = {}
+        _wheels[self] = True
+
+    def call_later(self, _seconds, _f, *args, **kwargs):
+        if _seconds < self.granularity:
+            return call_later(_seconds, _f, *args, **kwargs)
+        scale = _get_call_scale()
+        call = WheelCall(self, scale, _f, args, kwargs)
+        now = _get_call_time()
+        self._schedule(call, now + _seconds * scale, now)
+        return call
+
+    def stop(self):
+        '''
+        Cancels all the scheduled calls.
+        '''
+        for bucket in self._buckets.itervalues():
+            for call in bucket.itervalues():
+                call.cancelled = True
+        self._buckets.clear()
+        for call, delayed in self._direct.iteritems():
+            call.cancelled = True
+            if delayed.active():
+                delayed.cancel()
+        self._direct.clear()
+        self._unschedule_all()
+
+    def __len__(self):
+        return (sum(len(x) for x in self._buckets.itervalues())
+                + len(self._direct))
+
+    ### used by WheelCall ###
+
+    def _schedule(self, call, moment, now):
+        self._sequence += 1
+        call._time = moment
+        call._sequence = self._sequence
+        delay = moment - now
+        if delay < self._tick_length:
+            call._tick = None
+            self._direct[call] = _call_later(max(delay, 0),
+                                             self._run_direct, call)
+            return
+        tick = int(math.ceil(moment / self._tick_length))
+        call._tick = tick
+        bucket = self._buckets.get(tick)
+        if bucket is None:
+            bucket = self._buckets[tick] = {}
+            heapq.heappush(self._ticks, tick)
+            if self._pump_tick is None or tick < self._pump_tick:
+                self._wake_up(tick, now)
+        bucket[call._sequence] = call
+
+    def _unschedule(self, call):
+        delayed = self._direct.pop(call, None)
+        if delayed is not None:
+            if delayed.active():
+                delayed.cancel()
+            return
+        bucket = self._buckets.get(call._tick)
+        if bucket is None or bucket.pop(call._sequence, None) is None:
+            return
+        if not bucket:
+            del self._buckets[call._tick]
+            if not self._buckets:
+                self._unschedule_all()
+
+    ### private ###
+
+    def _unschedule_all(self):
+        del self._ticks[:]
+        if self._pump is not None:
+            if self._pump.active():
+                self._pump.cancel()
+            self._pump = None
+            self._pump_tick = None
+
+    def _run_direct(self, call):
+        del self._direct[call]
+        call._run()
+
+    def _wake_up(self, tick, now):
+        if self._pump is not None and self._pump.active():
+            self._pump.cancel()
+        delay = max(tick * self._tick_length - now, 0)
+        self._pump = _call_later(delay, self._run)
+        self._pump_tick = tick
+
+    def _run(self):
+        self._pump = None
+        self._pump_tick = None
+        # tolerates the rounding of the delay of the pump
+        current = _get_call_time() / self._tick_length + 0.001
+        due = []
+        ticks = self._ticks
+        while ticks and ticks[0] <= current:
+            bucket = self._buckets.pop(heapq.heappop(ticks), None)
+            if bucket:
+                due.extend(bucket.iteritems())
+        due.sort(key=lambda item: (item[1]._time, item[0]))
+        first = None
+        for sequence, call in due:
+            # the calls run before may have cancelled or reset it
+            if not call.active() or call._sequence != sequence:
+                continue
+            if first is None:
+                first = call._time
+            if call._time > first:
+                # the later calls of the tick keep their distance to the
+                # first one, what happens in between may depend on it
+                call._tick = None
+                self._direct[call] = _call_later(call._time - first,
+                                                 self._run_direct, call)
+                continue
+            call._run()
+        while ticks and ticks[0] not in self._buckets:
+            heapq.heappop(ticks)
+        if ticks and self._pump is None:
+            self._wake_up(ticks[0], _get_call_time())
+
+
+class WheelCall(object):
+    implements(IDelayedCall)
+
+    def __init__(self, wheel, scale, func, args, kwargs):
+        self._wheel = wheel
+        self._scale = scale
+        # in the time of the delayed calls
+        self._time = None
+        self._tick = None
+        self._sequence = None
+        self.func = func
+        self.args = args
+        self.kw = kwargs
+        self.cancelled = False
+        self.called = False
+
+    ### IDelayedCall ###
+
+    def getTime(self):
+        return self._time / self._scale
+
+    def cancel(self):
+        self._check_active()
+        self.cancelled = True
+        self._wheel._unschedule(self)
+
+    def delay(self, secondsLater):
+        self._check_active()
+        self._wheel._unschedule(self)
+        self._wheel._schedule(self, self._time + secondsLater * self._scale,
+                              _get_call_time())
+
+    def reset(self, secondsFromNow):
+        self._check_active()
+        self._wheel._unschedule(self)
+        now = _get_call_time()
+        self._wheel._schedule(self, now + secondsFromNow * self._scale, now)
+
+    def active(self):
+        return not (self.cancelled or self.called)
+
+    ### used by TimerWheel ###
+
+    def _run(self):
+        self.called = True
+        try:
+            self.func(*self.args, **self.kw)
+        except:
+            twisted_log.deferr()
+
+    ### private ###
+
+    def _check_active(self):
+        if self.cancelled:
+            raise error.AlreadyCancelled()
+        if self.called:
+            raise error.AlreadyCalled()
+
+
 def _debugger_scale():
     if sys.gettrace() is None:
         return 1
@@ -22,19 +22,48 @@
 
 '''
 This is empty module which is supposed to import all the modules which declare
-agents, descriptors, things which needs to be declared.
+agents, descriptors, things which needs to be declared. The agent modules are
+declared lazily with the names they register, they are imported on the first
+lookup of one of them. Use feat.agents.base.registry.load_all() to import
+them all at once.
 '''
 
-from feat.agents.host import host_agent
-from feat.agents.shard import shard_agent
-from feat.agents.raage import raage_agent
-from feat.agents.dns import dns_agent
-from feat.agents.monitor import monitor_agent
-from feat.agents.alert import alert_agent
-from feat.agents.export import export_agent
-from feat.agents.migration import migration_agent
+from feat.agents.base import registry
+
+registry.register_lazy('feat.agents.host.host_agent',
+                       'host_agent', 'host_agent:data',
+                       'host->agent', 'host->shard')
+registry.register_lazy('feat.agents.shard.shard_agent',
+                       'shard_agent', 'shard_agent:data', 'shard_agent_conf',
+                       'shard->host', 'shard->neighbour', 'shard->raage',
+                       'shard->monitor')
+registry.register_lazy('feat.agents.raage.raage_agent',
+                       'raage_agent', 'raage_agent:data', 'raage->shard')
+registry.register_lazy('feat.agents.dns.dns_agent',
+                       'dns_agent', 'dns_agent:data', 'dns_agent_conf',
+                       'dns-resolver')
+registry.register_lazy('feat.agents.monitor.monitor_agent',
+                       'monitor_agent', 'monitor_agent:data',
+                       'monitor_agent_conf', 'monitor->agent',
+                       'monitor->monitor', 'monitor->foreign_shard',
+                       'monitor->shard', 'monitor->host')
+registry.register_lazy('feat.agents.alert.alert_agent',
+                       'alert_agent', 'alert_agent:data', 'alert_agent_conf')
+registry.register_lazy('feat.agents.export.export_agent',
+                       'export_agent', 'export_agent:data',
+                       'export_agent_conf', 'export-checkin-list')
+registry.register_lazy('feat.agents.migration.migration_agent',
+                       'migration_agent', 'migration_agent:data',
+                       'import_entry', 'shard_structure')
+
 from feat.agents.common import host, shard, raage, dns, monitor, export
 
+# Protocols shared by the agents, their types are nested in the documents
+# and the states of the agents declared above so they have to be
+# registered before the agent modules get imported.
+from feat.agents.base import alert, notifier, problem, sender
+from feat.agents.common import start_agent
+
 # Internal to register serialization adapters
 from feat.common.serialization import adapters
 
@@ -42,4 +71,5 @@ from feat.common.serialization import adapters
 from feat.agencies import contracts, requests, tasks, notifications
 
 # Imports for gateway
-from feat.gateway import adapters, dummies
+from feat.gateway import dummies
+import feat.gateway.adapters
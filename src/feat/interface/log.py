@@ -46,6 +46,12 @@ class ILogKeeper(Interface):
         @type  line_num: int
         '''
 
+    def is_enabled(category, level):
+        '''Tells if the entries of the category and level would be kept.
+        Used to skip building the entries which would be dropped anyway.
+        @rtype: bool
+        '''
+
 
 class ILogger(Interface):
     '''Can be used to generate contextual logging entries'''
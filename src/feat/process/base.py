@@ -26,6 +26,7 @@ import errno
 import os
 import uuid
 import copy
+import collections
 
 from twisted.internet import error, protocol, reactor
 
@@ -34,6 +35,13 @@ from feat.agents.base import replay
 from feat.agencies.common import StateMachineMixin
 
 
+# Maximum number of bytes of child process output kept in memory
+DEFAULT_OUTPUT_LIMIT = 64 * 1024
+# Bytes of already checked output kept for the started test, so that
+# a marker split between two chunks of output is still found
+STARTED_TEST_OVERLAP = 1024
+
+
 def which(component, path_str):
     '''helper method having same behaviour as "which" os command.'''
 
@@ -64,9 +72,49 @@ class ProcessState(enum.Enum):
     (initiated, starting, started, failed, finished, terminating) = range(6)
 
 
+class OutputBuffer(object):
+    '''
+    Keeps the last bytes of a stream up to the given limit.
+    '''
+
+    def __init__(self, limit=DEFAULT_OUTPUT_LIMIT):
+        self.limit = limit
+        self.size = 0
+        self._chunks = collections.deque()
+
+    def append(self, data):
+        if not data:
+            return
+        self._chunks.append(data)
+        self.size += len(data)
+        while self.size - len(self._chunks[0]) >= self.limit:
+            self.size -= len(self._chunks.popleft())
+
+    def getvalue(self):
+        value = "".join(self._chunks)
+        if len(value) > self.limit:
+            value = value[-self.limit:]
+        self._chunks = collections.deque([value])
+        self.size = len(value)
+        return value
+
+    def __len__(self):
+        return min(self.size, self.limit)
+
+    def __str__(self):
+        return self.getvalue()
+
+
 class ControlProtocol(protocol.ProcessProtocol, log.Logger):
+    '''
+    Until the process is ready out_buffer contains the output not
+    checked yet by success_test() prefixed by the tail of the output
+    already checked. The output of the process is only kept up to
+    output_limit bytes, see out_tail and err_tail.
+    '''
 
-    def __init__(self, owner, success_test, ready_cb):
+    def __init__(self, owner, success_test, ready_cb,
+                 output_limit=DEFAULT_OUTPUT_LIMIT):
         log.Logger.__init__(self, owner)
 
         assert callable(success_test)
@@ -76,19 +124,29 @@ class ControlProtocol(protocol.ProcessProtocol, log.Logger):
         self.ready_cb = ready_cb
         self.ready = False
         self.out_buffer = ""
-        self.err_buffer = ""
+        self.out_tail = OutputBuffer(output_limit)
+        self.err_tail = OutputBuffer(output_limit)
         self.owner = owner
 
+    @property
+    def err_buffer(self):
+        return self.err_tail.getvalue()
+
     def outReceived(self, data):
-        self.out_buffer += data
-        if not self.ready and self.success_test():
+        self.out_tail.append(data)
+        if self.ready:
+            return
+        self.out_buffer = self.out_buffer[-STARTED_TEST_OVERLAP:] + data
+        if self.success_test():
             self.log("Process start successful. "
-                     "Process stdout buffer so far:\n%s", self.out_buffer)
+                     "Process stdout buffer so far:\n%s",
+                     self.out_tail.getvalue())
             self.ready_cb(self.out_buffer)
             self.ready = True
+            self.out_buffer = ""
 
     def errReceived(self, data):
-        self.err_buffer += data
+        self.err_tail.append(data)
 
     def processExited(self, status):
         self.log("Process exited with a status: %r", status)
@@ -100,6 +158,22 @@ class ControlProtocol(protocol.ProcessProtocol, log.Logger):
 class Base(log.Logger, log.LogProxy, StateMachineMixin,
            serialization.Serializable):
 
+    _event_mapping = {
+        error.ProcessDone:\
+            {'state_before': [ProcessState.initiated,
+                              ProcessState.started,
+                              ProcessState.terminating],
+             'state_after': ProcessState.finished,
+             'method': 'on_finished'},
+        error.ProcessTerminated:\
+            [{'state_before': [ProcessState.initiated,
+                              ProcessState.started],
+              'state_after': ProcessState.failed,
+              'method': 'on_failed'},
+             {'state_before': ProcessState.terminating,
+              'state_after': ProcessState.finished,
+              'method': 'on_finished'}]}
+
     def __init__(self, logger, *args, **kwargs):
         log.LogProxy.__init__(self, logger)
         log.Logger.__init__(self, logger)
@@ -150,22 +224,7 @@ class Base(log.Logger, log.LogProxy, StateMachineMixin,
         pass
 
     def on_process_exited(self, exception):
-        mapping = {
-            error.ProcessDone:\
-                {'state_before': [ProcessState.initiated,
-                                  ProcessState.started,
-                                  ProcessState.terminating],
-                 'state_after': ProcessState.finished,
-                 'method': self.on_finished},
-            error.ProcessTerminated:\
-                [{'state_before': [ProcessState.initiated,
-                                  ProcessState.started],
-                  'state_after': ProcessState.failed,
-                  'method': self.on_failed},
-                 {'state_before': ProcessState.terminating,
-                  'state_after': ProcessState.finished,
-                  'method': self.on_finished}]}
-        self._event_handler(mapping, exception)
+        self._dispatch_event(exception)
 
     def started_test(self):
         raise NotImplementedError('This method should be overloaded')
@@ -0,0 +1,244 @@
+# F3AT - Flumotion Asynchronous Autonomous Agent Toolkit
+# Copyright (C) 2010,2011 Flumotion Services, S.A.
+# All rights reserved.
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# See "LICENSE.GPL" in the source distribution for more information.
+
+# Headers in this file shall remain intact.
+'''
+Zygote mode for spawning standalone agents.
+
+The template process (see the feat-zygote script and L{main}) imports
+everything up front and keeps a number of forked spare workers waiting
+on a pipe. The requests written by L{Process.spawn} to its standard
+input are handed over to the spares, which turn into the standalone
+agency of the requested agent without paying for the interpreter
+startup and the imports.
+
+The template never runs the reactor. It has to be the poll reactor,
+which unlike epoll doesn't keep any kernel state shared by the forked
+workers; the workers only need to get a waker of their own.
+'''
+import collections
+import errno
+import optparse
+import os
+import random
+import select
+import sys
+import traceback
+
+from feat.common import reflect
+from feat.common.serialization import json
+from feat.process import base
+
+DEFAULT_SPARES = 2
+DEFAULT_ENTRY = 'feat.agencies.bootstrap.bootstrap'
+READY_MARKER = "zygote ready"
+# Only requests for this command can be handled by the zygote
+SPAWNED_COMMAND = 'feat'
+
+
+class Process(base.Base):
+    '''
+    Template process as seen from the agency spawning the standalone
+    agents.
+    '''
+
+    def initiate(self, spares=DEFAULT_SPARES, modules=None, env=None,
+                 entry=None):
+        self.command = 'feat-zygote'
+        self.args = ['--spares', str(spares)]
+        for module in modules or []:
+            self.args += ['--import', module]
+        if entry:
+            self.args += ['--entry', entry]
+        if env is None:
+            env = dict(PYTHONPATH=":".join(sys.path),
+                       PATH=os.environ.get("PATH", ""))
+        self.env = env
+
+    def started_test(self):
+        return READY_MARKER in self._control.out_buffer
+
+    def can_spawn(self, command):
+        return (self._cmp_state(base.ProcessState.started)
+                and os.path.basename(command) == SPAWNED_COMMAND)
+
+    def spawn(self, command, args, env, descriptor=None):
+        '''
+        Asks the template to run the command line of a standalone agent.
+        The descriptor, if given, is passed to the standalone agency so it
+        doesn't need to fetch it from the database.
+        '''
+        self._ensure_state(base.ProcessState.started)
+        request = dict(command=command, args=args, env=env,
+                       descriptor=descriptor)
+        self._process.write(json.serialize(request) + "\n")
+
+
+class Template(object):
+
+    def __init__(self, entry, spares=DEFAULT_SPARES):
+        self.entry = entry
+        self.spares = spares
+        self._workers = collections.deque() # [(PID, REQUEST_FD)]
+        self._buffer = ""
+
+    def run(self, input_fd=0, reap_period=1):
+        self._fill()
+        _write(1, READY_MARKER + "\n")
+        while True:
+            readable, _, _ = select.select([input_fd], [], [], reap_period)
+            self._reap()
+            if not readable:
+                continue
+            data = os.read(input_fd, 4096)
+            if not data:
+                # The agency is gone, let the spares know
+                break
+            self._buffer += data
+            while "\n" in self._buffer:
+                line, self._buffer = self._buffer.split("\n", 1)
+                if line.strip():
+                    self._dispatch(line)
+            self._fill()
+        for _pid, fd in self._workers:
+            os.close(fd)
+        self._workers.clear()
+
+    ### private ###
+
+    def _dispatch(self, line):
+        if not self._workers:
+            self._fork()
+        pid, fd = self._workers.popleft()
+        _write(fd, line + "\n")
+        os.close(fd)
+        _write(1, "spawned %d\n" % pid)
+
+    def _fill(self):
+        while len(self._workers) < self.spares:
+            self._fork()
+
+    def _fork(self):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(write_fd)
+            for _pid, fd in self._workers:
+                os.close(fd)
+            _worker(read_fd, self.entry)
+        os.close(read_fd)
+        self._workers.append((pid, write_fd))
+
+    def _reap(self):
+        while True:
+            try:
+                pid, _status = os.waitpid(-1, os.WNOHANG)
+            except OSError, e:
+                if e.errno == errno.EINTR:
+                    continue
+                return
+            if pid == 0:
+                return
+
+
+def main(args=None):
+    parser = optparse.OptionParser()
+    parser.add_option('--spares', type="int", dest="spares",
+                      default=DEFAULT_SPARES,
+                      help=("number of forked workers kept waiting "
+                            "(default: %s)" % DEFAULT_SPARES))
+    parser.add_option('--import', action="append", dest="modules",
+                      default=[], metavar="MODULE",
+                      help="import specified module in the template")
+    parser.add_option('--entry', dest="entry", default=DEFAULT_ENTRY,
+                      help=("function run by the workers "
+                            "(default: %s)" % DEFAULT_ENTRY))
+    opts, _ = parser.parse_args(args)
+
+    from feat import everything
+    from feat.agents.base import registry
+    # the workers share the modules imported before the fork
+    registry.load_all()
+    for module in opts.modules:
+        reflect.named_module(module)
+    entry = reflect.named_object(opts.entry)
+
+    Template(entry, opts.spares).run()
+
+
+### private ###
+
+
+def _write(fd, data):
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+def _read_line(fd):
+    data = ""
+    while not data.endswith("\n"):
+        chunk = os.read(fd, 4096)
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _reset_reactor():
+    from twisted.internet import reactor
+    waker = reactor.waker
+    if waker is not None:
+        reactor._internalReaders.discard(waker)
+        reactor.removeReader(waker)
+        waker.connectionLost(None)
+        reactor.waker = None
+    reactor.installWaker()
+
+
+def _worker(read_fd, entry):
+    code = 0
+    try:
+        os.setsid()
+        null_fd = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(null_fd, 0)
+        os.close(null_fd)
+
+        line = _read_line(read_fd)
+        os.close(read_fd)
+        if line is not None:
+            request = json.unserialize(line)
+            random.seed()
+            _reset_reactor()
+            os.environ.clear()
+            os.environ.update(request['env'])
+            sys.argv = [request['command']] + request['args']
+            descriptors = None
+            if request['descriptor'] is not None:
+                descriptors = [request['descriptor']]
+            entry(args=request['args'], descriptors=descriptors)
+    except SystemExit, e:
+        code = e.code if isinstance(e.code, int) else 1
+    except:
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
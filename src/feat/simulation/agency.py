@@ -83,6 +83,14 @@ class Agency(agency.Agency):
     def __init__(self):
         agency.Agency.__init__(self)
         self._disabled_protocols = set()
+        self._driver = None
+
+        # agents registered in the agency
+        self._registered_agents = set()
+        # agents which were not idle last time we checked
+        self._busy_agents = set()
+        # agents which reported activity since we checked
+        self._active_agents = set()
 
     ### Public Methods ###
 
@@ -122,6 +130,27 @@ class Agency(agency.Agency):
         if key in self._disabled_protocols:
             self._disabled_protocols.remove(key)
 
+    def update_idle(self):
+        '''
+        Checks only the agents which reported activity since the last call
+        and returns if all the agents are idle.
+        '''
+        for medium in self._active_agents:
+            if medium.is_idle():
+                self._busy_agents.discard(medium)
+            else:
+                self._busy_agents.add(medium)
+        self._active_agents.clear()
+        return not self._busy_agents
+
+    def reset_idle(self):
+        '''
+        Makes the next call to update_idle() check all the agents.
+        '''
+        self._active_agents.update(self._registered_agents)
+
+    ### Overridden Methods ###
+
     def initiate(self, database, journaler, driver, *backends):
         self._driver = driver
         return agency.Agency.initiate(self, database, journaler, *backends)
@@ -140,8 +169,32 @@ class Agency(agency.Agency):
                                    ' agency.')
         return self._upgrade_cmd
 
+    def register_agent(self, medium):
+        agency.Agency.register_agent(self, medium)
+        self._registered_agents.add(medium)
+        if self._driver is not None:
+            self._driver.agent_registered(self, medium)
+        self.notify_activity(medium)
+
+    def unregister_agent(self, medium):
+        agency.Agency.unregister_agent(self, medium)
+        self._registered_agents.discard(medium)
+        self._busy_agents.discard(medium)
+        self._active_agents.discard(medium)
+        if self._driver is not None:
+            self._driver.agent_unregistered(self, medium)
+            self._driver.agency_activity(self)
+
+    def notify_activity(self, medium):
+        if medium not in self._registered_agents:
+            # terminated agents do not count anymore
+            return
+        self._active_agents.add(medium)
+        if self._driver is not None:
+            self._driver.agency_activity(self)
+
     def shutdown(self):
         d = agency.Agency.shutdown(self)
-        if hasattr(self, '_driver'):
+        if self._driver is not None:
             d.addCallback(defer.drop_param, self._driver.remove_agency, self)
         return d
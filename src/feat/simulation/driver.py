@@ -69,8 +69,25 @@ class Commands(manhole.Manhole):
         return d
 
     @manhole.expose()
-    def wait_for_idle(self, timeout=20, freq=0.01):
-        return time.wait_for(self, self.is_idle, timeout, freq)
+    def wait_for_idle(self, timeout=20, freq=None):
+        '''
+        Returns a Deferred fired when the simulation becomes idle. Usage:
+        > wait_for_idle(20)
+
+        Instead of polling, only the agents which reported activity are
+        checked again. As a safety net all of them are checked every
+        freq seconds (default: Driver.idle_recheck).
+        '''
+        if self.is_idle():
+            return defer.succeed(None)
+        d = defer.Deferred()
+        call = time.callLater(timeout, self._idle_timeout, d)
+        self._idle_waiters.append((d, call))
+        self._schedule_idle_check()
+        if self._idle_recheck is None:
+            self._idle_recheck = time.callLater(freq or self.idle_recheck,
+                                                self._recheck_idle, freq)
+        return d
 
     @manhole.expose()
     def uuid(self):
@@ -114,18 +131,11 @@ class Commands(manhole.Manhole):
         """
         Returns the agency running the agent with agent_id or None.
         """
-
-        def has_agent(agency):
-            for agent in agency._agents:
-                if agent._descriptor.doc_id == agent_id:
-                    return True
-            return False
-
-        matching = filter(has_agent, self._agencies)
-        if len(matching) > 0:
-            self.debug('Find agency returns %dth agency.',
-                       self._agencies.index(matching[0]))
-            return matching[0]
+        agencies = self._agent_index.get(agent_id)
+        if agencies:
+            self.debug('Find agency returns agency %r.',
+                       agencies[0].agency_id)
+            return agencies[0]
 
     @manhole.expose()
     @defer.inlineCallbacks
@@ -183,6 +193,10 @@ class Driver(log.Logger, log.FluLogKeeper, Commands):
 
     log_category = 'simulation-driver'
 
+    # Period of checking all the agents while waiting for idle,
+    # in case some activity has not been reported
+    idle_recheck = 1
+
     def __init__(self, jourfile=None,
                  tunneling_version=None, tunneling_bridge=None):
         log.FluLogKeeper.__init__(self)
@@ -207,6 +221,24 @@ class Driver(log.Logger, log.FluLogKeeper, Commands):
         self._agencies = list()
         self._breakpoints = dict()
 
+        # agent_id -> [agencies running it]
+        self._agent_index = dict()
+
+        # agencies which were not idle last time we checked
+        self._busy_agencies = set()
+        # agencies which reported activity since we checked
+        self._active_agencies = set()
+        # [(Deferred, timeout call)] waiting for the simulation to be idle
+        self._idle_waiters = list()
+        self._idle_check = None
+        self._idle_recheck = None
+        self._destroyed = False
+
+        self._messaging.add_idle_listener(self._schedule_idle_check)
+        self._tunneling_bridge.add_idle_listener(self._schedule_idle_check)
+        # the journal is written in a thread the virtual clock cannot see
+        time.add_idle_check(self._is_io_idle)
+
     def get_stats(self):
         res = dict(self._messaging.get_stats())
         res.update(dict(self._database.get_stats()))
@@ -248,6 +280,15 @@ class Driver(log.Logger, log.FluLogKeeper, Commands):
             defers.append(x.terminate_hard())
         yield defer.DeferredList(defers)
         yield self._journaler.close()
+        # the agencies still being stopped may report activity
+        self._destroyed = True
+        for _d, call in self._idle_waiters:
+            call.cancel()
+        self._cancel_idle_waiting()
+        self._messaging.remove_idle_listener(self._schedule_idle_check)
+        self._tunneling_bridge.remove_idle_listener(
+            self._schedule_idle_check)
+        time.remove_idle_check(self._is_io_idle)
         del(self._journaler)
         del(self._jourwriter)
         del(self._messaging)
@@ -255,26 +296,76 @@ class Driver(log.Logger, log.FluLogKeeper, Commands):
         del(self._database)
         del(self._agencies)
         del(self._breakpoints)
+        del(self._agent_index)
+        del(self._busy_agencies)
+        del(self._active_agencies)
         del(self._parser)
         del(self._output)
 
     def remove_agency(self, agency):
+        if self._destroyed:
+            return
         self._agencies.remove(agency)
+        self._busy_agencies.discard(agency)
+        self._active_agencies.discard(agency)
+        self._schedule_idle_check()
+
+    def agent_registered(self, ag, medium):
+        agent_id = medium.get_descriptor().doc_id
+        self._agent_index.setdefault(agent_id, []).append(ag)
+
+    def agent_unregistered(self, ag, medium):
+        if self._destroyed:
+            return
+        agent_id = medium.get_descriptor().doc_id
+        agencies = self._agent_index.get(agent_id)
+        if agencies and ag in agencies:
+            agencies.remove(ag)
+            if not agencies:
+                del self._agent_index[agent_id]
+
+    def agency_activity(self, ag):
+        '''
+        Called by the agencies when some of their agents might have changed
+        from idle to busy or the other way round.
+        '''
+        if self._destroyed:
+            return
+        self._active_agencies.add(ag)
+        self._schedule_idle_check()
 
     def iter_agencies(self):
         return self._agencies.__iter__()
 
     def iter_agents(self, agent_type=None):
-        for agency in self._agencies:
-            for agent in agency._agents:
+        for ag in self._agencies:
+            for agent in ag._agents:
                 if agent_type is None or \
                    agent.get_agent().descriptor_type == agent_type:
                     yield agent
 
     def is_idle(self):
-        return (self._messaging.is_idle()
-                and self._tunneling_bridge.is_idle()
-                and self.are_agents_idle())
+        '''
+        Only the agencies which reported activity since the last call are
+        checked again. Before telling the simulation is idle all the agents
+        are checked, an activity which was not reported is then only seen
+        by the next check of all the agents.
+        '''
+        for ag in self._active_agencies:
+            if ag.update_idle():
+                self._busy_agencies.discard(ag)
+            else:
+                self._busy_agencies.add(ag)
+        self._active_agencies.clear()
+        if (self._busy_agencies
+            or not self._messaging.is_idle()
+            or not self._tunneling_bridge.is_idle()):
+            return False
+        if self.are_agents_idle():
+            return True
+        self.warning('Found activity which has not been reported.')
+        self._reset_idle()
+        return False
 
     def are_agents_idle(self):
         return all([agent.is_idle() for agent in self.iter_agents()])
@@ -311,6 +402,65 @@ class Driver(log.Logger, log.FluLogKeeper, Commands):
     def save_document(self, doc):
         return self._database_connection.save_document(doc)
 
+    ### private ###
+
+    def _is_io_idle(self):
+        # the agents waiting for their delayed calls are not taken into
+        # account, the virtual clock is what makes them fire
+        return (self._jourwriter.is_idle()
+                and self._messaging.is_idle()
+                and self._tunneling_bridge.is_idle())
+
+    def _schedule_idle_check(self):
+        # Checks are only done if someone is waiting, and at most once
+        # per reactor iteration whatever the number of reported changes.
+        if self._idle_waiters and self._idle_check is None:
+            self._idle_check = time.call_next(self._check_idle)
+
+    def _check_idle(self):
+        self._idle_check = None
+        if not self._idle_waiters:
+            return
+        if not self.is_idle():
+            return
+        self.debug('Simulation is idle, continuing.')
+        waiters = self._idle_waiters
+        self._cancel_idle_waiting()
+        for d, call in waiters:
+            call.cancel()
+            d.callback(None)
+
+    def _recheck_idle(self, freq):
+        self._idle_recheck = None
+        self._reset_idle()
+        self._check_idle()
+        if self._idle_waiters:
+            self._idle_recheck = time.callLater(freq or self.idle_recheck,
+                                                self._recheck_idle, freq)
+
+    def _idle_timeout(self, d):
+        self._idle_waiters = [(x, call) for x, call in self._idle_waiters
+                              if x is not d]
+        if not self._idle_waiters:
+            self._cancel_idle_waiting()
+        d.errback(RuntimeError('Timeout error waiting for the simulation '
+                               'to become idle.'))
+
+    def _reset_idle(self):
+        # makes the next check go through all the agents
+        for ag in self._agencies:
+            ag.reset_idle()
+            self._active_agencies.add(ag)
+
+    def _cancel_idle_waiting(self):
+        self._idle_waiters = list()
+        if self._idle_check is not None:
+            self._idle_check.cancel()
+            self._idle_check = None
+        if self._idle_recheck is not None:
+            self._idle_recheck.cancel()
+            self._idle_recheck = None
+
 
 class Output(StringIO.StringIO, object):
     """
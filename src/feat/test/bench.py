@@ -0,0 +1,714 @@
+# F3AT - Flumotion Asynchronous Autonomous Agent Toolkit
+# Copyright (C) 2010,2011 Flumotion Services, S.A.
+# All rights reserved.
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# See "LICENSE.GPL" in the source distribution for more information.
+
+# Headers in this file shall remain intact.
+# -*- Mode: Python -*-
+# vi:si:et:sw=4:sts=4:ts=4
+'''
+Benchmark harness running repeatable scenarios on top of the simulation
+driver and the emu agency. Results are emitted as JSON so that the runs
+can be compared offline. Usage:
+
+  python -m feat.test.bench -o results.json hosts contract
+  python -m feat.test.bench -p bidders=100 contract
+'''
+
+import json
+import optparse
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from twisted.internet import reactor
+
+# Import for registering the agents and the types used by the scenarios
+from feat import everything
+from feat.common import log, defer, text_helper
+from feat.common import time as feat_time
+from feat.common.serialization import banana
+from feat.common.serialization import json as feat_json
+from feat.simulation import driver
+from feat.agencies import journaler
+from feat.agencies import replay as agency_replay
+from feat.agents.base import (agent, collector, descriptor, manager,
+                              message, partners, recipient, replay)
+
+
+@descriptor.register('bench_agent')
+class Descriptor(descriptor.Descriptor):
+    pass
+
+
+@agent.register('bench_agent')
+class BenchAgent(agent.BaseAgent):
+
+    @replay.mutable
+    def initiate(self, state):
+        agent.BaseAgent.initiate(self)
+        state.counter = 0
+
+    @replay.mutable
+    def bump(self, state):
+        state.counter += 1
+        return state.counter
+
+    @replay.immutable
+    def get_counter(self, state):
+        return state.counter
+
+
+class BenchManager(manager.BaseManager):
+
+    protocol_id = 'bench-contract'
+
+    @replay.journaled
+    def initiate(self, state):
+        state.bids = list()
+        state.medium.announce(message.Announcement())
+
+    @replay.mutable
+    def bid(self, state, bid):
+        state.bids.append(bid)
+
+    @replay.immutable
+    def closed(self, state):
+        state.medium.grant([(bid, message.Grant()) for bid in state.bids])
+
+
+class BenchCollector(collector.BaseCollector):
+
+    protocol_id = 'bench-notification'
+
+    @replay.immutable
+    def notified(self, state, msg):
+        pass
+
+
+def percentile(values, fraction):
+    '''Nearest-rank percentile of a sorted list of values.'''
+    if not values:
+        return None
+    index = int(round(fraction * (len(values) - 1)))
+    return values[index]
+
+
+def get_peak_rss():
+    '''Peak resident set size of the process in kilobytes.'''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Scenario(log.FluLogKeeper, log.Logger):
+    '''
+    Base class of the benchmark scenarios. Subclasses implement run()
+    and call record() with the start time of every operation measured,
+    setup() and teardown() are not included in the results.
+    '''
+
+    log_category = 'bench'
+
+    name = None
+    defaults = dict()
+
+    def __init__(self, **params):
+        log.FluLogKeeper.__init__(self)
+        log.Logger.__init__(self, self)
+
+        unknown = set(params) - set(self.defaults)
+        if unknown:
+            raise ValueError("Unknown parameters for scenario %s: %s"
+                             % (self.name, ", ".join(sorted(unknown))))
+        self.params = dict(self.defaults)
+        self.params.update(params)
+        self.latencies = list()
+
+    def setup(self):
+        pass
+
+    def run(self):
+        raise NotImplementedError('This method should be overloaded')
+
+    def teardown(self):
+        pass
+
+    def record(self, started):
+        self.latencies.append(time.time() - started)
+
+    @defer.inlineCallbacks
+    def execute(self):
+        self.latencies = list()
+        yield self.setup()
+        try:
+            started = time.time()
+            yield self.run()
+            duration = time.time() - started
+        finally:
+            yield self.teardown()
+        defer.returnValue(self.get_result(duration))
+
+    def get_result(self, duration):
+        latencies = sorted(self.latencies)
+        ops = len(latencies)
+        return dict(scenario=self.name,
+                    params=dict(self.params),
+                    ops=ops,
+                    duration=duration,
+                    ops_per_sec=ops / duration if duration else None,
+                    p50=percentile(latencies, 0.5),
+                    p99=percentile(latencies, 0.99),
+                    peak_rss=get_peak_rss())
+
+
+class SimulationScenario(Scenario):
+    '''Scenario running agents on the simulation driver.'''
+
+    @defer.inlineCallbacks
+    def setup(self):
+        self.driver = driver.Driver()
+        yield self.driver.initiate()
+
+    @defer.inlineCallbacks
+    def teardown(self):
+        yield self.driver.freeze_all()
+        yield self.driver.destroy()
+        del self.driver
+
+    @defer.inlineCallbacks
+    def start_agent(self, agency):
+        desc = yield self.driver.descriptor_factory('bench_agent')
+        medium = yield agency.start_agent(desc)
+        defer.returnValue(medium)
+
+
+class HostsScenario(SimulationScenario):
+    '''N hosts starting M agents each, an operation is an agent start.'''
+
+    name = 'hosts'
+    defaults = dict(hosts=5, agents=20)
+
+    @defer.inlineCallbacks
+    def run(self):
+        for _ in range(self.params['hosts']):
+            agency = yield self.driver.spawn_agency()
+            for _ in range(self.params['agents']):
+                started = time.time()
+                yield self.start_agent(agency)
+                self.record(started)
+        yield self.driver.wait_for_idle()
+
+
+class ContractScenario(SimulationScenario):
+    '''
+    Contract announced to many bidders answering through the emu
+    messaging, an operation is a full round from the announcement to the
+    acknowledgement of the final reports.
+    '''
+
+    name = 'contract'
+    defaults = dict(bidders=1000, rounds=5)
+
+    @defer.inlineCallbacks
+    def setup(self):
+        yield SimulationScenario.setup(self)
+        agency = yield self.driver.spawn_agency()
+        self.medium = yield self.start_agent(agency)
+        yield self.driver.wait_for_idle()
+        self.channel = self.medium._channels["default"]
+        backend = agency._backends["default"]
+        self.bidders = list()
+        for _ in range(self.params['bidders']):
+            endpoint = recipient.Agent(str(uuid.uuid1()), 'lobby')
+            queue = backend.define_queue(endpoint.key)
+            backend.define_exchange(endpoint.route)
+            backend.create_binding(endpoint.route, endpoint.key,
+                                   endpoint.key)
+            self.bidders.append((endpoint, queue))
+
+    @defer.inlineCallbacks
+    def teardown(self):
+        del self.bidders
+        del self.channel
+        del self.medium
+        yield SimulationScenario.teardown(self)
+
+    @defer.inlineCallbacks
+    def run(self):
+        recipients = [endpoint for endpoint, _ in self.bidders]
+        for _ in range(self.params['rounds']):
+            started = time.time()
+            contract = self.medium.initiate_protocol(BenchManager, recipients)
+            yield self._answer(message.Bid)
+            yield self._answer(message.FinalReport)
+            yield self._consume()
+            yield contract.notify_finish()
+            self.record(started)
+
+    ### private ###
+
+    def _consume(self):
+        return defer.DeferredList([queue.get()
+                                   for _, queue in self.bidders])
+
+    @defer.inlineCallbacks
+    def _answer(self, factory):
+        received = yield self._consume()
+        for (_, original), (endpoint, _) in zip(received, self.bidders):
+            msg = factory()
+            msg.reply_to = endpoint
+            msg.message_id = str(uuid.uuid1())
+            msg.protocol_id = original.protocol_id
+            msg.protocol_type = original.protocol_type
+            msg.expiration_time = feat_time.future(10)
+            msg.receiver_id = original.sender_id
+            if isinstance(msg, message.Bid):
+                msg.payload['cost'] = 1
+            self.channel.post(recipient.IRecipient(original), msg)
+
+
+class MessagesScenario(SimulationScenario):
+    '''
+    Notifications handed to the agent with debug logging turned off,
+    an operation is a message going through on_message() to its collector.
+    '''
+
+    name = 'messages'
+    defaults = dict(messages=10000)
+
+    @defer.inlineCallbacks
+    def setup(self):
+        yield SimulationScenario.setup(self)
+        self._debug = log.FluLogKeeper.get_debug()
+        log.FluLogKeeper.set_debug("*:1")
+        agency = yield self.driver.spawn_agency()
+        self.medium = yield self.start_agent(agency)
+        self.medium.register_interest(BenchCollector)
+        yield self.driver.wait_for_idle()
+        self.sender = recipient.Agent(str(uuid.uuid1()), 'lobby')
+
+    @defer.inlineCallbacks
+    def teardown(self):
+        del self.sender
+        del self.medium
+        log.FluLogKeeper.set_debug(self._debug)
+        yield SimulationScenario.teardown(self)
+
+    @defer.inlineCallbacks
+    def run(self):
+        for _ in range(self.params['messages']):
+            msg = message.Notification()
+            msg.message_id = str(uuid.uuid1())
+            msg.traversal_id = str(uuid.uuid1())
+            msg.protocol_id = BenchCollector.protocol_id
+            msg.expiration_time = feat_time.future(10)
+            msg.reply_to = self.sender
+            started = time.time()
+            self.medium.on_message(msg)
+            self.record(started)
+        yield self.driver.wait_for_idle()
+
+
+class ReplayScenario(SimulationScenario):
+    '''
+    Replays the journal of an agent, an operation is an entry applied.
+    The journal is recorded during the setup by calling a mutable method
+    of the agent the given number of times.
+    '''
+
+    name = 'replay'
+    defaults = dict(entries=100000)
+
+    # number of journaled calls in progress while recording
+    batch_size = 1000
+
+    @defer.inlineCallbacks
+    def setup(self):
+        yield SimulationScenario.setup(self)
+        agency = yield self.driver.spawn_agency()
+        medium = yield self.start_agent(agency)
+        yield self.driver.wait_for_idle()
+        self.agent = medium.get_agent()
+        self.agent_id = medium.get_descriptor().doc_id
+
+        remaining = self.params['entries']
+        while remaining > 0:
+            count = min(remaining, self.batch_size)
+            yield defer.DeferredList([self.agent.bump()
+                                      for _ in range(count)])
+            remaining -= count
+        yield feat_time.wait_for(self, self.driver._journaler.is_idle, 60)
+
+        histories = yield self.driver._journaler.get_histories()
+        history = [x for x in histories if x.agent_id == self.agent_id][0]
+        self.journal = yield self.driver._journaler.get_entries(history)
+
+    @defer.inlineCallbacks
+    def teardown(self):
+        del self.journal
+        del self.agent
+        yield SimulationScenario.teardown(self)
+
+    def run(self):
+        player = agency_replay.Replay(iter(self.journal), self.agent_id)
+        for entry in player:
+            started = time.time()
+            entry.apply()
+            self.record(started)
+        if player.agent.get_counter() != self.agent.get_counter():
+            raise RuntimeError("Replayed agent state differs from the "
+                               "state of the agent recorded.")
+
+
+class SerializationScenario(Scenario):
+    '''
+    Serializes and unserializes back a descriptor with a large number of
+    partners, an operation is a full round trip. The size of the serialized
+    descriptor is reported as well.
+    '''
+
+    defaults = dict(partners=1000, iterations=100)
+
+    serialize = None
+    unserialize = None
+
+    def setup(self):
+        desc = Descriptor(doc_id=unicode(uuid.uuid1()), shard=u'lobby')
+        for index in range(self.params['partners']):
+            recp = recipient.Agent(str(uuid.uuid1()), u'lobby')
+            desc.partners.append(
+                partners.BasePartner(recp, allocation_id=index, role='bench'))
+        self.descriptor = desc
+
+    def teardown(self):
+        del self.descriptor
+
+    def run(self):
+        for _ in range(self.params['iterations']):
+            started = time.time()
+            data = self.serialize(self.descriptor)
+            result = self.unserialize(data)
+            self.record(started)
+        self.size = len(data)
+        if len(result.partners) != self.params['partners']:
+            raise RuntimeError("Unserialized descriptor is missing "
+                               "partners.")
+
+    def get_result(self, duration):
+        result = Scenario.get_result(self, duration)
+        result['size'] = self.size
+        return result
+
+
+class BananaScenario(SerializationScenario):
+
+    name = 'banana'
+
+    serialize = staticmethod(banana.serialize)
+    unserialize = staticmethod(banana.unserialize)
+
+
+class JSONScenario(SerializationScenario):
+
+    name = 'json'
+
+    serialize = staticmethod(feat_json.serialize)
+    unserialize = staticmethod(feat_json.unserialize)
+
+
+class CompactJSONScenario(SerializationScenario):
+    '''The format used for the documents stored in the database.'''
+
+    name = 'json-compact'
+
+    serialize = staticmethod(feat_json.Serializer(compact=True).convert)
+    unserialize = staticmethod(feat_json.Unserializer().convert)
+
+
+class LogQueryScenario(Scenario):
+    '''
+    Fetches the first page of the log entries of a random agent from
+    a journal holding the given number of log entries, an operation is
+    a filtered query. The journal is filled directly through sqlite during
+    the setup, logs of 100 agents of 10 categories logged over a day.
+    '''
+
+    name = 'log-query'
+    defaults = dict(logs=5000000, queries=100)
+
+    categories = 10
+    names = 100
+    page = 100
+
+    @defer.inlineCallbacks
+    def setup(self):
+        fd, self.filename = tempfile.mkstemp(suffix='_bench.sqlite')
+        os.close(fd)
+        os.remove(self.filename)
+        self.writer = journaler.SqliteWriter(self, filename=self.filename)
+        yield self.writer.initiate()
+        yield self.writer.close()
+
+        db = sqlite3.connect(self.filename)
+        db.executemany("INSERT INTO logs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       self._generate_logs())
+        db.commit()
+        db.close()
+        yield self.writer.initiate()
+
+    @defer.inlineCallbacks
+    def teardown(self):
+        yield self.writer.close()
+        del self.writer
+        os.remove(self.filename)
+
+    @defer.inlineCallbacks
+    def run(self):
+        rand = random.Random(42)
+        for _ in range(self.params['queries']):
+            index = rand.randrange(self.names)
+            category, name = self._get_agent(index)
+            filters = [dict(category=category, name=name, level=4)]
+            started = time.time()
+            yield self.writer.get_log_page(filters=filters, limit=self.page)
+            self.record(started)
+
+    def _generate_logs(self):
+        rand = random.Random(42)
+        count = self.params['logs']
+        start = int(time.time()) - 86400
+        message = sqlite3.Binary('log message ' * 5)
+        for index in xrange(count):
+            category, name = self._get_agent(rand.randrange(self.names))
+            yield (message, rand.randint(1, 5), category, name,
+                   u'feat/agents/bench.py', index % 1000,
+                   start + index * 86400 // count)
+
+    def _get_agent(self, index):
+        return (u'category_%d' % (index % self.categories, ),
+                u'agent_%d' % (index, ))
+
+
+class TimersScenario(Scenario):
+    '''
+    Schedules the given number of concurrent protocol timeouts, spread
+    over half a minute, and cancels them all as the protocols would when
+    finishing on time. An operation is scheduling or cancelling a timeout.
+    '''
+
+    defaults = dict(timeouts=50000)
+
+    def get_call_later(self):
+        raise NotImplementedError('This method should be overloaded')
+
+    def run(self):
+        call_later = self.get_call_later()
+        calls = list()
+        for index in range(self.params['timeouts']):
+            started = time.time()
+            calls.append(call_later(10 + (index % 300) * 0.1, self._expired))
+            self.record(started)
+        for call in calls:
+            started = time.time()
+            call.cancel()
+            self.record(started)
+
+    def _expired(self):
+        raise RuntimeError("Timeout should have been cancelled.")
+
+
+class ReactorTimersScenario(TimersScenario):
+    '''A delayed call of the reactor for every timeout.'''
+
+    name = 'timers-reactor'
+
+    def get_call_later(self):
+        return feat_time.callLater
+
+
+class WheelTimersScenario(TimersScenario):
+    '''The timer wheel shared by the agents of an agency.'''
+
+    name = 'timers-wheel'
+
+    def get_call_later(self):
+        return feat_time.TimerWheel().call_later
+
+
+class StartupScenario(Scenario):
+    '''
+    Imports the modules of a standalone agency running a single agent in
+    a new python process, an operation is a start-up. The peak resident
+    set size of the processes is reported as well.
+    '''
+
+    name = 'startup'
+    defaults = dict(startups=10)
+
+    agent_type = 'dns_agent'
+
+    script = text_helper.format_block("""
+    import resource, time
+    started = time.time()
+    from feat.agencies import bootstrap
+    from feat.agents.base import agent
+    agent.registry_lookup(%r)
+    print time.time() - started
+    print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    """)
+
+    def run(self):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        command = [sys.executable, '-c', self.script % (self.agent_type, )]
+        self.rss = 0
+        for _ in range(self.params['startups']):
+            process = subprocess.Popen(command, env=env,
+                                       stdout=subprocess.PIPE)
+            output, _ = process.communicate()
+            if process.returncode != 0:
+                raise RuntimeError("Starting up the agency failed with "
+                                   "the exit code %d" % process.returncode)
+            duration, rss = output.split()[-2:]
+            self.latencies.append(float(duration))
+            self.rss = max(self.rss, int(rss))
+
+    def get_result(self, duration):
+        result = Scenario.get_result(self, duration)
+        result['rss'] = self.rss
+        return result
+
+
+scenarios = dict((x.name, x) for x in (HostsScenario, ContractScenario,
+                                       MessagesScenario, ReplayScenario,
+                                       BananaScenario, JSONScenario,
+                                       CompactJSONScenario,
+                                       LogQueryScenario, StartupScenario,
+                                       ReactorTimersScenario,
+                                       WheelTimersScenario))
+
+
+def get_scenario(name, params=None):
+    '''
+    Builds the scenario of the given name. Only the parameters
+    the scenario knows about are taken from the params dictionary.
+    '''
+    if name not in scenarios:
+        raise KeyError("Unknown benchmark scenario: %r" % (name, ))
+    factory = scenarios[name]
+    params = dict((k, v) for k, v in (params or dict()).iteritems()
+                  if k in factory.defaults)
+    return factory(**params)
+
+
+@defer.inlineCallbacks
+def run(names=None, params=None):
+    '''
+    Runs the scenarios of the given names one after another,
+    returns a Deferred fired with the report dictionary.
+    '''
+    names = names or sorted(scenarios)
+    selected = [get_scenario(name, params) for name in names]
+    results = list()
+    for scenario in selected:
+        result = yield scenario.execute()
+        results.append(result)
+    defer.returnValue(dict(timestamp=time.time(),
+                           python=platform.python_version(),
+                           platform=platform.platform(),
+                           results=results))
+
+
+def render(report):
+    return json.dumps(report, indent=2, sort_keys=True)
+
+
+def parse_options(args):
+    usage = "%prog [options] [SCENARIO...]"
+    parser = optparse.OptionParser(usage=usage)
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help="file to write the JSON results to "
+                           "instead of stdout")
+    parser.add_option('-p', '--param', dest='params', default=[],
+                      action='append', metavar='NAME=VALUE',
+                      help="integer parameter passed to all the scenarios "
+                           "taking it, can be used multiple times")
+    parser.add_option('-l', '--list', dest='list', default=False,
+                      action='store_true',
+                      help="list the scenarios with their parameters")
+    opts, names = parser.parse_args(args)
+
+    params = dict()
+    for param in opts.params:
+        key, sep, value = param.partition('=')
+        if not sep or not value.isdigit():
+            parser.error("Invalid parameter %r, expected NAME=VALUE "
+                         "with an integer value." % (param, ))
+        params[key] = int(value)
+
+    for name in names:
+        if name not in scenarios:
+            parser.error("Unknown scenario %r, known ones are: %s"
+                         % (name, ", ".join(sorted(scenarios))))
+
+    return opts, names, params
+
+
+def main(args=None):
+    opts, names, params = parse_options(args)
+
+    if opts.list:
+        for name in sorted(scenarios):
+            defaults = scenarios[name].defaults
+            print "%s: %s" % (name, ", ".join("%s=%s" % i for i in
+                                              sorted(defaults.items())))
+        return 0
+
+    log.FluLogKeeper.init()
+    status = []
+
+    def write(report):
+        output = render(report)
+        if opts.output:
+            with open(opts.output, 'w') as f:
+                f.write(output + "\n")
+        else:
+            print output
+        status.append(0)
+
+    def failed(fail):
+        print >> sys.stderr, fail.getTraceback()
+        status.append(1)
+
+    def start():
+        d = run(names, params)
+        d.addCallbacks(write, failed)
+        d.addBoth(defer.drop_param, reactor.stop)
+
+    reactor.callWhenRunning(start)
+    reactor.run()
+    return status[0] if status else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
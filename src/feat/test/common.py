@@ -152,13 +152,17 @@ class TestCase(unittest.TestCase, log.FluLogKeeper, log.Logger):
                 setattr(self, attr, value)
 
     def setUp(self):
+        time.reset()
         # Scale time if configured
         scale = util.acquireAttribute(self._parents, 'timescale', None)
         if scale is not None:
             time.scale(scale)
+        # Use a virtual clock jumping to the next scheduled call if configured
+        if util.acquireAttribute(self._parents, 'virtual_time', False):
+            time.virtualize()
+            self.info("Test running with virtual time")
         else:
-            time.reset()
-        self.info("Test running with timescale: %r", time._get_scale())
+            self.info("Test running with timescale: %r", time._get_scale())
 
     def getSlow(self):
         """
@@ -539,7 +543,14 @@ class AgencyTestHelper(object):
 
     def reply(self, msg, reply_to, original_msg):
         d = self.cb_after(arg=None, obj=self.agent, method='on_message')
+        self.post_reply(msg, reply_to, original_msg)
+        return d
 
+    def post_reply(self, msg, reply_to, original_msg):
+        '''
+        Same as reply() but doesn't wait for the message to be delivered.
+        Useful when sending a lot of messages at once.
+        '''
         dest = recipient.IRecipient(original_msg)
 
         msg.reply_to = recipient.IRecipient(reply_to)
@@ -551,7 +562,6 @@ class AgencyTestHelper(object):
 
         messaging = self.agent._channels["default"]
         messaging.post(dest, msg)
-        return d
 
 
 class StubAgent(object):
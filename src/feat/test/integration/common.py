@@ -28,7 +28,7 @@ from pprint import pformat
 from twisted.trial.unittest import FailTest
 
 from feat.test import common
-from feat.common import text_helper, defer, reflect
+from feat.common import text_helper, defer, reflect, time
 from feat.common.serialization import pytree
 from feat.simulation import driver
 from feat.agencies import replay
@@ -111,8 +111,11 @@ class OverrideConfigMixin(object):
 
 class SimulationTest(common.TestCase, OverrideConfigMixin):
 
-    configurable_attributes = ['skip_replayability', 'jourfile', 'save_stats']
+    configurable_attributes = ['skip_replayability', 'jourfile', 'save_stats',
+                               'replay_from_snapshot']
     skip_replayability = False
+    # validate only the entries after the latest snapshot of the agents
+    replay_from_snapshot = False
     jourfile = None
     save_stats = False
 
@@ -184,7 +187,8 @@ class SimulationTest(common.TestCase, OverrideConfigMixin):
 
             histories = yield self.driver._journaler.get_histories()
             for history in histories:
-                entries = yield self.driver._journaler.get_entries(history)
+                entries = yield self.driver._journaler.get_entries(
+                    history, from_snapshot=self.replay_from_snapshot)
                 yield self._validate_replay_on_agent(history, entries)
         else:
             msg = ("\n\033[91mFIXME: \033[0mReplayability test "
@@ -350,16 +354,16 @@ class SimulationTest(common.TestCase, OverrideConfigMixin):
         return compare_value(expected, value, "")
 
     @defer.inlineCallbacks
-    def wait_for_idle(self, timeout, freq=0.05):
+    def wait_for_idle(self, timeout, freq=None):
         try:
-            yield self.wait_for(self.driver.is_idle, timeout, freq)
-        except FailTest:
+            yield self.driver.wait_for_idle(timeout, freq)
+        except RuntimeError as e:
             for agent in self.driver.iter_agents():
                 activity = agent.show_activity()
                 if activity is None:
                     continue
                 self.info(activity)
-            raise
+            raise FailTest(str(e))
 
     def count_agents(self, agent_type=None):
         return self.driver.count_agents(agent_type)
@@ -397,9 +401,9 @@ class MultiClusterSimulation(common.TestCase, OverrideConfigMixin):
     @defer.inlineCallbacks
     def tearDown(self):
 
-        def freeze_and_destroy(driver):
-            d = driver.freeze_all()
-            d.addCallback(defer.drop_param, driver.destroy)
+        def freeze_and_destroy(drv):
+            d = drv.freeze_all()
+            d.addCallback(defer.drop_param, drv.destroy)
             return d
 
         yield defer.DeferredList([freeze_and_destroy(x)
@@ -412,22 +416,28 @@ class MultiClusterSimulation(common.TestCase, OverrideConfigMixin):
         yield common.TestCase.tearDown(self)
 
     @defer.inlineCallbacks
-    def wait_for_idle(self, timeout, freq=0.05):
+    def wait_for_idle(self, timeout, freq=None):
 
         def all_idle():
             return all([x.is_idle() for x in self.drivers])
 
+        deadline = time.time() + timeout
         try:
-            yield self.wait_for(all_idle, timeout, freq)
-        except FailTest:
-            for driver, index in zip(self.drivers, range(len(self.drivers))):
+            # drivers share the tunneling bridge, while waiting for one
+            # of them the other can become busy again
+            while not all_idle():
+                for drv in self.drivers:
+                    left = max(deadline - time.time(), 0)
+                    yield drv.wait_for_idle(left, freq)
+        except RuntimeError as e:
+            for drv, index in zip(self.drivers, range(len(self.drivers))):
                 self.info("Inspecting driver #%d", index)
-                for agent in driver.iter_agents():
+                for agent in drv.iter_agents():
                     activity = agent.show_activity()
                     if activity is None:
                         continue
                     self.info(activity)
-            raise
+            raise FailTest(str(e))
 
     def process(self, driver, script):
         d = self.cb_after(None, driver._parser, 'on_finish')
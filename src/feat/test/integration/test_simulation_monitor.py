@@ -24,7 +24,7 @@
 import copy
 import operator
 
-from feat import everything
+from feat.agents.shard import shard_agent
 from feat.agents.base import recipient, descriptor, agent, partners, replay
 from feat.agents.base import dbtools
 from feat.agents.common import monitor
@@ -319,7 +319,7 @@ class RestartingSimulation(common.SimulationTest):
 class MonitoringMonitor(common.SimulationTest):
 
     def setUp(self):
-        config = everything.shard_agent.ShardAgentConfiguration(
+        config = shard_agent.ShardAgentConfiguration(
             doc_id = 'test-config',
             hosts_per_shard = 2)
         dbtools.initial_data(config)
@@ -452,7 +452,7 @@ class MonitoringMonitor(common.SimulationTest):
 class SimulateMultipleMonitors(common.SimulationTest):
 
     def setUp(self):
-        config = everything.shard_agent.ShardAgentConfiguration(
+        config = shard_agent.ShardAgentConfiguration(
             doc_id = 'test-config',
             hosts_per_shard = 1)
         dbtools.initial_data(config)
@@ -563,7 +563,7 @@ class TestMonitorPartnerships(common.SimulationTest):
 
     def setUp(self):
         if self.hosts_per_shard:
-            config = everything.shard_agent.ShardAgentConfiguration()
+            config = shard_agent.ShardAgentConfiguration()
             config.doc_id = 'test-config'
             config.hosts_per_shard = self.hosts_per_shard
             dbtools.initial_data(config)
@@ -25,9 +25,9 @@ from twisted.internet import defer
 
 from feat.common.text_helper import format_block
 from feat.test.integration import common
-from feat.agents.base import (agent, descriptor, recipient,
+from feat.agents.base import (agent, descriptor, recipient, sender,
                               partners, replay, resource, requester, )
-from feat.common import serialization, fiber
+from feat.common import serialization, fiber, formatable, time
 
 
 class FailureOfPartner(Exception):
@@ -119,6 +119,33 @@ class Agent(agent.BaseAgent, resource.AgentMixin):
         return requester.notify_restarted(self, recp, origin, new_address)
 
 
+@descriptor.register('notifying-agent')
+class NotifyingDescriptor(descriptor.Descriptor):
+
+    formatable.field('pending_notifications', dict())
+
+
+@agent.register('notifying-agent')
+class NotifyingAgent(agent.BaseAgent):
+
+    @replay.mutable
+    def initiate(self, state):
+        state.sender = state.medium.initiate_protocol(
+            sender.NotificationSender, period=100)
+
+    @replay.journaled
+    def notify(self, state, notifications):
+        return state.sender.notify(notifications)
+
+    @replay.journaled
+    def flush_notifications(self, state, agent_id):
+        return state.sender.flush_notifications(agent_id)
+
+    @replay.immutable
+    def has_empty_outbox(self, state):
+        return state.sender.has_empty_outbox()
+
+
 @common.attr(timescale=0.05)
 class PartnershipTest(common.SimulationTest):
 
@@ -332,6 +359,33 @@ class PartnershipTest(common.SimulationTest):
         partner_obj = self.receiver.get_agent().query_partners('caretaker')
         self.assertEqual(0, len(partner_obj))
 
+    @common.attr(timescale=1)
+    @defer.inlineCallbacks
+    def testDrainingPendingNotifications(self):
+        yield self._partnership_taking_care(self.initiator, self.receiver)
+        yield self.process(format_block("""
+        agency.start_agent(descriptor_factory('notifying-agent'))
+        """))
+        notifier = self.get_local('_').get_agent()
+
+        irecv = recipient.IRecipient(self.receiver)
+        iinit = recipient.IRecipient(self.initiator)
+        count = 1000
+        notifications = [sender.PendingNotification(type='died',
+                                                    origin=iinit,
+                                                    recipient=irecv)
+                         for _ in range(count)]
+        yield notifier.notify(notifications)
+        self.assertFalse(notifier.has_empty_outbox())
+
+        start = time.time()
+        yield notifier.flush_notifications(irecv.key)
+        elapsed = time.time() - start
+        self.info("Drained %d pending notifications in %.3f s "
+                  "(%.1f notifications/s).", count, elapsed,
+                  count / elapsed if elapsed else float('inf'))
+        self.assertTrue(notifier.has_empty_outbox())
+
     def assert_partners(self, agents, expected):
         for agent, e in zip(agents, expected):
             self.assertEqual(e, len(agent.get_descriptor().partners))
@@ -21,9 +21,12 @@
 # Headers in this file shall remain intact.
 # -*- Mode: Python -*-
 # vi:si:et:sw=4:sts=4:ts=4
+import random
+import time
+
 from twisted.internet import defer
 
-from feat import everything
+from feat.agents.shard import shard_agent
 from feat.common import first
 from feat.test.integration import common
 from feat.common.text_helper import format_block
@@ -108,7 +111,7 @@ class SingleHostAllocationSimulation(common.SimulationTest):
         categories = {}
         allocation_id, irecipient = \
                 yield self.req_agent.request_resource(resources, categories)
-        yield self.host_medium.wait_for_protocols_finish()
+        yield self.wait_for_idle(10)
         checkAllocation(self, self.host_agent, resources)
         d = self.req_agent.request_resource(resources, categories)
         self.assertFailure(d, raage.AllocationFailedError)
@@ -259,6 +262,293 @@ class MultiHostAllocationSimulation(common.SimulationTest):
         self._checkAllocations(resources, 3)
 
 
+@common.attr(timescale=1)
+@common.attr('slow')
+class CapacityIndexSimulation(common.SimulationTest):
+
+    timeout = 120
+
+    hosts = 6
+
+    @defer.inlineCallbacks
+    def prolog(self):
+        setup = format_block("""
+        load('feat.test.integration.resource')
+        agency = spawn_agency()
+        agency.disable_protocol('setup-monitoring', 'Task')
+        desc = descriptor_factory('host_agent')
+        agency.start_agent(desc, hostdef=hostdef)
+        host = _.get_agent()
+
+        wait_for_idle()
+        host.start_agent(descriptor_factory('requesting_agent'))
+        """)
+        for _ in range(self.hosts - 1):
+            setup += format_block("""
+            agency = spawn_agency()
+            agency.disable_protocol('setup-monitoring', 'Task')
+            desc = descriptor_factory('host_agent')
+            agency.start_agent(desc, hostdef=hostdef)
+            wait_for_idle()
+            """)
+
+        hostdef = host.HostDef()
+        hostdef.resources = {"host": 1, "epu": 10}
+        hostdef.categories = {"access": Access.private,
+                              "address": Address.dynamic,
+                              "storage": Storage.static}
+        self.set_local("hostdef", hostdef)
+
+        yield self.process(setup)
+        yield self.wait_for_idle(20)
+
+        self.req_agent = first(
+            self.driver.iter_agents('requesting_agent')).get_agent()
+        self.raage_agent = first(
+            self.driver.iter_agents('raage_agent')).get_agent()
+        self.host_agents = [x.get_agent()
+                            for x in self.driver.iter_agents('host_agent')]
+
+    def testValidateProlog(self):
+        self.assertEqual(self.hosts, self.count_agents('host_agent'))
+        self.assertEqual(1, self.count_agents('raage_agent'))
+
+    @defer.inlineCallbacks
+    def testAllocationLatency(self):
+        for agent in self.host_agents:
+            agent.publish_resource_summary()
+        yield self.wait_for_idle(10)
+
+        resources = {'epu': 1}
+        candidates = self.raage_agent.get_allocation_candidates(resources, {})
+        self.assertEqual(
+            self.raage_agent.candidates_count, len(candidates))
+
+        count = 20
+        allocated = self._count_allocated('epu')
+        published = self.driver.get_stats().get('messages published', 0)
+        start = time.time()
+        for _ in range(count):
+            yield self.req_agent.request_resource(resources, {})
+        elapsed = time.time() - start
+        published = (self.driver.get_stats().get('messages published', 0)
+                     - published)
+        self.info("Allocated %d times among %d hosts, %.3f s and %.1f "
+                  "messages per allocation.", count, self.hosts,
+                  elapsed / count, float(published) / count)
+
+        yield self.wait_for_idle(10)
+        self.assertEqual(allocated + count, self._count_allocated('epu'))
+
+    def _count_allocated(self, name):
+        count = 0
+        for agent in self.host_agents:
+            _, allocated = agent.list_resource()
+            count += allocated[name]
+        return count
+
+
+# Handling the requests takes the agents longer than the announce windows of
+# the contracts, the virtual clock only lets them expire once they are idle.
+@common.attr(virtual_time=True)
+@common.attr('slow')
+class ConcurrentAllocationSimulation(common.SimulationTest):
+
+    timeout = 120
+
+    hosts = 3
+    requests = 100
+
+    @defer.inlineCallbacks
+    def prolog(self):
+        setup = format_block("""
+        load('feat.test.integration.resource')
+        agency = spawn_agency()
+        agency.disable_protocol('setup-monitoring', 'Task')
+        desc = descriptor_factory('host_agent')
+        agency.start_agent(desc, hostdef=hostdef)
+        host = _.get_agent()
+
+        wait_for_idle()
+        host.start_agent(descriptor_factory('requesting_agent'))
+        """)
+        for _ in range(self.hosts - 1):
+            setup += format_block("""
+            agency = spawn_agency()
+            agency.disable_protocol('setup-monitoring', 'Task')
+            desc = descriptor_factory('host_agent')
+            agency.start_agent(desc, hostdef=hostdef)
+            wait_for_idle()
+            """)
+
+        # a bit more than needed, so that every request can be served
+        capacity = self.requests // self.hosts + 5
+        hostdef = host.HostDef()
+        hostdef.resources = {"host": 1, "epu": capacity}
+        hostdef.categories = {"access": Access.private,
+                              "address": Address.dynamic,
+                              "storage": Storage.static}
+        self.set_local("hostdef", hostdef)
+
+        yield self.process(setup)
+        yield self.wait_for_idle(20)
+
+        self.req_agent = first(
+            self.driver.iter_agents('requesting_agent')).get_agent()
+        self.host_agents = [x.get_agent()
+                            for x in self.driver.iter_agents('host_agent')]
+
+    @defer.inlineCallbacks
+    def testSimultaneousAllocations(self):
+        resources = {'epu': 1}
+        # the agents started by the prolog take their share too
+        allocated = self._count_allocated('epu')
+        start = time.time()
+        results = yield defer.DeferredList(
+            [self.req_agent.request_resource(resources, {})
+             for _ in range(self.requests)], consumeErrors=True)
+        elapsed = time.time() - start
+        failed = [x for ok, x in results if not ok]
+        self.info("%d simultaneous allocations among %d hosts: %.3f s, "
+                  "%.1f allocations per second, %d failed.",
+                  self.requests, self.hosts, elapsed,
+                  self.requests / elapsed, len(failed))
+        self.assertEqual([], failed)
+
+        yield self.wait_for_idle(20)
+        for agent in self.host_agents:
+            self.assertFalse(agent.has_preallocations())
+        self.assertEqual(allocated + self.requests,
+                         self._count_allocated('epu'))
+
+    def _count_allocated(self, name):
+        count = 0
+        for agent in self.host_agents:
+            totals, allocated = agent.list_resource()
+            self.assertTrue(allocated[name] <= totals[name])
+            count += allocated[name]
+        return count
+
+
+# Only the placement should decide where the allocations go, the virtual
+# clock keeps the announce windows from expiring under the load of the run.
+@common.attr(virtual_time=True)
+@common.attr('slow')
+class PlacementSimulation(common.SimulationTest):
+
+    timeout = 900
+
+    requests = 1000
+    # probability of asking for the whole host
+    big_ratio = 0.1
+
+    def setUp(self):
+        config = shard_agent.ShardAgentConfiguration(
+            doc_id = u'test-config',
+            hosts_per_shard = 2)
+        dbtools.initial_data(config)
+        self.override_config('shard_agent', config)
+        return common.SimulationTest.setUp(self)
+
+    @defer.inlineCallbacks
+    def prolog(self):
+        setup = format_block("""
+        load('feat.test.integration.resource')
+        agency = spawn_agency()
+        agency.disable_protocol('setup-monitoring', 'Task')
+        agency.start_agent(descriptor_factory('host_agent'), hostdef=hostdef)
+        host = _.get_agent()
+
+        wait_for_idle()
+        host.start_agent(descriptor_factory('requesting_agent'))
+        """)
+        for _ in range(3):
+            setup += format_block("""
+            agency = spawn_agency()
+            agency.disable_protocol('setup-monitoring', 'Task')
+            desc = descriptor_factory('host_agent')
+            agency.start_agent(desc, hostdef=hostdef)
+            wait_for_idle()
+            """)
+
+        hostdef = host.HostDef(resources=dict(host=1, epu=10))
+        self.set_local("hostdef", hostdef)
+
+        yield self.process(setup)
+        yield self.wait_for_idle(20)
+
+        host_mediums = self.driver.iter_agents('host_agent')
+        self.host_agents = [x.get_agent() for x in host_mediums]
+        self.hosts = dict((recipient.IRecipient(x).key, x)
+                          for x in self.host_agents)
+        # the hosts of the shard of the requesting agent
+        self.local = set(recipient.IRecipient(x).key
+                         for x in self.host_agents[0:2])
+        self.req_agent = first(
+            self.driver.iter_agents('requesting_agent')).get_agent()
+
+    def testValidateProlog(self):
+        self.assertEqual(4, self.count_agents('host_agent'))
+        self.assertEqual(2, self.count_agents('shard_agent'))
+
+    @defer.inlineCallbacks
+    def testMixedAllocations(self):
+        packing = yield self._run_workload(host.Placement.packing)
+        spreading = yield self._run_workload(host.Placement.spreading)
+
+        for placement, (allocated, nested) in ((host.Placement.packing,
+                                                packing),
+                                               (host.Placement.spreading,
+                                                spreading)):
+            self.info("%s placement: %d of %d allocations succeeded, "
+                      "%d of them needed a nested contract.",
+                      placement.name, allocated, self.requests, nested)
+
+        self.assertEqual(self.requests, packing[0])
+        self.assertTrue(packing[1] < spreading[1])
+
+    @defer.inlineCallbacks
+    def _run_workload(self, placement):
+        for agent in self.host_agents:
+            agent._setup_placement(placement)
+
+        # The agents of the shard already take some of the resources of
+        # its hosts. Small allocations never use more than the fullest host
+        # has left, while the big ones take the whole of the emptiest host
+        # and there is only one at a time. Only fragmentation can make the
+        # big ones leave the shard.
+        free = [total - used
+                for total, used, _ in (x.get_resource_usage()['epu']
+                                       for x in self.host_agents[0:2])]
+        rand = random.Random(42)
+        small, big = list(), list()
+        allocated = nested = 0
+        for _ in range(self.requests):
+            if rand.random() < self.big_ratio:
+                size, live, limit = max(free), big, max(free)
+            else:
+                size, live, limit = rand.randint(1, 3), small, min(free)
+            while live and sum(x[0] for x in live) + size > limit:
+                yield self._release(*live.pop(0))
+            try:
+                allocation_id, recp = yield self.req_agent.request_resource(
+                    {'epu': size}, {})
+            except raage.AllocationFailedError:
+                continue
+            allocated += 1
+            if recp.key not in self.local:
+                nested += 1
+            live.append((size, allocation_id, recp))
+
+        for size, allocation_id, recp in small + big:
+            yield self._release(size, allocation_id, recp)
+        yield self.wait_for_idle(20)
+        defer.returnValue((allocated, nested))
+
+    def _release(self, size, allocation_id, recp):
+        return self.hosts[recp.key].release_resource(allocation_id)
+
+
 @common.attr(timescale=0.1)
 @common.attr('slow')
 class ContractNestingSimulation(common.SimulationTest):
@@ -266,7 +556,7 @@ class ContractNestingSimulation(common.SimulationTest):
     timeout = 40
 
     def setUp(self):
-        config = everything.shard_agent.ShardAgentConfiguration(
+        config = shard_agent.ShardAgentConfiguration(
             doc_id = u'test-config',
             hosts_per_shard = 2)
         dbtools.initial_data(config)
@@ -23,9 +23,11 @@ from twisted.python import failure
 
 from feat.test.integration import common
 
+from feat.agencies import journaler
+from feat.agencies.replay import validate_journal
 from feat.agencies.common import StateMachineMixin
 from feat.agents.base import agent, descriptor, replay
-from feat.common import serialization, defer, fiber
+from feat.common import serialization, defer, fiber, first
 from feat.common.text_helper import format_block
 
 
@@ -96,3 +98,57 @@ class ReplayTest(common.SimulationTest):
         agent = self.get_local('agent')
         result = yield agent.test_side_effect(42)
         self.assertEqual(result, 42 + 1 + 2 +3)
+
+
+@common.attr(timescale=0.05)
+class SnapshotReplayTest(common.SimulationTest):
+
+    jourfile = "SnapshotReplayTest.sqlite3"
+    replay_from_snapshot = True
+
+    def prolog(self):
+        setup = format_block("""
+        agency = spawn_agency()
+        agency.disable_protocol('setup-monitoring', 'Task')
+        desc = descriptor_factory('replay_test_agent')
+        medium = agency.start_agent(desc)
+        agent = medium.get_agent()
+        """)
+        return self.process(setup)
+
+    @defer.inlineCallbacks
+    def testValidateFromSnapshot(self):
+        medium = self.get_local('medium')
+        agent = self.get_local('agent')
+        for x in range(3):
+            yield agent.do_stuff(x)
+        medium.journal_snapshot()
+        for x in range(2):
+            yield agent.do_stuff(x)
+        yield self.wait_for(self.driver._journaler.is_idle, 10, 0.01)
+
+        journal = self.driver._journaler
+        histories = yield journal.get_histories()
+        history = first(h for h in histories
+                        if h.agent_id == agent.get_agent_id())
+        entries = yield journal.get_entries(history)
+        tail = yield journal.get_entries(history, from_snapshot=True)
+        self.assertEqual('snapshot', tail[0][3])
+        self.assertEqual(3, len(tail))
+        self.assertEqual(entries[-3:], tail)
+
+        reader = journaler.JournalReader(self.jourfile)
+        self.assertEqual(tail, list(reader.iter_entries(
+            history, from_snapshot=True)))
+        reader.close()
+
+        report = validate_journal(self.jourfile, processes=2)
+        self.assertEqual({}, report.failures)
+        self.assertEqual(1, report.histories)
+        self.assertEqual(3, report.entries)
+        self.assertTrue(report.peak_rss > 0)
+
+        report = validate_journal(self.jourfile, from_snapshot=False,
+                                  processes=2)
+        self.assertEqual({}, report.failures)
+        self.assertEqual(len(entries), report.entries)
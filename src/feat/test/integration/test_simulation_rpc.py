@@ -191,3 +191,33 @@ class RPCTest(common.SimulationTest):
                                     "not_published")
 
         return d
+
+    @defer.inlineCallbacks
+    def testPipelinedCalls(self):
+        agent1 = self.get_local('agent1')
+        agent2 = self.get_local('agent2')
+        recip2 = IRecipient(agent2)
+
+        stats = self.driver.get_stats()
+        published = stats.get('messages published', 0)
+
+        d1 = agent1.call_remote_ex(recip2, "set_value", ("spam", ),
+                                   pipeline=True)
+        d2 = agent1.call_remote_ex(recip2, "raise_error", (ValueError, ),
+                                   pipeline=True)
+        d3 = agent1.call_remote_ex(recip2, "set_value", ("bacon", ),
+                                   pipeline=True)
+        d4 = agent1.call_remote_ex(recip2, "not_published", pipeline=True)
+
+        result = yield d1
+        self.assertEqual(result, None)
+        yield self.assertFailure(d2, ValueError)
+        result = yield d3
+        self.assertEqual(result, "spam")
+        yield self.assertFailure(d4, rpc.NotPublishedError)
+        self.assertEqual(agent2.get_value(), "bacon")
+
+        # all the calls traveled in one request and came back in one reply
+        yield self.wait_for_idle(10)
+        stats = self.driver.get_stats()
+        self.assertEqual(2, stats.get('messages published', 0) - published)
@@ -46,7 +46,7 @@ class Agent(agent.BaseAgent):
 
     @replay.journaled
     def initiate(self, state):
-        state.medium.register_interest(contractor.Service(Interest))
+        self.register_service(Interest)
 
     def discover(self):
         return self.discover_service(Initiator)
@@ -85,3 +85,38 @@ class ServiceDiscoverySimulation(common.SimulationTest):
         for recp in servicies:
             self.assertTrue(recipient.IRecipient.providedBy(recp))
             self.assertTrue(recp in dest)
+
+    @defer.inlineCallbacks
+    def test_time_to_first_result(self):
+        start = time.time()
+        servicies = yield self.agents[0].discover()
+        broadcast = time.time() - start
+        self.assertEqual(3, len(servicies))
+
+        start = time.time()
+        cached = yield self.agents[0].discover()
+        directory = time.time() - start
+        self.info("Time to first result: %.3f s with the broadcast, "
+                  "%.3f s from the service directory.",
+                  broadcast, directory)
+        self.assertEqual(set(servicies), set(cached))
+        self.assertTrue(directory < broadcast)
+
+    @defer.inlineCallbacks
+    def test_announced_provider(self):
+        servicies = yield self.agents[0].discover()
+        self.assertEqual(3, len(servicies))
+
+        setup = format_block("""
+        agency.start_agent(descriptor_factory('discoverer-agent'))
+        agent4 = _.get_agent()
+        """)
+        yield self.process(setup)
+        yield self.wait_for_idle(10)
+        agent4 = self.get_local('agent4')
+
+        start = time.time()
+        servicies = yield self.agents[0].discover()
+        self.assertTrue(time.time() - start < 1)
+        self.assertEqual(4, len(servicies))
+        self.assertTrue(recipient.IRecipient(agent4) in servicies)
@@ -243,21 +243,21 @@ class TunnellingTest(common.SimulationTest):
         ha1m = agency1.start_agent(descriptor_factory('host_agent'))
         ha1 = ha1m.get_agent()
 
-        wait_for_idle(20)
+        wait_for_idle(40)
 
         agency2 = spawn_agency()
         agency2.disable_protocol('setup-monitoring', 'Task')
         ha2m = agency2.start_agent(descriptor_factory('host_agent'))
         ha2 = ha2m.get_agent()
 
-        wait_for_idle(20)
+        wait_for_idle(40)
 
         agency3 = spawn_agency()
         agency3.disable_protocol('setup-monitoring', 'Task')
         ha3m = agency3.start_agent(descriptor_factory('host_agent'))
         ha3 = ha3m.get_agent()
 
-        wait_for_idle(20)
+        wait_for_idle(40)
 
         ha1.start_agent(descriptor_factory('test_agent'))
         ha1.start_agent(descriptor_factory('test_agent'))
@@ -302,7 +302,7 @@ class TunnellingTest(common.SimulationTest):
             a.disable_tunneling()
 
         a1.start_private_contract(recipients, "spam", "tomato")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_contract(agents, [([], [], [])]*6)
         self.full_reset()
 
@@ -312,7 +312,7 @@ class TunnellingTest(common.SimulationTest):
         agents[5].enable_interest()
 
         a1.start_private_contract(recipients, "spam", "tomato")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_contract(agents, [([], [], [])]*6)
         self.full_reset()
 
@@ -322,7 +322,7 @@ class TunnellingTest(common.SimulationTest):
         agents[5].enable_tunneling()
 
         a1.start_private_contract(recipients, "spam", "tomato")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_contract(agents,
                                     [([], ["bacon", "beans", "tomato"], []),
                                      (["spam"], [], []),
@@ -339,7 +339,7 @@ class TunnellingTest(common.SimulationTest):
         agents[4].enable_interest()
 
         a4.start_private_contract(recipients, "more spam", "beans")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_contract(agents,
                                     [(["more spam"], [], []),
                                      ([], [], []),
@@ -379,7 +379,7 @@ class TunnellingTest(common.SimulationTest):
         dr = default_recipients
         mixed_recipients = [dr[0], dr[1], tr[2], tr[3], dr[4], tr[5]]
         a3.start_private_contract(mixed_recipients, "lovely spam", "sausage")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_contract(agents,
                                     [(["lovely spam"], [], []),
                                      (["lovely spam"], [], []),
@@ -406,7 +406,7 @@ class TunnellingTest(common.SimulationTest):
             a.disable_tunneling()
 
         a1.post_private_notification(recipients, "spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [[]]*6)
         self.full_reset()
 
@@ -414,7 +414,7 @@ class TunnellingTest(common.SimulationTest):
             a.enable_interest()
 
         a1.post_private_notification(recipients, "spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [[]]*6)
         self.full_reset()
 
@@ -422,7 +422,7 @@ class TunnellingTest(common.SimulationTest):
             a.enable_tunneling()
 
         a1.post_private_notification(recipients, "bacon")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [["bacon"], [], [],
                                                  ["bacon"], ["bacon"], []])
         self.full_reset()
@@ -435,13 +435,13 @@ class TunnellingTest(common.SimulationTest):
 
         # a1 disabled the channel, nothing will got through
         a1.post_private_notification(recipients, "eggs")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [[]]*6)
         self.full_reset()
 
         # a2 is enabled so everything should be fine
         a2.post_private_notification(recipients, "eggs")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [[], ["eggs"], ["eggs"],
                                                  [], [], ["eggs"]])
         self.full_reset()
@@ -450,7 +450,7 @@ class TunnellingTest(common.SimulationTest):
             a.enable_tunneling()
 
         a6.post_private_notification(recipients, "tomato")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [["tomato"], ["tomato"],
                                                  ["tomato"], ["tomato"],
                                                  ["tomato"], ["tomato"]])
@@ -460,7 +460,7 @@ class TunnellingTest(common.SimulationTest):
             a.disable_interest()
 
         a5.post_private_notification(recipients, "sausage")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [["sausage"], [],
                                                  [], ["sausage"],
                                                  [], ["sausage"]])
@@ -472,14 +472,14 @@ class TunnellingTest(common.SimulationTest):
         r = recipients
 
         a1.post_private_notification([r[1], r[3], r[5]], "more spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [[], ["more spam"],
                                                  [], ["more spam"],
                                                  [], ["more spam"]])
         self.full_reset()
 
         a3.post_private_notification([r[0], r[2], r[4]], "lovely spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [["lovely spam"], [],
                                                  ["lovely spam"], [],
                                                  ["lovely spam"], []])
@@ -500,7 +500,7 @@ class TunnellingTest(common.SimulationTest):
             recipients.append(IRecipient(a))
 
         a1.post_public_notification(recipients, "foo")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_public_notification(agents, [[]]*6)
         self.full_reset()
 
@@ -508,7 +508,7 @@ class TunnellingTest(common.SimulationTest):
             a.enable_interest()
 
         a1.post_public_notification(recipients, "foo")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_public_notification(agents, [["foo"], [], [],
                                                  ["foo"], [], ["foo"]])
         self.full_reset()
@@ -520,7 +520,7 @@ class TunnellingTest(common.SimulationTest):
             a.enable_interest()
 
         a1.post_public_notification(recipients, "bar")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_public_notification(agents, [[], ["bar"], ["bar"],
                                                  [], ["bar"], []])
         self.full_reset()
@@ -529,64 +529,64 @@ class TunnellingTest(common.SimulationTest):
             a.enable_interest()
 
         a1.post_private_notification(recipients, "spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [["spam"]]*6)
         self.full_reset()
 
         r = recipients
 
         a1.post_private_notification([r[1], r[3], r[5]], "bacon")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [[], ["bacon"]]*3)
         self.full_reset()
 
         a4.post_private_notification(recipients, "egg")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [["egg"]]*6)
         self.full_reset()
 
         a4.post_private_notification([r[1], r[3], r[5]], "beans")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [[], ["beans"]]*3)
         self.full_reset()
 
         a5.post_private_notification(recipients, "tomato")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [["tomato"]]*6)
         self.full_reset()
 
         a5.post_private_notification([r[1], r[3], r[5]], "more spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_private_notification(agents, [[], ["more spam"]]*3)
         self.full_reset()
 
         a1.post_public_notification(recipients, "sausage")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_public_notification(agents, [["sausage"]]*6)
         self.full_reset()
 
         a1.post_public_notification([r[1], r[3], r[5]], "and spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_public_notification(agents, [[], ["and spam"]]*3)
         self.full_reset()
 
         a4.post_public_notification(recipients, "baked beans")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_public_notification(agents, [["baked beans"]]*6)
         self.full_reset()
 
         a4.post_public_notification([r[1], r[3], r[5]], "with spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_public_notification(agents, [[], ["with spam"]]*3)
         self.full_reset()
 
         a5.post_public_notification(recipients, "fried egg")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_public_notification(agents, [["fried egg"]]*6)
         self.full_reset()
 
         a5.post_public_notification([r[1], r[3], r[5]], "lovely spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.check_public_notification(agents, [[], ["lovely spam"]]*3)
         self.full_reset()
 
@@ -601,7 +601,7 @@ class TunnellingTest(common.SimulationTest):
         s2 = recipient.Broadcast(pid, a5.get_shard_id())
 
         a1.post_public_notification([s1, s2], "foo")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), [])
         self.assertEqual(a2.get_public_notifications(), [])
         self.assertEqual(a3.get_public_notifications(), [])
@@ -615,7 +615,7 @@ class TunnellingTest(common.SimulationTest):
         a6.enable_interest()
 
         a1.post_public_notification([s1, s2], "foo")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), ["foo"])
         self.assertEqual(a2.get_public_notifications(), [])
         self.assertEqual(a3.get_public_notifications(), [])
@@ -632,7 +632,7 @@ class TunnellingTest(common.SimulationTest):
         a6.disable_interest()
 
         a1.post_public_notification([s1, s2], "bar")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), [])
         self.assertEqual(a2.get_public_notifications(), ["bar"])
         self.assertEqual(a3.get_public_notifications(), ["bar"])
@@ -646,7 +646,7 @@ class TunnellingTest(common.SimulationTest):
         a6.enable_interest()
 
         a1.post_public_notification([s1], "spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), ["spam"])
         self.assertEqual(a2.get_public_notifications(), ["spam"])
         self.assertEqual(a3.get_public_notifications(), ["spam"])
@@ -656,7 +656,7 @@ class TunnellingTest(common.SimulationTest):
         self.full_reset()
 
         a1.post_public_notification([s2], "bacon")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), [])
         self.assertEqual(a2.get_public_notifications(), [])
         self.assertEqual(a3.get_public_notifications(), [])
@@ -666,7 +666,7 @@ class TunnellingTest(common.SimulationTest):
         self.full_reset()
 
         a6.post_public_notification([s1], "and spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), ["and spam"])
         self.assertEqual(a2.get_public_notifications(), ["and spam"])
         self.assertEqual(a3.get_public_notifications(), ["and spam"])
@@ -676,7 +676,7 @@ class TunnellingTest(common.SimulationTest):
         self.full_reset()
 
         a6.post_public_notification([s2], "with eggs")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), [])
         self.assertEqual(a2.get_public_notifications(), [])
         self.assertEqual(a3.get_public_notifications(), [])
@@ -709,7 +709,7 @@ class TunnellingTest(common.SimulationTest):
         a6.enable_interest()
 
         a1.post_public_notification([r2, s1, r5], "spam")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), ["spam"])
         self.assertEqual(a2.get_public_notifications(), ["spam"])
         self.assertEqual(a3.get_public_notifications(), ["spam"])
@@ -719,7 +719,7 @@ class TunnellingTest(common.SimulationTest):
         self.full_reset()
 
         a1.post_public_notification([s2, r1, r5], "bacon")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), ["bacon"])
         self.assertEqual(a2.get_public_notifications(), [])
         self.assertEqual(a3.get_public_notifications(), [])
@@ -729,7 +729,7 @@ class TunnellingTest(common.SimulationTest):
         self.full_reset()
 
         a6.post_public_notification([r1, r6, s1], "egg")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), ["egg"])
         self.assertEqual(a2.get_public_notifications(), ["egg"])
         self.assertEqual(a3.get_public_notifications(), ["egg"])
@@ -739,7 +739,7 @@ class TunnellingTest(common.SimulationTest):
         self.full_reset()
 
         a1.post_public_notification([s2, r4, r5], "sausage")
-        yield self.wait_for_idle(20)
+        yield self.wait_for_idle(40)
         self.assertEqual(a1.get_public_notifications(), [])
         self.assertEqual(a2.get_public_notifications(), [])
         self.assertEqual(a3.get_public_notifications(), [])
@@ -0,0 +1,180 @@
+# F3AT - Flumotion Asynchronous Autonomous Agent Toolkit
+# Copyright (C) 2010,2011 Flumotion Services, S.A.
+# All rights reserved.
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# See "LICENSE.GPL" in the source distribution for more information.
+
+# Headers in this file shall remain intact.
+# -*- coding: utf-8 -*-
+# -*- Mode: Python -*-
+# vi:si:et:sw=4:sts=4:ts=4
+
+import gc
+
+from feat.agencies import common as agencies_common
+from feat.common import enum
+
+from . import common
+
+
+class DummyState(enum.Enum):
+
+    (initiated, running, done, failed) = range(4)
+
+
+class Start(object):
+    pass
+
+
+class Stop(object):
+    pass
+
+
+class Unknown(object):
+    pass
+
+
+class DummyMachine(agencies_common.StateMachineMixin, common.Mock):
+
+    _event_mapping = {
+        Start:\
+            {'method': 'started',
+             'state_before': DummyState.initiated,
+             'state_after': DummyState.running},
+        Stop:\
+            [{'method': 'stopped',
+              'state_before': [DummyState.running, DummyState.initiated],
+              'state_after': DummyState.done},
+             {'method': 'failed',
+              'state_before': DummyState.running,
+              'state_after': DummyState.failed}]}
+
+    def __init__(self):
+        agencies_common.StateMachineMixin.__init__(self, DummyState.initiated)
+        common.Mock.__init__(self)
+        self.warnings = []
+
+    def warning(self, *args):
+        self.warnings.append(args[0] % args[1:])
+
+    def _call(self, method, *args, **kwargs):
+        return method(*args, **kwargs)
+
+    @common.Mock.stub
+    def started(self, event):
+        pass
+
+    @common.Mock.stub
+    def stopped(self, event):
+        pass
+
+    @common.Mock.stub
+    def failed(self, event):
+        pass
+
+
+class TestStateMachineMixin(common.TestCase):
+
+    def testDispatchingEvents(self):
+        machine = DummyMachine()
+        start = Start()
+        machine._dispatch_event(start)
+        self.assertEqual(DummyState.running, machine.state)
+        self.assertCalled(machine, 'started', params=[Start])
+        self.assertEqual([], machine.warnings)
+
+        # the table is compiled only once
+        table = DummyMachine._event_table
+        machine2 = DummyMachine()
+        machine2._dispatch_event(Stop())
+        self.assertIs(table, DummyMachine._event_table)
+        self.assertEqual(DummyState.done, machine2.state)
+        self.assertCalled(machine2, 'stopped', params=[Stop])
+
+    def testInvalidEvents(self):
+        machine = DummyMachine()
+        machine._dispatch_event(Unknown())
+        self.assertEqual(1, len(machine.warnings))
+        self.assertTrue(machine.warnings[0].startswith(
+            "Unknown event received"))
+
+        machine._dispatch_event(Start())
+        machine._dispatch_event(Start())
+        self.assertEqual(DummyState.running, machine.state)
+        self.assertEqual(2, len(machine.warnings))
+        self.assertTrue(machine.warnings[1].startswith(
+            "Received event: %r in state: %r, expected state for this "
+            "method is: %r" % (Start, DummyState.running,
+                               DummyState.initiated)))
+
+        machine._dispatch_event(Stop())
+        self.assertEqual(3, len(machine.warnings))
+        self.assertTrue(machine.warnings[2].endswith("found 2 handlers"))
+        self.assertEqual(DummyState.running, machine.state)
+        self.assertCalled(machine, 'stopped', times=0)
+        self.assertCalled(machine, 'failed', times=0)
+
+        machine._set_state(DummyState.done)
+        machine._dispatch_event(Stop())
+        self.assertEqual(4, len(machine.warnings))
+        self.assertTrue(machine.warnings[3].endswith("found 0 handlers"))
+
+    def testAdHocMapping(self):
+        machine = DummyMachine()
+        mapping = {Start: {'method': machine.stopped,
+                           'state_before': DummyState.initiated,
+                           'state_after': DummyState.done}}
+        machine._event_handler(mapping, Start())
+        self.assertEqual(DummyState.done, machine.state)
+        self.assertCalled(machine, 'stopped', params=[Start])
+
+    def testWaitingForStatesDoesNotLeak(self):
+
+        def lifecycle(machine):
+            machine._set_state(DummyState.initiated)
+            d = machine.wait_for_state(DummyState.done, DummyState.failed)
+            d.addCallback(results.append)
+            machine._set_state(DummyState.running)
+            machine._set_state(DummyState.done)
+
+        def count_objects():
+            gc.collect()
+            return len(gc.get_objects())
+
+        results = []
+        machine = DummyMachine()
+        for _ in xrange(1000):
+            lifecycle(machine)
+        before = count_objects()
+
+        for _ in xrange(100000):
+            lifecycle(machine)
+        del results[:]
+        after = count_objects()
+
+        self.assertEqual({}, machine._notifier._notifications)
+        self.assertTrue(after - before < 100,
+                        "%d objects leaked" % (after - before, ))
+
+    def testCleanupNotifier(self):
+        machine = DummyMachine()
+        d = machine.wait_for_state(DummyState.done)
+        self.assertEqual(1, len(machine._notifier._notifications))
+        machine._cleanup_notifier()
+        self.assertEqual({}, machine._notifier._notifications)
+        machine._set_state(DummyState.done)
+        self.assertFalse(d.called)
@@ -531,6 +531,64 @@ class TestManager(common.TestCase, common.AgencyTestHelper):
         yield self._terminate_manager()
         self.assertUnregistered(None, contracts.ContractState.wtf)
 
+    @common.attr(timescale=1, timeout=60)
+    @defer.inlineCallbacks
+    def testManyBidders(self):
+        """
+        Drives a contract with 1000 bidders through the emu messaging
+        and logs how long each of the stages took.
+        """
+        count = 1000
+        self.contractors = []
+        for x in range(count):
+            endpoint, queue = self.setup_endpoint()
+            self.contractors.append({'endpoint': endpoint, 'queue': queue})
+        self.recipients = map(lambda x: x['endpoint'], self.contractors)
+        self.queues = map(lambda x: x['queue'], self.contractors)
+
+        @replay.immutable
+        def closed_handler(s, state):
+            params = map(lambda bid: (bid, message.Grant(), ),
+                         state.medium.contractors.keys())
+            state.medium.grant(params)
+
+        yield self.start_manager()
+        self.stub_method(self.manager, 'closed', closed_handler)
+
+        started = time.time()
+        self.send_announce(self.manager)
+        announces = yield self._consume_all()
+        for (called, announce), sender in zip(announces, self.recipients):
+            bid = message.Bid()
+            bid.payload['cost'] = 1
+            self.post_reply(bid, sender, announce)
+        grants = yield self._consume_all()
+        granted = time.time()
+
+        contractors = self.medium.contractors
+        self.assertEqual(count, len(contractors))
+        self.assertEqual(count, contractors.count_state(
+            ContractorState.granted))
+        self.assertEqual([], contractors.get_bids())
+        for called, grant in grants:
+            self.assertIsInstance(grant, message.Grant)
+        for bid, medium in contractors.iteritems():
+            self.assertIs(medium, contractors.by_message(bid))
+
+        for (called, grant), sender in zip(grants, self.recipients):
+            self.post_reply(message.FinalReport(), sender, grant)
+        acks = yield self._consume_all()
+        finished = time.time()
+
+        for called, msg in acks:
+            self.assertIsInstance(msg, message.Acknowledgement)
+        self.assertEqual(count, contractors.count_state(
+            ContractorState.acknowledged))
+        self.assertCalled(self.manager, 'completed', params=[list])
+        self.info("%d bidders: announce to grant %.3fs, "
+                  "report to acknowledge %.3fs",
+                  count, granted - started, finished - granted)
+
     def _terminate_manager(self):
         d = self.manager._get_medium().expire_now()
         self.assertFailure(d, protocols.ProtocolExpired)
@@ -29,6 +29,7 @@ from zope.interface import implements
 
 from feat.agencies.emu import messaging
 from feat.agents.base import descriptor, message, recipient
+from feat.common import container
 from feat.interface import agent
 
 from . import common
@@ -89,6 +90,23 @@ class TestQueue(common.TestCase):
         d.addCallback(self._assert5Msgs)
         return d
 
+    @defer.inlineCallbacks
+    def testFiredConsumersAreSkipped(self):
+        gone = self.queue.get()
+        d = self.queue.get()
+        gone.callback(None)
+        self.assertTrue(self.queue.has_waiting_consumers())
+
+        self.queue.enqueue("Msg 0")
+        msg = yield d
+        self.assertEqual("Msg 0", msg)
+        self.assertFalse(self.queue.has_waiting_consumers())
+
+        self.queue.enqueue("Msg 1")
+        msg = yield self.queue.get()
+        self.assertEqual("Msg 1", msg)
+        self.assertEqual(0, len(self.queue._messages))
+
 
 class TestExchange(common.TestCase):
 
@@ -103,7 +121,8 @@ class TestExchange(common.TestCase):
 
         self.assertEqual(3, len(self.exchange._bindings.keys()))
         for key in self.exchange._bindings:
-            self.assertTrue(isinstance(self.exchange._bindings[key], list))
+            self.assertTrue(isinstance(self.exchange._bindings[key],
+                                       container.OrderedDict))
             self.assertEqual(1, len(self.exchange._bindings[key]))
 
         self.exchange._bind('queue 1', self.queues[0])
@@ -115,6 +134,19 @@ class TestExchange(common.TestCase):
 
         self.assertEqual(0, len(self.exchange._bindings))
 
+    def testPublishingInBindingOrder(self):
+        for queue in self.queues:
+            self.exchange._bind('key', queue)
+        self.exchange._unbind('key', self.queues[1])
+        self.exchange._bind('key', self.queues[1])
+        self.exchange._bind('key', self.queues[0])
+
+        received = []
+        for queue in self.queues:
+            queue.enqueue = lambda msg, name=queue.name: received.append(name)
+        self.exchange.publish('Msg', 'key')
+        self.assertEqual(['queue 0', 'queue 2', 'queue 1'], received)
+
     def testNotDoublingBindings(self):
         queue = self.queues[0]
         self.exchange._bind(queue.name, queue)
@@ -134,7 +166,7 @@ class TestExchange(common.TestCase):
         for queue in self.queues:
             self.assertEqual(5, len(queue._messages))
             expected = ['Msg 0', 'Msg 1', 'Msg 2', 'Msg 3', 'Msg 4']
-            self.assertEqual(expected, queue._messages)
+            self.assertEqual(expected, list(queue._messages))
 
     def testPublishingOneQueueBound(self):
         routing_key = 'some key'
@@ -146,7 +178,7 @@ class TestExchange(common.TestCase):
 
         self.assertEqual(5, len(queue._messages))
         expected = ['Msg 0', 'Msg 1', 'Msg 2', 'Msg 3', 'Msg 4']
-        self.assertEqual(expected, queue._messages)
+        self.assertEqual(expected, list(queue._messages))
 
         self.assertEqual(0, len(self.queues[1]._messages))
         self.assertEqual(0, len(self.queues[2]._messages))
@@ -211,8 +243,8 @@ class TestMessaging(common.TestCase):
         d = defer.Deferred()
 
         def asserts(finished):
-            for agent in agents:
-                self.assertEqual(1, len(agent.messages))
+            for peer in agents:
+                self.assertEqual(1, len(peer.messages))
             finished.callback(None)
         reactor.callLater(0.1, asserts, d)
 
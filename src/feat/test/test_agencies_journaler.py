@@ -20,6 +20,7 @@
 
 # Headers in this file shall remain intact.
 import signal
+import sqlite3
 import tempfile
 import os
 
@@ -115,6 +116,35 @@ class DBTests(common.TestCase):
         self.assertEqual('some.canonical.name', first['fun_id'])
         self.assertEqual('other', second['fun_id'])
 
+    @defer.inlineCallbacks
+    def testReadingEntriesFromSnapshot(self):
+        filename = self._get_tmp_file()
+        jour = journaler.Journaler(self)
+        writer = journaler.SqliteWriter(self, filename=filename,
+                                        encoding='zip')
+        yield writer.initiate()
+        yield jour.configure_with(writer)
+
+        for function_id in ('first', 'snapshot', 'second', 'snapshot',
+                            'third', 'fourth'):
+            yield jour.insert_entry(
+                **self._generate_data(function_id=function_id))
+        histories = yield jour.get_histories()
+        entries = yield jour.get_entries(histories[0])
+        self.assertEqual(6, len(entries))
+
+        entries = yield jour.get_entries(histories[0], from_snapshot=True)
+        self.assertEqual(['snapshot', 'third', 'fourth'],
+                         [self._unpack(x)['fun_id'] for x in entries])
+
+        reader = journaler.JournalReader(filename)
+        self.assertEqual(histories, reader.get_histories())
+        streamed = reader.iter_entries(histories[0], from_snapshot=True)
+        self.assertEqual(entries, list(streamed))
+        self.assertEqual(6, len(list(reader.iter_entries(histories[0]))))
+        reader.close()
+        yield jour.close()
+
     def _unpack(self, row):
         keys = ('a_id', 'i_id', 'j_id', 'fun_id', 'f_id',
                 'f_dep', 'args', 'kwargs', 'sfx', 'res', 'time', )
@@ -193,6 +223,217 @@ class DBTests(common.TestCase):
         self.assertEqual(3, self._rotate_called)
         yield jour.close()
 
+    @defer.inlineCallbacks
+    def testSizeBasedRotation(self):
+        self._rotate_called = 0
+
+        def on_rotate():
+            self._rotate_called += 1
+
+        filename = self._get_tmp_file()
+        self._cleanup_rotated(filename, 2)
+        jour = journaler.Journaler(self)
+        writer = journaler.SqliteWriter(
+            self, filename=filename, on_rotate=on_rotate,
+            max_size=1, keep_rotated=2)
+        yield writer.initiate()
+        yield jour.configure_with(writer)
+
+        for x in range(3):
+            yield jour.insert_entry(**self._generate_data())
+            yield self._assert_entries(jour, 0)
+            self.assertEqual(x + 1, self._rotate_called)
+
+        # only the configured number of rotated files is kept
+        self.assertTrue(os.path.exists(filename + '.1'))
+        self.assertTrue(os.path.exists(filename + '.2'))
+        self.assertFalse(os.path.exists(filename + '.3'))
+        reader = journaler.JournalReader(filename + '.1')
+        histories = reader.get_histories()
+        self.assertEqual(1, len(list(reader.iter_entries(histories[0]))))
+        reader.close()
+        yield jour.close()
+
+    @defer.inlineCallbacks
+    def testAgeBasedRotation(self):
+        filename = self._get_tmp_file()
+        self._cleanup_rotated(filename, 1)
+        jour = journaler.Journaler(self)
+        writer = journaler.SqliteWriter(self, filename=filename,
+                                        max_age=3600, keep_rotated=1)
+        yield writer.initiate()
+        yield jour.configure_with(writer)
+
+        yield jour.insert_entry(**self._generate_data())
+        yield self._assert_entries(jour, 1)
+
+        # the creation time survives reopening the file
+        created = writer._created
+        yield writer.close()
+        yield writer.initiate()
+        self.assertEqual(created, writer._created)
+
+        writer._created -= 3600
+        yield jour.insert_entry(**self._generate_data())
+        yield self._assert_entries(jour, 0)
+        self.assertTrue(os.path.exists(filename + '.1'))
+        yield jour.close()
+
+    @defer.inlineCallbacks
+    def testCompaction(self):
+        filename = self._get_tmp_file()
+        jour = journaler.Journaler(self)
+        writer = journaler.SqliteWriter(self, filename=filename)
+        yield writer.initiate()
+        yield jour.configure_with(writer)
+
+        for function_id in ('first', 'snapshot', 'second', 'snapshot',
+                            'third'):
+            yield jour.insert_entry(
+                **self._generate_data(function_id=function_id))
+        for function_id in ('first', 'second'):
+            yield jour.insert_entry(**self._generate_data(
+                agent_id='other id', function_id=function_id))
+        for x in range(2):
+            yield jour.insert_entry(**self._generate_log())
+
+        yield writer.compact(log_retention=3600)
+        histories = yield jour.get_histories()
+        entries = yield jour.get_entries(histories[0])
+        self.assertEqual(['snapshot', 'third'],
+                         [self._unpack(x)['fun_id'] for x in entries])
+        # histories without a snapshot are left untouched
+        entries = yield jour.get_entries(histories[1])
+        self.assertEqual(2, len(entries))
+        logs = yield writer.get_log_entries()
+        self.assertEqual(2, len(logs))
+
+        yield writer.compact(log_retention=-1)
+        logs = yield writer.get_log_entries()
+        self.assertEqual(0, len(logs))
+        yield jour.close()
+
+    @defer.inlineCallbacks
+    def testCompactionReclaimsSpace(self):
+        filename = self._get_tmp_file()
+        jour = journaler.Journaler(self)
+        writer = journaler.SqliteWriter(self, filename=filename)
+        yield writer.initiate()
+        yield jour.configure_with(writer)
+
+        for x in range(200):
+            yield jour.insert_entry(**self._generate_log(message="x" * 4096))
+        size = os.path.getsize(filename)
+        yield writer.compact(log_retention=-1)
+        self.assertTrue(os.path.getsize(filename) < size / 10)
+        yield jour.close()
+
+    @defer.inlineCallbacks
+    def testIndexesAddedToOldJournal(self):
+        filename = self._get_tmp_file()
+        writer = journaler.SqliteWriter(self, filename=filename)
+        yield writer.initiate()
+        yield writer.close()
+
+        db = sqlite3.connect(filename)
+        db.execute("DROP INDEX logs_timestamp_idx")
+        db.execute("CREATE INDEX logs_category_idx "
+                   "ON logs(category, log_name)")
+        db.execute("DELETE FROM metadata WHERE name = 'created'")
+        db.commit()
+        db.close()
+
+        yield writer.initiate()
+        yield writer.close()
+        db = sqlite3.connect(filename)
+        indexes = [row[0] for row in db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")]
+        created = db.execute(
+            "SELECT value FROM metadata WHERE name = 'created'").fetchall()
+        db.close()
+        for name in ('snapshot_idx', 'logs_timestamp_idx',
+                     'logs_category_timestamp_idx',
+                     'logs_name_timestamp_idx'):
+            self.assertIn(name, indexes)
+        self.assertNotIn('logs_category_idx', indexes)
+        self.assertEqual(1, len(created))
+
+    @defer.inlineCallbacks
+    def testLogQueries(self):
+        filename = self._get_tmp_file()
+        jour = journaler.Journaler(self)
+        writer = journaler.SqliteWriter(self, filename=filename)
+        yield writer.initiate()
+        yield jour.configure_with(writer)
+
+        for index in range(10):
+            yield jour.insert_entry(**self._generate_log(
+                message='message %d' % (index, ), level=index % 5 + 1,
+                category=("quoted ' category" if index % 2 else 'plain'),
+                log_name='name %d' % (index % 3, )))
+
+        logs = yield writer.get_log_entries()
+        self.assertEqual(10, len(logs))
+        self.assertEqual(7, len(logs[0]))
+        self.assertEqual(['message %d' % (x, ) for x in range(10)],
+                         [x[0] for x in logs])
+
+        # the values are passed as parameters, quotes are no problem
+        logs = yield writer.get_log_entries(filters=[
+            dict(level=5, category="quoted ' category")])
+        self.assertEqual(5, len(logs))
+        logs = yield writer.get_log_entries(filters=[
+            dict(level=2, category='plain'),
+            dict(level=5, category="quoted ' category", name='name 0')])
+        self.assertEqual(['message 0', 'message 3', 'message 6',
+                          'message 9'], [x[0] for x in logs])
+        yield self.assertFails(AttributeError, writer.get_log_entries,
+                               filters=[dict(category='plain')])
+        logs = yield writer.get_log_entries(limit=3)
+        self.assertEqual(3, len(logs))
+
+        categories = yield writer.get_log_categories()
+        self.assertEqual(set(['plain', "quoted ' category"]),
+                         set(categories))
+        names = yield writer.get_log_names("quoted ' category")
+        self.assertEqual(set(['name 0', 'name 1', 'name 2']), set(names))
+
+        # paging through all the entries gives each of them once
+        messages = []
+        cursor = None
+        while True:
+            page, cursor = yield writer.get_log_page(after=cursor, limit=4)
+            self.assertTrue(len(page) <= 4)
+            messages.extend([x[0] for x in page])
+            if cursor is None:
+                break
+        self.assertEqual(['message %d' % (x, ) for x in range(10)], messages)
+
+        page, cursor = yield writer.get_log_page(
+            filters=[dict(level=5, category='plain')], limit=5)
+        self.assertEqual(5, len(page))
+        page, cursor = yield writer.get_log_page(
+            filters=[dict(level=5, category='plain')], after=cursor, limit=5)
+        self.assertEqual([], page)
+        self.assertIs(None, cursor)
+        yield jour.close()
+
+        reader = journaler.JournalReader(filename)
+        logs = list(reader.iter_log_entries(
+            filters=[dict(level=2, category='plain')]))
+        self.assertEqual(['message 0', 'message 6'], [x[0] for x in logs])
+        reader.close()
+
+    def _cleanup_rotated(self, filename, count):
+
+        def remove_rotated():
+            for index in range(1, count + 2):
+                name = "%s.%d" % (filename, index)
+                if os.path.exists(name):
+                    os.remove(name)
+
+        self.addCleanup(remove_rotated)
+
     def _get_tmp_file(self):
         fd, name = tempfile.mkstemp(suffix='_journal.sqlite')
         self.addCleanup(os.remove, name)
@@ -215,6 +456,19 @@ class DBTests(common.TestCase):
         defaults.update(opts)
         return defaults
 
+    def _generate_log(self, **opts):
+        defaults = {
+            'entry_type': 'log',
+            'message': 'some message',
+            'level': 1,
+            'category': 'some category',
+            'log_name': 'some name',
+            'file_path': 'some/file.py',
+            'line_num': 42}
+
+        defaults.update(opts)
+        return defaults
+
     @defer.inlineCallbacks
     def _assert_entries(self, jour, num):
         histories = yield jour.get_histories()
@@ -24,6 +24,7 @@ import sys
 import os
 import optparse
 import operator
+import time
 
 from twisted.internet import defer
 from twisted.spread import pb
@@ -35,7 +36,7 @@ from feat.agencies.net import agency, database, broker
 from feat.agencies.net import options as options_module
 from feat.agents.base import agent, descriptor, dbtools, partners, replay
 from feat.common import serialization, fiber, log, first
-from feat.process.base import DependencyError
+from feat.process.base import DependencyError, ProcessState
 from twisted.trial.unittest import SkipTest
 
 from feat.interface.agent import AgencyAgentState
@@ -370,6 +371,37 @@ class IntegrationTestCase(common.TestCase):
         yield self.assert_journal_contains(
             [host_a.get_own_address().key, part[0].recipient.key])
 
+    @common.attr(timeout=300)
+    @defer.inlineCallbacks
+    def testStartStandaloneAgentsWithZygote(self):
+        agents = 50
+        self.agency.config['agency']['enable_zygote'] = True
+        yield self.agency.initiate()
+        yield self.wait_for_host_agent(20)
+        host_a = self.agency._get_host_agent()
+        yield host_a.wait_for_ready()
+        zygote = self.agency._zygote
+        yield zygote.wait_for_state(ProcessState.started)
+
+        times = []
+        for _ in range(agents):
+            started = time.time()
+            yield self.agency.spawn_agent("standalone")
+            times.append(time.time() - started)
+        yield self.wait_for_standalone(count=agents)
+        self.info("Time from spawn request to 'started' for %d agents "
+                  "forked from the zygote: %.3fs average, %.3fs max",
+                  agents, sum(times) / agents, max(times))
+
+        # the agents have not been started by the agency
+        self.assertEqual(agents + 1, len(self.agency._broker.slaves))
+        self.assertTrue(zygote.can_spawn('feat'))
+
+        yield self.agency.full_shutdown()
+        self.assertIs(None, self.agency._zygote)
+        self.assertTrue(zygote._cmp_state(ProcessState.finished))
+        self.shutdown = False
+
     @common.attr(run_rabbit=False, run_couch=False)
     @defer.inlineCallbacks
     def testStartupWithoutConnections(self):
@@ -516,14 +548,14 @@ class IntegrationTestCase(common.TestCase):
 
         return self.wait_for(check, timeout)
 
-    def wait_for_standalone(self, timeout=20):
+    def wait_for_standalone(self, timeout=20, count=1):
 
         host_a = self.agency._get_host_agent()
         self.assertIsNot(host_a, None)
 
         def has_partner():
             part = host_a.query_partners_with_role('all', 'standalone')
-            return len(part) == 1
+            return len(part) == count
 
         return self.wait_for(has_partner, timeout)
 
@@ -57,6 +57,9 @@ class CallLaterMixin(object):
     def call_next(self, _method, *args, **kwargs):
         self.call_later_ex(0, _method, args, kwargs)
 
+    def schedule(self, _time, _method, *args, **kwargs):
+        return time.callLater(_time, _method, *args, **kwargs)
+
     def cancel_delayed_call(self, call_id):
         if call_id.active():
             call_id.cancel()
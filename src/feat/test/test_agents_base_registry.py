@@ -0,0 +1,179 @@
+# F3AT - Flumotion Asynchronous Autonomous Agent Toolkit
+# Copyright (C) 2010,2011 Flumotion Services, S.A.
+# All rights reserved.
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# See "LICENSE.GPL" in the source distribution for more information.
+
+# Headers in this file shall remain intact.
+import json
+import os
+import subprocess
+import sys
+
+from feat.test import common
+from feat.agents.base import registry, agent, recipient, sender
+from feat.agents.common import monitor, host
+from feat.agents.host import host_agent
+from feat.agents.monitor import monitor_agent
+from feat.agents.shard import shard_agent
+from feat.common import serialization, text_helper
+from feat.common.serialization import json as feat_json
+
+
+class TestLazyRegistry(common.TestCase):
+
+    module = 'feat.test.lazy_agent'
+
+    def setUp(self):
+        common.TestCase.setUp(self)
+        # the module may be left imported by the previous runs
+        sys.modules.pop(self.module, None)
+        registry.registry.pop('lazy_test_agent', None)
+        restorators = serialization.get_registry()._restorators
+        restorators.pop('lazy_test_agent:data', None)
+        restorators.pop('lazy-test-type', None)
+        restorators.pop(self.module + '.CanonicalType', None)
+        registry.register_lazy(self.module, 'lazy_test_agent',
+                               'lazy-test-type')
+
+    def tearDown(self):
+        registry._lazy_names.pop('lazy_test_agent', None)
+        registry._lazy_names.pop('lazy-test-type', None)
+        if self.module in registry._lazy_modules:
+            registry._lazy_modules.remove(self.module)
+        return common.TestCase.tearDown(self)
+
+    def testRegistryLookup(self):
+        self.assertNotIn(self.module, sys.modules)
+        factory = agent.registry_lookup('lazy_test_agent')
+        self.assertIn(self.module, sys.modules)
+        self.assertEqual('lazy_test_agent', factory.descriptor_type)
+        self.assertIs(factory, registry.registry['lazy_test_agent'])
+        self.assertFalse(registry.load('lazy_test_agent'))
+
+        self.assertIs(None, agent.registry_lookup('unknown_agent'))
+        self.assertFalse(registry.load('unknown_agent'))
+
+    def testSerializationLookup(self):
+        restorator = serialization.lookup('lazy-test-type')
+        self.assertIn(self.module, sys.modules)
+        self.assertEqual('lazy-test-type', restorator.type_name)
+
+    def testCanonicalNameLookup(self):
+        restorator = serialization.lookup(self.module + '.CanonicalType')
+        self.assertIn(self.module, sys.modules)
+        self.assertEqual(self.module + '.CanonicalType',
+                         restorator.type_name)
+
+    def testLoadAll(self):
+        registry.load_all()
+        self.assertIn(self.module, sys.modules)
+        self.assertIn('lazy_test_agent', registry.registry)
+        self.assertFalse(registry.load('lazy-test-type'))
+
+
+class CleanRegistryMixin(object):
+
+    def run_clean(self, script, input=''):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        process = subprocess.Popen([sys.executable, '-c', script],
+                                   env=env, stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE)
+        output, _ = process.communicate(input)
+        self.assertEqual(0, process.returncode)
+        return output
+
+
+class TestLazyDeclarations(common.TestCase, CleanRegistryMixin):
+    '''
+    Checks in a new python process that every name registered by the lazy
+    modules is declared in feat.everything or is in the package of the
+    module registering it.
+    '''
+
+    script = text_helper.format_block("""
+    from feat import everything
+    from feat.agents.base import registry
+    from feat.common import serialization
+
+    def registered():
+        names = dict(serialization.get_registry()._restorators)
+        names.update(registry.registry)
+        return names
+
+    modules = list(registry._lazy_modules)
+    before = set(registered())
+    registry.load_all()
+    for name, restorator in sorted(registered().items()):
+        if name in before:
+            continue
+        declared = registry._lazy_names.get(name)
+        if declared is None:
+            for candidate in modules:
+                if name.startswith(candidate.rsplit('.', 1)[0] + '.'):
+                    declared = candidate
+                    break
+        package = (declared or '').rsplit('.', 1)[0] + '.'
+        defined = getattr(restorator, '__module__', '') + '.'
+        if declared is None or not defined.startswith(package):
+            print name, defined[:-1]
+    """)
+
+    def testAllNamesDeclared(self):
+        self.assertEqual('', self.run_clean(self.script))
+
+
+class TestAgentDocuments(common.TestCase, CleanRegistryMixin):
+    '''
+    Unserializes the documents of the agents in a new python process,
+    the agent modules are only imported by the lookups of the types.
+    '''
+
+    script = text_helper.format_block("""
+    import sys
+    from feat import everything
+    from feat.common.serialization import json
+    for line in sys.stdin:
+        print json.serialize(json.unserialize(line))
+    print 'feat.agents.dns.dns_agent' in sys.modules
+    """)
+
+    def testUnserializeInCleanRegistry(self):
+        agent_recp = recipient.Agent('agent', 'shard')
+        monitor_desc = monitor.Descriptor(
+            doc_id=u'monitor', shard=u'shard',
+            partners=[monitor_agent.MonitoredPartner(agent_recp)],
+            pending_notifications={
+                'agent': [sender.PendingNotification(
+                    type='restarted', origin=agent_recp,
+                    payload=None, recipient=agent_recp)]})
+        host_desc = host.Descriptor(
+            doc_id=u'host', shard=u'shard',
+            partners=[host_agent.ShardPartner(
+                recipient.Agent('shard', 'shard'))])
+        config = shard_agent.ShardAgentConfiguration(doc_id=u'shard_conf')
+        documents = [feat_json.serialize(x)
+                     for x in (monitor_desc, host_desc, config)]
+
+        output = self.run_clean(self.script, '\n'.join(documents) + '\n')
+
+        lines = output.splitlines()
+        # the order of the keys is not kept by the round trip
+        self.assertEqual([json.loads(x) for x in documents],
+                         [json.loads(x) for x in lines[:-1]])
+        # the agents not referenced by the documents are not imported
+        self.assertEqual('False', lines[-1])
@@ -200,6 +200,44 @@ class ResourcesTest(common.TestCase, Common):
         self._assert_preallocated({'a': 0, 'b': 0})
         self.assertCalled(self.agent, 'update_descriptor', times=0)
 
+    @defer.inlineCallbacks
+    def testPreallocationReservedWhileConfirming(self):
+        allocation = yield self.resources.preallocate(a=3)
+        updated = defer.Deferred()
+
+        def update_descriptor(method, allocation):
+            updated.addCallback(lambda _: method(self.agent.descriptor,
+                                                 allocation))
+            return updated
+
+        self.agent.update_descriptor = update_descriptor
+        confirmed = []
+        d = self.resources.confirm(allocation.id)
+        d.addCallback(confirmed.append)
+        self.assertEqual([], confirmed)
+        self._assert_allocated([3, 0])
+        other = yield self.resources.preallocate(a=3)
+        self.assertIs(None, other)
+
+        updated.callback(None)
+        yield d
+        self.assertEqual([allocation], confirmed)
+        self._assert_allocated([3, 0])
+        self._assert_preallocated({'a': 0, 'b': 0})
+
+    @defer.inlineCallbacks
+    def testHasPreallocations(self):
+        self.assertFalse(self.resources.has_preallocations())
+        allocation = yield self.resources.preallocate(a=3)
+        self.assertTrue(self.resources.has_preallocations())
+        yield self.resources.confirm(allocation.id)
+        self.assertFalse(self.resources.has_preallocations())
+
+        yield self.resources.preallocate(a=1)
+        self.assertTrue(self.resources.has_preallocations())
+        self.agent.time += 15
+        self.assertFalse(self.resources.has_preallocations())
+
     @defer.inlineCallbacks
     def testPremodifyRelease(self):
         allocation = yield self.resources.allocate(a=3, b=2)
@@ -62,3 +62,18 @@ class TestDesignDocument(common.TestCase):
         self.assertIn('reducing_view', doc.views)
         self.assertIn('map', doc.views['reducing_view'])
         self.assertIn('reduce', doc.views['reducing_view'])
+
+    def testSourceExtractedOnGeneration(self):
+
+        class LazyView(view.BaseView):
+
+            name = 'lazy_view'
+
+            def map(doc):
+                yield doc['_id'], None
+
+        self.assertFalse(hasattr(LazyView.map, 'source'))
+        doc = view.DesignDocument.generate_from_views((LazyView, ))
+        expected = "def map(doc):\n    yield doc['_id'], None"
+        self.assertEqual(expected, doc.views['lazy_view']['map'])
+        self.assertEqual(expected, LazyView.map.source)
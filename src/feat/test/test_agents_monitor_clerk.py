@@ -1531,3 +1531,54 @@ class TestLocation(common.TestCase):
         self.assertEqual(len(clerk.recovering), 0)
         self.assertEqual(len(clerk.dead), 0)
         clerk.reset()
+
+    def testManyPatients(self):
+        clerk = DummyClerk()
+        loc = Location(clerk, "localhost")
+        patients = [DummyLocationPatient(loc, Recipient("P%d" % i),
+                                         period=i % 7 + 1)
+                    for i in xrange(2000)]
+
+        started = time.time()
+
+        for patient in patients:
+            patient.be_dying()
+        for patient in patients:
+            patient.die()
+
+        isolated = time.time()
+
+        self.assertEqual(loc.state, LocationState.isolated)
+        self.assertEqual(loc.count_alive(), 0)
+        self.assertEqual(loc.count_dying(), 0)
+        self.assertEqual(loc.count_dead(), 2000)
+        self.assertEqual(clerk.quarantined, [loc])
+        self.assertEqual(len(clerk.dead), 0)
+        self.assertEqual(loc.get_recovery_time(), 7)
+        clerk.reset_all()
+
+        patients[0].resurrect()
+
+        self.assertEqual(loc.state, LocationState.recovering)
+        self.assertEqual(clerk.recovering, [loc])
+        self.assertEqual(loc._start_recovery(), 7)
+
+        for patient in patients[1:]:
+            patient.resurrect()
+
+        recovered = time.time()
+
+        self.assertEqual(loc.state, LocationState.normal)
+        self.assertEqual(loc.count_alive(), 2000)
+        self.assertEqual(loc.count_dying(), 0)
+        self.assertEqual(loc.count_dead(), 0)
+        self.assertEqual(loc._start_recovery(), 0)
+        self.assertEqual(len(clerk.dead), 0)
+
+        for patient in patients:
+            loc._remove_patient(patient)
+        self.assertEqual(loc.count_patients(), 0)
+        self.assertEqual(loc.count_alive(), 0)
+
+        self.info("2000 patients: isolated in %.3fs, recovered in %.3fs",
+                  isolated - started, recovered - isolated)
@@ -24,7 +24,7 @@ from zope.interface import implements
 from feat.agents.monitor import monitor_agent
 from feat.test import common
 from feat.common import defer, time, log, journal, fiber
-from feat.agents.base import recipient, descriptor, sender
+from feat.agents.base import recipient, descriptor, sender, requester
 
 from feat.agencies.interface import *
 from feat.agents.monitor.interface import *
@@ -198,12 +198,14 @@ class NotificationSenderTest(common.TestCase):
         d = self.task.run()
         self.assert_pending('agent_id', 2)
         self.assert_protocols(1)
-        self.succeed_protocol(0)
-        self.assert_pending('agent_id', 1)
-        self.assert_protocols(2)
-        self.succeed_protocol(1)
+        protocol = self.agent.protocols[0]
+        self.assertEqual(requester.PartnershipBatchProtocol,
+                         protocol.factory)
+        self.assertEqual(2, len(protocol.args[1]))
+        self.succeed_protocol(0, 2)
         yield d
         self.assert_pending('agent_id', 0)
+        self.assert_protocols(1)
 
     @defer.inlineCallbacks
     def testIntegrationWithClerk(self):
@@ -258,8 +260,8 @@ class NotificationSenderTest(common.TestCase):
         self.agent.docs[recp.key] = descriptor.Descriptor(doc_id=recp.key,
                                                           shard=recp.route)
 
-    def succeed_protocol(self, index):
-        self.agent.protocols[index].deferred.callback(None)
+    def succeed_protocol(self, index, done):
+        self.agent.protocols[index].deferred.callback(done)
 
     def fail_protocol(self, index):
         self.agent.protocols[index].deferred.errback(ProtocolFailed())
@@ -0,0 +1,81 @@
+# F3AT - Flumotion Asynchronous Autonomous Agent Toolkit
+# Copyright (C) 2010,2011 Flumotion Services, S.A.
+# All rights reserved.
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# See "LICENSE.GPL" in the source distribution for more information.
+
+# Headers in this file shall remain intact.
+# -*- Mode: Python -*-
+# vi:si:et:sw=4:sts=4:ts=4
+import json
+
+from feat.common import defer
+from feat.agents.base import dbtools
+from feat.test import common, bench
+
+
+class TestBench(common.TestCase):
+
+    timeout = 30
+
+    params = dict(hosts=2, agents=3, bidders=10, rounds=2, entries=50,
+                  partners=20, iterations=3, messages=20, logs=200,
+                  queries=5, startups=2, timeouts=20)
+
+    def __init__(self, *args, **kwargs):
+        common.TestCase.__init__(self, *args, **kwargs)
+        initial_documents = dbtools.get_current_initials()
+        self.addCleanup(dbtools.reset_documents, initial_documents)
+
+    def testPercentile(self):
+        self.assertEqual(None, bench.percentile([], 0.5))
+        self.assertEqual(1, bench.percentile([1], 0.99))
+        values = range(101)
+        self.assertEqual(50, bench.percentile(values, 0.5))
+        self.assertEqual(99, bench.percentile(values, 0.99))
+
+    def testGetScenario(self):
+        scenario = bench.get_scenario('contract', self.params)
+        self.assertIsInstance(scenario, bench.ContractScenario)
+        self.assertEqual(dict(bidders=10, rounds=2), scenario.params)
+        self.assertRaises(KeyError, bench.get_scenario, 'unknown')
+        self.assertRaises(ValueError, bench.ContractScenario, entries=1)
+
+    @defer.inlineCallbacks
+    def testRunAll(self):
+        report = yield bench.run(params=self.params)
+        report = json.loads(bench.render(report))
+
+        results = dict((x['scenario'], x) for x in report['results'])
+        self.assertEqual(set(bench.scenarios), set(results))
+
+        expected = {'hosts': 6, 'contract': 2, 'messages': 20, 'banana': 3,
+                    'json': 3, 'json-compact': 3, 'log-query': 5,
+                    'startup': 2, 'timers-reactor': 40,
+                    'timers-wheel': 40}
+        for name, result in results.iteritems():
+            self.assertTrue(result['ops'] > 0)
+            self.assertTrue(result['ops_per_sec'] > 0)
+            self.assertTrue(result['p50'] <= result['p99'])
+            self.assertTrue(result['peak_rss'] > 0)
+            if name in expected:
+                self.assertEqual(expected[name], result['ops'])
+        self.assertTrue(
+            results['json-compact']['size'] < results['json']['size'])
+        self.assertTrue(results['startup']['rss'] > 0)
+        # the entries of the agent initialization are replayed as well
+        self.assertTrue(results['replay']['ops'] > 50)
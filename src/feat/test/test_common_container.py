@@ -27,6 +27,7 @@ from zope.interface import implements
 
 from feat.agents.base import replay
 from feat.common.container import *
+from feat.common.container import _OrderedDict
 from feat.common import serialization, journal, time
 from feat.common.serialization import base, pytree
 from feat.interface.generic import *
@@ -648,3 +649,57 @@ class TestMroDict(common.TestCase):
         a = A()
         self.assertEqual(a.registry['spam'], 'a')
         self.assertEqual(a.registry['eggs'], 'a')
+
+    def testCachedResolution(self):
+        self.assertTrue(D.registry is D.registry)
+
+        D.registry['bacon'] = 'd'
+        self.assertEqual(D.registry['bacon'], 'd')
+        self.assertFalse('bacon' in B.registry)
+
+        # changes in a base class have to be seen by cached subclasses
+        B.registry['bacon'] = 'b'
+        self.assertEqual(B.registry['bacon'], 'b')
+        self.assertEqual(D.registry['bacon'], 'd')
+        A.registry['beans'] = 'a'
+        self.assertEqual(D.registry['beans'], 'a')
+        self.assertEqual(C.registry['beans'], 'a')
+
+        del B.registry['bacon']
+        self.assertFalse('bacon' in B.registry)
+        self.assertEqual(D.registry['bacon'], 'd')
+
+
+class TestOrderedDict(common.TestCase):
+
+    factory = OrderedDict
+
+    def testOrder(self):
+        d = self.factory()
+        for key in ('c', 'a', 'b'):
+            d[key] = key.upper()
+        d['a'] = 1
+        self.assertEqual(['c', 'a', 'b'], d.keys())
+        self.assertEqual(['C', 1, 'B'], d.values())
+
+        del d['a']
+        d['a'] = 2
+        self.assertEqual([('c', 'C'), ('b', 'B'), ('a', 2)], d.items())
+        self.assertEqual(('c', 'C'), d.popitem(last=False))
+        self.assertEqual(('a', 2), d.popitem())
+        self.assertEqual('B', d.pop('b'))
+        self.assertEqual(None, d.pop('b', None))
+        self.assertRaises(KeyError, d.pop, 'b')
+        self.assertRaises(KeyError, d.popitem)
+
+        d['x'] = 1
+        d.clear()
+        self.assertEqual(0, len(d))
+        self.assertEqual([], list(d))
+        d['y'] = 2
+        self.assertEqual([('y', 2)], list(d.iteritems()))
+
+
+class TestOrderedDictFallback(TestOrderedDict):
+
+    factory = _OrderedDict
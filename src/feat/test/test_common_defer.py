@@ -140,3 +140,40 @@ class TestNotifier(common.TestCase):
 
         n.errback("barr", Exception())
         self.assertEqual(counters["barr"], 1)
+
+    def testWaitAny(self):
+        results = []
+        n = defer.Notifier()
+
+        d = n.wait_any("foo", "bar", "foo")
+        d.addCallback(results.append)
+        d2 = n.wait("bar")
+        d2.addCallback(results.append)
+
+        n.callback("foo", "FOO")
+        self.assertEqual(["FOO"], results)
+        # the waiter has been unregistered from "bar" as well
+        self.assertEqual({"bar": [d2]}, n._notifications)
+
+        n.callback("bar", "BAR")
+        self.assertEqual(["FOO", "BAR"], results)
+        self.assertEqual({}, n._notifications)
+
+        d = n.wait_any("foo", "bar")
+        d.addErrback(lambda f: results.append(f.type))
+        n.errback("bar", ValueError())
+        self.assertEqual(["FOO", "BAR", ValueError], results)
+        self.assertEqual({}, n._notifications)
+
+    def testClear(self):
+        results = []
+        n = defer.Notifier()
+
+        n.wait("foo").addCallback(results.append)
+        n.wait_any("foo", "bar").addCallback(results.append)
+        n.clear()
+        self.assertEqual({}, n._notifications)
+
+        n.callback("foo", "FOO")
+        n.callback("bar", "BAR")
+        self.assertEqual([], results)
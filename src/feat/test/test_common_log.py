@@ -43,6 +43,19 @@ class DummyLogKeeper(object):
         entry = (level, object, category, format, args, depth)
         self.entries.append(entry)
 
+    def is_enabled(self, category, level):
+        return True
+
+
+class FilteringLogKeeper(DummyLogKeeper):
+
+    def __init__(self, max_level):
+        DummyLogKeeper.__init__(self)
+        self.max_level = max_level
+
+    def is_enabled(self, category, level):
+        return level <= self.max_level
+
 
 class BasicDummyLogger(log.Logger):
     pass
@@ -172,3 +185,34 @@ class TestLogging(common.TestCase):
                          [(LogLevel.log, 'spam', 'dummy', '1', (), 1),
                           (LogLevel.log, 'spam', 'dummy', '2', (), 2),
                           (LogLevel.log, 'spam', 'dummy', '3', (), 3)])
+
+    def testFilteredLogging(self):
+        keeper = FilteringLogKeeper(LogLevel.info)
+        proxy = DummyLogProxy(keeper)
+        obj = CategorizedDummyLogger(proxy)
+
+        obj.log("1")
+        obj.debug("2")
+        obj.info("3")
+        obj.logex(LogLevel.debug, "4", ())
+        obj.error("5")
+
+        self.assertEqual(keeper.entries,
+                         [(LogLevel.info, None, 'dummy', '3', (), 2),
+                          (LogLevel.error, None, 'dummy', '5', (), 2)])
+
+        proxy.redirect_log(log.VoidLogKeeper())
+        obj.error("6")
+        self.assertEqual(2, len(keeper.entries))
+
+    def testEnabledLevels(self):
+        self.addCleanup(log.FluLogKeeper.set_debug,
+                        log.FluLogKeeper.get_debug())
+
+        log.FluLogKeeper.set_debug("dummy:3")
+        self.assertTrue(log.is_enabled("dummy", LogLevel.info))
+        self.assertFalse(log.is_enabled("dummy", LogLevel.debug))
+
+        log.FluLogKeeper.set_debug("dummy:5")
+        self.assertTrue(log.is_enabled("dummy", LogLevel.debug))
+        self.assertTrue(log.is_enabled("dummy", LogLevel.log))
@@ -33,7 +33,7 @@ from feat.common import reflect, serialization
 from feat.common.serialization import base, json
 from feat.interface.serialization import *
 
-from . import common_serialization
+from . import common, common_serialization
 
 
 @serialization.register
@@ -277,3 +277,97 @@ class JSONConvertersTest(common_serialization.ConverterTest):
                      '"ref": [".deref", 1]}}]') % (name, name)], True)
             yield (Klass, [c], str, [('[".ref", 1, {".type": "%s", "ref": '
                                       '[".deref", 1]}]') % (name, )], True)
+
+
+class JSONCompactTest(common.TestCase):
+
+    def setUp(self):
+        self.serializer = json.Serializer(compact=True)
+        self.unserializer = json.Unserializer()
+
+    def testStrings(self):
+        o = DummyClass()
+        o.ascii = "spam"
+        o.utf8 = u"\u00e1\u00e9".encode("utf8")
+        o.binary = "\xFF"
+        o.text = u"eggs"
+        o.atom = ".set"
+        o.values = ["a", u"b", (".tuple", "c")]
+        o.mapping = {"key": "value"}
+        data = self.serializer.convert(o)
+
+        raw = json.json.loads(data)
+        self.assertEqual(json.COMPACT_FORMAT, raw[json.FORMAT_ATOM])
+        self.assertEqual(u"spam", raw["ascii"])
+        self.assertEqual(u"\u00e1\u00e9", raw["utf8"])
+        self.assertEqual([json.BYTES_ATOM, u"/w=="], raw["binary"])
+        self.assertEqual([json.UNICODE_ATOM, u"eggs"], raw["text"])
+        self.assertEqual([json.ENCODED_ATOM, u"UTF8", u".set"], raw["atom"])
+        self.assertEqual({u"key": u"value"}, raw["mapping"])
+
+        result = self.unserializer.convert(data)
+        self.assertFalse(hasattr(result, json.FORMAT_ATOM))
+        for name in ("ascii", "utf8", "binary", "text", "atom"):
+            self.assertEqual(getattr(o, name), getattr(result, name))
+            self.assertEqual(type(getattr(o, name)),
+                             type(getattr(result, name)))
+        self.assertEqual(o.values, result.values)
+        self.assertEqual([str, unicode, tuple], map(type, result.values))
+        self.assertEqual(str, type(result.values[2][1]))
+        self.assertEqual(o.mapping, result.mapping)
+        self.assertEqual([str, str],
+                         map(type, result.mapping.items()[0]))
+
+    def testReservedFields(self):
+        data = self.serializer.convert({"_id": u"doc", "_rev": u"1-a",
+                                        "name": u"doc"})
+        raw = json.json.loads(data)
+        self.assertEqual(u"doc", raw["_id"])
+        self.assertEqual(u"1-a", raw["_rev"])
+        self.assertEqual([json.UNICODE_ATOM, u"doc"], raw["name"])
+
+        result = self.unserializer.convert(data)
+        self.assertEqual({"_id": u"doc", "_rev": u"1-a", "name": u"doc"},
+                         result)
+        self.assertEqual(unicode, type(result["_id"]))
+        self.assertEqual(unicode, type(result["name"]))
+
+        result = json.PaisleyUnserializer().convert(raw)
+        self.assertEqual(unicode, type(result["_id"]))
+        self.assertEqual(unicode, type(result["name"]))
+
+    def testSelfReference(self):
+        o = DummyClass()
+        o.ref = o
+        o.name = "spam"
+        data = self.serializer.convert(o)
+        result = self.unserializer.convert(data)
+        self.assertTrue(result.ref is result)
+        self.assertEqual("spam", result.name)
+        self.assertEqual(str, type(result.name))
+
+    def testNotDocuments(self):
+        # only documents can be marked with the format
+        self.assertEqual('[".enc", "UTF8", "spam"]',
+                         self.serializer.convert("spam"))
+        self.assertEqual('[[".enc", "UTF8", "spam"], "eggs"]',
+                         self.serializer.convert(["spam", u"eggs"]))
+
+    def testOriginalFormat(self):
+        o = DummyClass()
+        o.name = "spam"
+        o.text = u"eggs"
+        data = json.Serializer().convert(o)
+        self.assertFalse(json.FORMAT_ATOM in json.json.loads(data))
+
+        result = self.unserializer.convert(data)
+        self.assertEqual("spam", result.name)
+        self.assertEqual(str, type(result.name))
+        self.assertEqual(u"eggs", result.text)
+        self.assertEqual(unicode, type(result.text))
+
+    def testUnknownFormat(self):
+        data = '{"%s": 3, "value": 1}' % (json.FORMAT_ATOM, )
+        self.assertRaises(ValueError, self.unserializer.convert, data)
+        # the unserializer is left usable
+        self.assertEqual(u"spam", self.unserializer.convert('"spam"'))
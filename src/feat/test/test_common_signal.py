@@ -57,6 +57,24 @@ class TestSignal(common.TestCase):
         self.assert_called([1, 2, 2], handlers)
         signal.reset()
 
+    @defer.inlineCallbacks
+    def testReregisteringHandler(self):
+        # like the journal writer reopening its file on SIGHUP
+
+        class Reregistering(Handler):
+
+            def _handler(self, signum, frame):
+                Handler._handler(self, signum, frame)
+                self.destroy()
+                signal.signal(self.signum, self._handler)
+
+        handlers = [Reregistering(self.signum), Handler(self.signum)]
+        yield self.kill()
+        self.assert_called([1, 1], handlers)
+        yield self.kill()
+        self.assert_called([2, 2], handlers)
+        signal.reset()
+
     @defer.inlineCallbacks
     def testLegacyHandler(self):
         legacy = Handler(self.signum, signal=python_signal)
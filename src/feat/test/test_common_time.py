@@ -21,6 +21,8 @@
 # Headers in this file shall remain intact.
 import time as python_time
 
+from twisted.internet import reactor, task
+
 from feat.test import common
 from feat.common import time, defer
 
@@ -71,3 +73,211 @@ class TimeScaleTest(common.TestCase):
         call.reset(1)
 
         return d
+
+    def testScaledTimerWheel(self):
+        d = defer.Deferred()
+
+        time.scale(0.09)
+        wheel = time.TimerWheel(0.5)
+        call = wheel.call_later(1, d.callback, None)
+        self.assertIsInstance(call, time.WheelCall)
+        self.assertApproximates(1, call.getTime() - time.time(), 0.01)
+        return d
+
+    def testScaledTimerWheelReset(self):
+        time.scale(0.2)
+        wheel = time.TimerWheel(0.5)
+        call = wheel.call_later(5, self.fail, "Call should be cancelled")
+        # the wheel is run by a delayed call of the reactor, scaled as well
+        self.assertApproximates(1, wheel._pump.getTime() - reactor.seconds(),
+                                0.11)
+        time.reset()
+        self.assertFalse(call.active())
+        self.assertIs(None, wheel._pump)
+
+
+@common.attr(virtual_time=True)
+class VirtualTimeTest(common.TestCase):
+
+    timeout = 2
+
+    @defer.inlineCallbacks
+    def testJumpingTime(self):
+        self.assertTrue(time.is_virtual())
+        start = time.time()
+        d = defer.Deferred()
+        call = time.callLater(3600, d.callback, None)
+        self.assertIsInstance(call, time.VirtualDelayedCall)
+        self.assertEqual(start + 3600, call.getTime())
+        yield d
+        self.assertEqual(start + 3600, time.time())
+        self.assertFalse(call.active())
+
+    @defer.inlineCallbacks
+    def testOrdering(self):
+        d = defer.Deferred()
+        order = []
+        time.callLater(20, order.append, 4)
+        time.callLater(10, order.append, 2)
+        time.callLater(20, order.append, 5)
+        time.callLater(10, order.append, 3)
+        time.call_next(order.append, 1)
+        time.callLater(30, d.callback, None)
+        yield d
+        self.assertEqual([1, 2, 3, 4, 5], order)
+
+    @defer.inlineCallbacks
+    def testCancelAndReset(self):
+        start = time.time()
+        d = defer.Deferred()
+        canceled = time.callLater(10, d.errback, RuntimeError())
+        call = time.callLater(10, d.callback, None)
+        canceled.cancel()
+        self.assertFalse(canceled.active())
+        call.reset(100)
+        self.assertEqual(start + 100, call.getTime())
+        yield d
+        self.assertEqual(start + 100, time.time())
+
+    def testAdvance(self):
+        clock = time.virtualize()
+        start = time.time()
+        order = []
+        time.callLater(5, order.append, 1)
+        self.assertTrue(clock.advance())
+        self.assertEqual([1], order)
+        self.assertEqual(start + 5, time.time())
+        self.assertFalse(clock.advance())
+
+    @defer.inlineCallbacks
+    def testIdleCheck(self):
+        start = time.time()
+        running = [True]
+        time.add_idle_check(lambda: not running)
+        d = defer.Deferred()
+        time.callLater(3600, d.callback, None)
+
+        # the time does not jump while the work is running
+        yield task.deferLater(reactor, 0.1, lambda: None)
+        self.assertFalse(d.called)
+        del running[:]
+        yield d
+        self.assertEqual(start + 3600, time.time())
+
+    def testReset(self):
+        time.callLater(5, self.fail, "Call should be forgotten")
+        time.reset()
+        self.assertFalse(time.is_virtual())
+
+
+@common.attr(virtual_time=True)
+class TimerWheelTest(common.TestCase):
+
+    timeout = 2
+
+    @defer.inlineCallbacks
+    def testCallsRunAtTicks(self):
+        wheel = time.TimerWheel(1)
+        start = time.time()
+        d = defer.Deferred()
+        calls = []
+
+        def called(value):
+            calls.append((value, time.time()))
+
+        wheel.call_later(2.5, called, 3)
+        wheel.call_later(1.2, called, 2)
+        wheel.call_later(2.5, called, 4)
+        call = wheel.call_later(0.5, called, 1)
+        self.assertIsInstance(call, time.VirtualDelayedCall)
+        self.assertEqual(3, len(wheel))
+        wheel.call_later(5, d.callback, None)
+        yield d
+
+        self.assertEqual([1, 2, 3, 4], [x[0] for x in calls])
+        for value, delay in ((2, 1.2), (3, 2.5), (4, 2.5)):
+            ran = dict(calls)[value] - start
+            self.assertTrue(delay <= ran < delay + 1)
+        self.assertEqual(0, len(wheel))
+        self.assertIs(None, wheel._pump)
+
+    @defer.inlineCallbacks
+    def testCallsOfTickKeepApart(self):
+        wheel = time.TimerWheel(1)
+        d = defer.Deferred()
+        calls = []
+
+        def called(value):
+            calls.append((value, time.time()))
+            if value == 1:
+                time.call_next(calls.append, (2, time.time()))
+
+        wheel.call_later(2.7, called, 3)
+        wheel.call_later(2.2, called, 1)
+        wheel.call_later(5, d.callback, None)
+        yield d
+
+        # what the first call started runs before the second one
+        self.assertEqual([1, 2, 3], [x[0] for x in calls])
+        times = dict(calls)
+        self.assertApproximates(0.5, times[3] - times[1], 0.001)
+
+    @defer.inlineCallbacks
+    def testCancelAndReset(self):
+        wheel = time.TimerWheel(1)
+        start = time.time()
+        d = defer.Deferred()
+        canceled = wheel.call_later(10, d.errback, RuntimeError())
+        call = wheel.call_later(10, d.callback, None)
+        canceled.cancel()
+        self.assertFalse(canceled.active())
+        self.assertEqual(1, len(wheel))
+        call.reset(100)
+        self.assertEqual(start + 100, call.getTime())
+        call.delay(10)
+        self.assertEqual(start + 110, call.getTime())
+        self.assertEqual(1, len(wheel))
+        yield d
+        self.assertTrue(time.time() >= start + 110)
+        self.assertFalse(call.active())
+
+    @defer.inlineCallbacks
+    def testResetBypassesWheel(self):
+        wheel = time.TimerWheel(1)
+        start = time.time()
+        d = defer.Deferred()
+        call = wheel.call_later(10, d.callback, None)
+        call.reset(0)
+        self.assertEqual(start, call.getTime())
+        self.assertEqual(1, len(wheel))
+        self.assertIs(None, wheel._pump)
+        yield d
+        self.assertEqual(start, time.time())
+        self.assertFalse(call.active())
+        self.assertEqual(0, len(wheel))
+
+        d = defer.Deferred()
+        call = wheel.call_later(10, d.errback, RuntimeError())
+        call.reset(0.5)
+        call.cancel()
+        self.assertEqual(0, len(wheel))
+        call = wheel.call_later(10, d.callback, None)
+        call.reset(0.5)
+        call.reset(2)
+        self.assertIsNot(None, wheel._pump)
+        yield d
+        self.assertTrue(time.time() >= start + 2)
+
+    def testStop(self):
+        wheel = time.TimerWheel(1)
+        call = wheel.call_later(5, self.fail, "Call should be cancelled")
+        other = wheel.call_later(5, self.fail, "Call should be cancelled")
+        other.cancel()
+        direct = wheel.call_later(5, self.fail, "Call should be cancelled")
+        direct.reset(0)
+        self.assertIsNot(None, wheel._pump)
+        wheel.stop()
+        self.assertFalse(call.active())
+        self.assertFalse(direct.active())
+        self.assertEqual(0, len(wheel))
+        self.assertIs(None, wheel._pump)
@@ -0,0 +1,151 @@
+# F3AT - Flumotion Asynchronous Autonomous Agent Toolkit
+# Copyright (C) 2010,2011 Flumotion Services, S.A.
+# All rights reserved.
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# See "LICENSE.GPL" in the source distribution for more information.
+
+# Headers in this file shall remain intact.
+# -*- coding: utf-8 -*-
+# -*- Mode: Python -*-
+# vi:si:et:sw=4:sts=4:ts=4
+import resource
+import sys
+
+from feat.common import defer, log
+from feat.process import base
+
+from . import common
+
+
+CHILD = """
+import sys
+chunk = 'x' * 65535 + '\\n'
+for _ in range(16):
+    sys.stdout.write(chunk)
+sys.stdout.write('process is rea')
+sys.stdout.flush()
+sys.stdout.write('dy\\n')
+for _ in range(%d):
+    sys.stdout.write(chunk)
+    sys.stderr.write(chunk)
+"""
+
+
+class ChattyProcess(base.Base):
+
+    def initiate(self, chunks):
+        self.command = sys.executable
+        self.args = ['-c', CHILD % chunks]
+        self.env = {}
+        self.checked = 0
+
+    def started_test(self):
+        buffer = self._control.out_buffer
+        self.checked = max(self.checked, len(buffer))
+        return "process is ready" in buffer
+
+
+class DummyOwner(log.LogProxy, log.Logger):
+
+    def __init__(self, logger):
+        log.LogProxy.__init__(self, logger)
+        log.Logger.__init__(self, logger)
+        self.ready = []
+
+    def started_test(self):
+        return "ready" in self.control.out_buffer
+
+    def on_ready(self, out_buffer):
+        self.ready.append(out_buffer)
+
+
+class TestOutputBuffer(common.TestCase):
+
+    def testKeepsTail(self):
+        buf = base.OutputBuffer(10)
+        self.assertEqual("", buf.getvalue())
+        buf.append("abc")
+        buf.append("")
+        buf.append("defgh")
+        self.assertEqual("abcdefgh", buf.getvalue())
+        buf.append("ijkl")
+        self.assertEqual(10, len(buf))
+        self.assertEqual("cdefghijkl", buf.getvalue())
+        buf.append("x" * 25)
+        self.assertEqual("x" * 10, str(buf))
+
+
+class TestControlProtocol(common.TestCase):
+
+    def testSuccessTestOnNewOutput(self):
+        owner = DummyOwner(self)
+        control = base.ControlProtocol(owner, owner.started_test,
+                                       owner.on_ready, output_limit=100)
+        owner.control = control
+
+        for _ in range(100):
+            control.outReceived("z" * 1000)
+            self.assertTrue(len(control.out_buffer)
+                            <= 1000 + base.STARTED_TEST_OVERLAP)
+        control.outReceived("re")
+        self.assertEqual([], owner.ready)
+        control.outReceived("ady")
+        self.assertEqual(1, len(owner.ready))
+        self.assertTrue(owner.ready[0].endswith("zzready"))
+
+        for _ in range(100):
+            control.outReceived("z" * 1000)
+            control.errReceived("e" * 1000)
+        self.assertEqual(1, len(owner.ready))
+        self.assertEqual("", control.out_buffer)
+        self.assertEqual("z" * 100, control.out_tail.getvalue())
+        self.assertEqual("e" * 100, control.err_buffer)
+
+
+class TestProcess(common.TestCase):
+
+    timeout = 60
+
+    @defer.inlineCallbacks
+    def testChattyProcess(self):
+        # 4MiB of output in total
+        yield self.run_chatty(32)
+
+    @common.attr('slow')
+    @defer.inlineCallbacks
+    def testChattyProcessMemory(self):
+        # 1GiB of output in total
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        yield self.run_chatty(8192)
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes
+        self.assertTrue(after - before < 32 * 1024,
+                        "Memory grew by %dkB" % (after - before, ))
+
+    @defer.inlineCallbacks
+    def run_chatty(self, chunks):
+        process = ChattyProcess(self, chunks)
+
+        yield process.restart()
+        self.assertEqual(base.ProcessState.started, process.state)
+        yield process.wait_for_state(base.ProcessState.finished)
+
+        control = process._control
+        self.assertTrue(process.checked
+                        < 2 * 65536 + base.STARTED_TEST_OVERLAP)
+        self.assertEqual(base.DEFAULT_OUTPUT_LIMIT, len(control.out_tail))
+        self.assertEqual(base.DEFAULT_OUTPUT_LIMIT, len(control.err_tail))
@@ -0,0 +1,168 @@
+# F3AT - Flumotion Asynchronous Autonomous Agent Toolkit
+# Copyright (C) 2010,2011 Flumotion Services, S.A.
+# All rights reserved.
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# See "LICENSE.GPL" in the source distribution for more information.
+
+# Headers in this file shall remain intact.
+# -*- coding: utf-8 -*-
+# -*- Mode: Python -*-
+# vi:si:et:sw=4:sts=4:ts=4
+import os
+import sys
+import time
+
+from twisted.trial.unittest import SkipTest
+
+from feat.agents.base import descriptor
+from feat.common import defer
+from feat.common.serialization import json
+from feat.process import base, standalone, zygote
+from feat.process.base import DependencyError, ProcessState
+
+from . import common
+
+
+AGENTS = 50
+
+FRESH = """
+import sys
+from feat import everything
+from feat.agents.base import descriptor
+from feat.test import test_process_zygote
+desc = descriptor.Descriptor(doc_id=unicode(sys.argv[1]))
+test_process_zygote.record_spawn(args=sys.argv[1:], descriptors=[desc])
+"""
+
+
+def record_spawn(args, descriptors):
+    '''Entry point of the workers, writes down when it has been reached.'''
+    path = os.path.join(os.environ['ZYGOTE_TEST_DIR'], args[0])
+    with open(path + '.tmp', 'w') as f:
+        f.write(json.serialize([time.time(), args, os.getpid(),
+                                descriptors[0].doc_id]))
+    os.rename(path + '.tmp', path)
+
+
+class Zygote(zygote.Process):
+    '''Runs the template script with the interpreter running the tests.'''
+
+    def initiate(self, *args, **kwargs):
+        zygote.Process.initiate(self, *args, **kwargs)
+        script = base.which(self.command, self.env["PATH"])
+        if script is None:
+            raise DependencyError("No %s script found." % (self.command, ))
+        self.args.insert(0, script)
+        self.command = sys.executable
+
+
+@common.attr('slow', timeout=120)
+class TestZygote(common.TestCase):
+
+    def setUp(self):
+        common.TestCase.setUp(self)
+        bin_dir = os.path.abspath(os.path.join(
+            os.path.curdir, '..', '..', 'bin'))
+        self.env = dict(PYTHONPATH=":".join(sys.path),
+                        PATH=":".join([bin_dir, os.environ["PATH"]]))
+        self._fresh = []
+        self.tempdir = os.path.abspath(self.mktemp())
+        os.makedirs(self.tempdir)
+        try:
+            self.zygote = Zygote(
+                self, spares=4, modules=['feat.test.test_process_zygote'],
+                entry='feat.test.test_process_zygote.record_spawn',
+                env=self.env)
+        except DependencyError:
+            raise SkipTest("No feat-zygote script found.")
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        yield self.zygote.terminate()
+        yield common.TestCase.tearDown(self)
+
+    @defer.inlineCallbacks
+    def testSpawning(self):
+        self.assertFalse(self.zygote.can_spawn('feat'))
+        yield self.zygote.restart()
+        self.assertTrue(self.zygote.can_spawn('feat'))
+        self.assertTrue(self.zygote.can_spawn('/usr/bin/feat'))
+        self.assertFalse(self.zygote.can_spawn('feat-service'))
+
+        forked = yield self._spawn_agents('forked', self._spawn_forked)
+        fresh = yield self._spawn_agents('fresh', self._spawn_fresh)
+
+        pids = set(pid for _, _, pid, _ in forked.itervalues())
+        self.assertEqual(AGENTS, len(pids))
+        self.assertFalse(self.zygote._process.pid in pids)
+        for name, (_, args, _, doc_id) in forked.iteritems():
+            self.assertEqual(name, doc_id)
+            self.assertEqual([name, '-X'], args)
+
+        forked_avg = self._average(forked)
+        fresh_avg = self._average(fresh)
+        self.info("Time from spawn request to entry point for %d agents: "
+                  "%.4fs forked from the zygote, %.4fs in new processes",
+                  AGENTS, forked_avg, fresh_avg)
+        self.assertTrue(forked_avg < fresh_avg)
+
+    @defer.inlineCallbacks
+    def testTerminate(self):
+        yield self.zygote.restart()
+        yield self.zygote.terminate()
+        self.assertTrue(self.zygote._cmp_state(ProcessState.finished))
+        self.assertFalse(self.zygote.can_spawn('feat'))
+
+    ### private ###
+
+    def _spawn_forked(self, name, env):
+        desc = descriptor.Descriptor(doc_id=unicode(name))
+        self.zygote.spawn('feat', [name, '-X'], env, desc)
+
+    def _spawn_fresh(self, name, env):
+        p = standalone.Process(self, sys.executable,
+                               ['-c', FRESH, name], env)
+        p.restart()
+        self._fresh.append(p)
+
+    @defer.inlineCallbacks
+    def _spawn_agents(self, prefix, spawn):
+        env = dict(self.env, ZYGOTE_TEST_DIR=self.tempdir)
+        self._requested = dict()
+        for index in range(AGENTS):
+            name = "%s_%d" % (prefix, index)
+            self._requested[name] = time.time()
+            spawn(name, env)
+        yield self.wait_for(self._all_recorded, 60, freq=0.1)
+        for p in self._fresh:
+            yield p.wait_for_state(ProcessState.finished, ProcessState.failed)
+        defer.returnValue(self._read_records())
+
+    def _all_recorded(self):
+        files = os.listdir(self.tempdir)
+        return all(name in files for name in self._requested)
+
+    def _read_records(self):
+        records = dict()
+        for name, requested in self._requested.iteritems():
+            with open(os.path.join(self.tempdir, name)) as f:
+                reached, args, pid, doc_id = json.unserialize(f.read())
+            records[name] = (reached - requested, args, pid, doc_id)
+        return records
+
+    def _average(self, records):
+        return sum(r[0] for r in records.itervalues()) / len(records)
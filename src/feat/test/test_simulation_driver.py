@@ -23,6 +23,7 @@
 # vi:si:et:sw=4:sts=4:ts=4
 from twisted.internet import defer
 
+from feat.common import time
 from feat.common.text_helper import format_block
 from feat.test import common
 from feat.simulation import driver
@@ -79,6 +80,78 @@ class TestDriver(common.TestCase):
         self.assertIsInstance(agent.agent, common.DummyAgent)
         self.assertCalled(agent.agent, 'initiate', times=1)
 
+    @defer.inlineCallbacks
+    def testWaitForIdle(self):
+        # the full check is too late for the test to pass, the agents have
+        # to report they became idle
+        self.driver.idle_recheck = 10
+        test = format_block("""
+        agency = spawn_agency()
+        agency.disable_protocol('setup-monitoring', 'Task')
+        agency.start_agent(descriptor_factory('descriptor'))
+        """)
+        d = self.cb_after(None, self.driver._parser, 'on_finish')
+        self.driver.process(test)
+        yield d
+
+        yield self.driver.wait_for_idle(1)
+        self.assertTrue(self.driver.is_idle())
+        self.assertTrue(self.driver.are_agents_idle())
+
+        ag = self.driver._agencies[0]
+        agent = ag._agents[0]
+        agent_id = agent.get_descriptor().doc_id
+        self.assertIs(ag, self.driver.find_agency(agent_id))
+        self.assertIs(None, self.driver.find_agency('unknown'))
+
+    @defer.inlineCallbacks
+    def testWaitForIdleUnreportedActivity(self):
+        self.driver.idle_recheck = 0.5
+        test = format_block("""
+        agency = spawn_agency()
+        agency.disable_protocol('setup-monitoring', 'Task')
+        agency.start_agent(descriptor_factory('descriptor'))
+        """)
+        d = self.cb_after(None, self.driver._parser, 'on_finish')
+        self.driver.process(test)
+        yield d
+        yield self.driver.wait_for_idle(1)
+
+        ag = self.driver._agencies[0]
+        agent = ag._agents[0]
+        # the agent stops reporting its activity
+        ag.notify_activity = lambda medium: None
+        fired = []
+        agent.call_later(0.1, fired.append, True)
+
+        yield self.driver.wait_for_idle(1)
+        self.assertEqual([True], fired)
+        self.assertTrue(self.driver.are_agents_idle())
+
+    @defer.inlineCallbacks
+    def testVirtualTime(self):
+        test = format_block("""
+        agency = spawn_agency()
+        agency.disable_protocol('setup-monitoring', 'Task')
+        agency.start_agent(descriptor_factory('descriptor'))
+        """)
+        d = self.cb_after(None, self.driver._parser, 'on_finish')
+        self.driver.process(test)
+        yield d
+        yield self.driver.wait_for_idle(1)
+
+        time.virtualize()
+        self.addCleanup(time.reset)
+        agent = self.driver._agencies[0]._agents[0]
+        start = time.time()
+        fired = []
+        agent.call_later(3600, fired.append, True)
+        self.assertFalse(self.driver.is_idle())
+
+        yield self.driver.wait_for_idle(7200)
+        self.assertEqual([True], fired)
+        self.assertTrue(start + 3600 <= time.time() < start + 7200)
+
     def testBreakpoints(self):
 
         def asserts1(_):
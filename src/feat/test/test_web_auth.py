@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# -*- Mode: Python -*-
+# vi:si:et:sw=4:sts=4:ts=4
+
+# F3AT - Flumotion Asynchronous Autonomous Agent Toolkit
+# Copyright (C) 2010,2011 Flumotion Services, S.A.
+# All rights reserved.
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# Headers in this file shall remain intact.
+from twisted.web import client
+
+from feat.common import defer, time
+from feat.web import auth, webserver
+
+from feat.test import common
+from feat.test.test_web_webserver import DummyResource
+
+
+class TestBasicAuthenticator(common.TestCase):
+
+    def authenticate(self, authenticator, username, password):
+        header = auth.BasicHTTPCredentials(username, password).header_value
+        cred = auth.BasicHTTPCredentials.from_header_value(header)
+        return authenticator.authenticate(None, cred, None)
+
+    def testHashedPasswords(self):
+        hashed = auth.hash_password("secret")
+        self.assertFalse("secret" in hashed)
+        self.assertNotEqual(hashed, auth.hash_password("secret"))
+        self.assertTrue(auth.check_password("secret", hashed))
+        self.assertFalse(auth.check_password("Secret", hashed))
+        self.assertFalse(auth.check_password("", hashed))
+
+        authen = auth.BasicAuthenticator("test", {"user": "secret"})
+        self.assertFalse("secret" in authen._users["user"])
+        cred = self.authenticate(authen, "user", "secret")
+        self.assertTrue(auth.IBasicHTTPCredentials.providedBy(cred))
+        chal = self.authenticate(authen, "user", "bad")
+        self.assertTrue(auth.IBasicHTTPChallenge.providedBy(chal))
+        chal = self.authenticate(authen, "unknown", "secret")
+        self.assertTrue(auth.IBasicHTTPChallenge.providedBy(chal))
+        chal = authen.authenticate(None, None, None)
+        self.assertTrue(auth.IBasicHTTPChallenge.providedBy(chal))
+
+        authen = auth.BasicAuthenticator("test", {"user": hashed},
+                                         hashed=True)
+        cred = self.authenticate(authen, "user", "secret")
+        self.assertTrue(auth.IBasicHTTPCredentials.providedBy(cred))
+
+    def testFallbacks(self):
+        # used with Python 2.6, checked against the published test vectors
+        self.assertEqual("120fb6cffcf8b32c43e7225256c4f837"
+                         "a86548c92ccc35480805987cb70be17b",
+                         auth._pbkdf2_sha("sha256", "password", "salt",
+                                          1).encode("hex"))
+        self.assertEqual("c5e478d59288c841aa530db6845c4c8d"
+                         "962893a001ce4e11a4963873aa98134a",
+                         auth._pbkdf2_sha("sha256", "password", "salt",
+                                          4096).encode("hex"))
+        self.assertTrue(auth._compare_strings("abc", "abc"))
+        self.assertFalse(auth._compare_strings("abc", "abd"))
+        self.assertFalse(auth._compare_strings("abc", "ab"))
+
+    def testCache(self):
+        users = {"user1": "pass1", "user2": "pass2", "user3": "pass3"}
+        authen = auth.BasicAuthenticator("test", users, size=2)
+        hashes = authen._users
+
+        self.authenticate(authen, "user1", "pass1")
+        self.authenticate(authen, "user1", "bad")
+        self.assertEqual(1, len(authen._authenticated))
+
+        # authenticated headers do not need the password to be checked
+        authen._users = {}
+        cred = self.authenticate(authen, "user1", "pass1")
+        self.assertTrue(auth.IBasicHTTPCredentials.providedBy(cred))
+        authen._users = hashes
+
+        self.authenticate(authen, "user2", "pass2")
+        self.authenticate(authen, "user3", "pass3")
+        self.assertEqual(2, len(authen._authenticated))
+        authen._users = {}
+        # user1 was the first authenticated
+        chal = self.authenticate(authen, "user1", "pass1")
+        self.assertTrue(auth.IBasicHTTPChallenge.providedBy(chal))
+        cred = self.authenticate(authen, "user2", "pass2")
+        self.assertTrue(auth.IBasicHTTPCredentials.providedBy(cred))
+
+        # expired entries are checked again
+        for header in authen._authenticated:
+            authen._authenticated[header] = time.time() - 1
+        chal = self.authenticate(authen, "user2", "pass2")
+        self.assertTrue(auth.IBasicHTTPChallenge.providedBy(chal))
+
+    def testDisabledCache(self):
+        authen = auth.BasicAuthenticator("test", {"user": "pass"}, size=0)
+        self.authenticate(authen, "user", "pass")
+        self.assertEqual(0, len(authen._authenticated))
+        authen = auth.BasicAuthenticator("test", {"user": "pass"}, ttl=0)
+        self.authenticate(authen, "user", "pass")
+        authen._users = {}
+        chal = self.authenticate(authen, "user", "pass")
+        self.assertTrue(auth.IBasicHTTPChallenge.providedBy(chal))
+
+
+class TestAuthenticationLoad(common.TestCase):
+
+    requests = 200
+
+    @defer.inlineCallbacks
+    def testLoad(self):
+        cached = yield self.load(auth.DEFAULT_CACHE_TTL)
+        uncached = yield self.load(0)
+        self.info("%d authenticated requests served in %.3fs, "
+                  "%.3fs without caching", self.requests, cached, uncached)
+
+    @defer.inlineCallbacks
+    def load(self, ttl):
+        authen = auth.BasicAuthenticator("test", {"user": "test"}, ttl=ttl)
+        root = DummyResource(authenticator=authen, render_content="AUTH",
+                             render_delay=0)
+        server = webserver.Server(0, root)
+        yield server.initiate()
+        try:
+            url = "http://127.0.0.1:%d/" % (server.port, )
+            cred = auth.BasicHTTPCredentials("user", "test")
+            headers = {"authorization": cred.header_value.strip()}
+
+            start = time.time()
+            for _ in xrange(self.requests):
+                page = yield client.getPage(url, headers=headers)
+                self.assertEqual("AUTH", page)
+            defer.returnValue(time.time() - start)
+        finally:
+            yield server.cleanup()
@@ -23,6 +23,8 @@
 # -*- coding: UTF-8 -*-
 # vi:si:et:sw=4:sts=4:ts=4
 
+import time
+
 from feat.test import common, common_document
 
 from feat.common import defer
@@ -533,3 +535,48 @@ class TestDocuments(common.TestCase):
                       "utf8", bird_xml_utf8)
 
         return d
+
+    def testLookupCache(self):
+        human = Human(u"Boris", 666000)
+        self.register_config()
+
+        writer = self.registry.lookup_writer(CONFIG_MIME, human)
+        self.assertTrue(isinstance(writer, document.BaseWriterWrapper))
+        self.assertIs(writer, self.registry.lookup_writer(CONFIG_MIME,
+                                                          Human(u"X", 1)))
+        reader = self.registry.lookup_reader(CONFIG_MIME, IHuman)
+        self.assertTrue(isinstance(reader, document.BaseReaderWrapper))
+        self.assertIs(reader, self.registry.lookup_reader(CONFIG_MIME,
+                                                          IHuman))
+
+        # misses are cached too, but registering invalidates the cache
+        self.assertIs(None, self.registry.lookup_writer(XML_MIME, human))
+        self.assertIs(None, self.registry.lookup_reader(XML_MIME, IHuman))
+        self.register_xml()
+        self.assertIsNot(None, self.registry.lookup_writer(XML_MIME, human))
+        self.assertIsNot(None, self.registry.lookup_reader(XML_MIME, IHuman))
+        self.assertIs(writer, self.registry.lookup_writer(CONFIG_MIME,
+                                                          human))
+
+    def testLookupBenchmark(self):
+        lookups = 20000
+        samples = [Human(u"Boris", 666000), Bat(u"Bob", True),
+                   Bird(u"Tweety", True, False)]
+        self.register_all()
+
+        def lookup(uncached):
+            start = time.time()
+            for index in xrange(lookups):
+                if uncached:
+                    self.registry._writers.clear()
+                    self.registry._readers.clear()
+                obj = samples[index % 3]
+                self.registry.lookup_writer(XML_MIME, obj)
+                self.registry.lookup_reader(CONFIG_MIME, IMammal)
+            return (time.time() - start) / lookups * 1000000
+
+        uncached = lookup(True)
+        cached = lookup(False)
+        self.info("Writer and reader lookup: %.2fus cached, %.2fus uncached",
+                  cached, uncached)
+        self.assertTrue(cached < uncached)
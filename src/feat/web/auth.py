@@ -19,13 +19,23 @@
 # See "LICENSE.GPL" in the source distribution for more information.
 
 # Headers in this file shall remain intact.
-import weakref
+import hashlib
+import hmac
+import os
 
 from zope.interface import Interface, Attribute, implements
 
+from feat.common import container, time
 from feat.web import http
 
 
+# Seconds an authenticated header is trusted without checking the password
+DEFAULT_CACHE_TTL = 300
+# Maximum number of authenticated headers remembered
+DEFAULT_CACHE_SIZE = 1024
+HASH_ITERATIONS = 10000
+
+
 ### Interfaces ###
 
 
@@ -126,12 +136,13 @@ class BasicHTTPCredentials(object):
             raise http.InternalServerError("Invalid Authentication Data")
         decoded = parts[1].strip().decode("base64")
         username, password = decoded.split(':', 1)
-        return cls(username, password)
+        return cls(username, password, header)
 
-    def __init__(self, username, password):
+    def __init__(self, username, password, header=None):
         self._username = username
         self._password = password
-
+        # Raw value of the header the credentials were parsed from
+        self._header = header
 
     ### IHTTPCredentials ###
 
@@ -141,8 +152,10 @@ class BasicHTTPCredentials(object):
 
     @property
     def header_value(self):
-        creds = "%s:%s" % (self._username, self._password)
-        return "Basic %s" % creds.encode("base64")
+        if self._header is None:
+            creds = "%s:%s" % (self._username, self._password)
+            self._header = "Basic %s" % creds.encode("base64")
+        return self._header
 
     @property
     def username(self):
@@ -171,48 +184,123 @@ class BasicHTTPCredentials(object):
 
 
 class BaseAuthenticator(object):
+    """
+    Remembers the authorization headers of authenticated credentials
+    for ttl seconds, up to size of them, the oldest are forgotten first.
+    """
 
-    def __init__(self):
-        self._credentials = weakref.WeakKeyDictionary()
+    def __init__(self, ttl=DEFAULT_CACHE_TTL, size=DEFAULT_CACHE_SIZE):
+        self._ttl = ttl
+        self._size = size
+        # {HEADER_VALUE: EXPIRATION_TIME}
+        self._authenticated = container.OrderedDict()
 
     ### protected ###
 
     def is_authenticated(self, credentials):
-        return (IBasicHTTPCredentials.providedBy(credentials)
-                and IBasicHTTPCredentials(credentials) in self._credentials)
+        expiration = self._authenticated.get(credentials.header_value)
+        return expiration is not None and expiration > time.time()
 
     def _add_authenticated(self, credentials):
-        self._credentials[IBasicHTTPCredentials(credentials)] = True
+        if self._size <= 0:
+            return
+        header = credentials.header_value
+        self._authenticated.pop(header, None)
+        self._authenticated[header] = time.time() + self._ttl
+        while len(self._authenticated) > self._size:
+            self._authenticated.popitem(last=False)
 
 
 class BasicAuthenticator(BaseAuthenticator):
+    """
+    Authenticates the users of a dictionary {USERNAME: PASSWORD}.
+    Only the hashes of the passwords are kept, if hashed is True
+    the dictionary values are already the result of L{hash_password}.
+    """
 
     implements(IAuthenticator)
 
-    def __init__(self, realm, users):
-        BaseAuthenticator.__init__(self)
+    def __init__(self, realm, users, hashed=False,
+                 ttl=DEFAULT_CACHE_TTL, size=DEFAULT_CACHE_SIZE):
+        BaseAuthenticator.__init__(self, ttl=ttl, size=size)
+        if not hashed:
+            users = dict((u, hash_password(p)) for u, p in users.iteritems())
         self._users = users
         self._challenge = BasicHTTPChallenge(realm)
 
     ### IAuthenticator ###
 
     def authenticate(self, request, credentials, location):
-        if self.is_authenticated(credentials):
-            return credentials
-
         if not IBasicHTTPCredentials.providedBy(credentials):
             return self._challenge
 
-        credentials = IBasicHTTPCredentials(credentials)
-        username = credentials.username
-        password = credentials.password
+        if self.is_authenticated(credentials):
+            return credentials
 
-        if username not in self._users:
+        hashed = self._users.get(credentials.username)
+        if hashed is None:
             return self._challenge
 
-        if self._users[username] != password:
+        if not check_password(credentials.password, hashed):
             return self._challenge
 
         self._add_authenticated(credentials)
 
         return credentials
+
+
+### Functions ###
+
+
+def hash_password(password, salt=None):
+    """Returns a salted hash of the password suitable
+    for L{check_password} and L{BasicAuthenticator}."""
+    if isinstance(password, unicode):
+        password = password.encode("utf8")
+    if salt is None:
+        salt = os.urandom(8).encode("hex")
+    digest = _pbkdf2_hmac("sha256", password, salt, HASH_ITERATIONS)
+    return "%s$%s" % (salt, digest.encode("hex"))
+
+
+def check_password(password, hashed):
+    """Checks a password against a hash created by L{hash_password},
+    the comparison takes the same time wherever the hashes differ."""
+    salt, _ = hashed.split("$", 1)
+    return _compare_digest(hash_password(password, salt), hashed)
+
+
+### private ###
+
+
+def _pbkdf2_sha(hash_name, password, salt, iterations):
+    # PBKDF2 deriving a key of the size of the digest, a single block
+    mac = hmac.new(password, None, getattr(hashlib, hash_name))
+    size = mac.digest_size
+
+    def prf(data):
+        h = mac.copy()
+        h.update(data)
+        return h.digest()
+
+    block = prf(salt + "\x00\x00\x00\x01")
+    result = long(block.encode("hex"), 16)
+    for _ in xrange(iterations - 1):
+        block = prf(block)
+        result ^= long(block.encode("hex"), 16)
+    return ("%0*x" % (size * 2, result)).decode("hex")
+
+
+def _compare_strings(a, b):
+    # takes the same time wherever the strings differ
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+
+# Python 2.6 provides neither of them
+_pbkdf2_hmac = getattr(hashlib, "pbkdf2_hmac", _pbkdf2_sha)
+_compare_digest = getattr(hmac, "compare_digest", _compare_strings)
@@ -236,6 +236,10 @@ class Registry(object):
 
     def __init__(self):
         self._registry = zope_adapter.AdapterRegistry()
+        # {(PROVIDED_SPEC, MIME_TYPE): WRITER_WRAPPER or None}
+        self._writers = {}
+        # {(IFACE, MIME_TYPE): READER_WRAPPER or None}
+        self._readers = {}
 
     def register_writer(self, writer, mime_type, iface):
         writer = IWriter(writer)
@@ -243,9 +247,13 @@ class Registry(object):
             # To support adapted function
             assert (writer.registry is None) or (writer.registry is self)
             writer.registry = self
+            wrapper = writer
+        else:
+            wrapper = (self.writer_wrapper or WriterWrapper)(self, writer)
 
         self._registry.register([iface], IWritableDocument,
-                                mime_type, writer)
+                                mime_type, wrapper)
+        self._writers.clear()
         return writer
 
     def register_reader(self, reader, mime_type, iface):
@@ -254,34 +262,34 @@ class Registry(object):
             # To support adapted function
             assert (reader.registry is None) or (reader.registry is self)
             reader.registry = self
+            wrapper = reader
+        else:
+            wrapper = (self.reader_wrapper or ReaderWrapper)(self, reader)
 
         self._registry.register([IReadableDocument], iface,
-                                mime_type, reader)
+                                mime_type, wrapper)
+        self._readers.clear()
         return reader
 
     def lookup_writer(self, mime_type, obj):
-        req = providedBy(obj)
-        writer = self._registry.lookup((req, ), IWritableDocument, mime_type)
-        if writer is None:
-            return
-
-        if not isinstance(writer, BaseWriterWrapper):
-            wrapper = self.writer_wrapper or WriterWrapper
-            writer = wrapper(self, writer)
-
-        return writer
+        key = (providedBy(obj), mime_type)
+        try:
+            return self._writers[key]
+        except KeyError:
+            writer = self._registry.lookup(key[:1], IWritableDocument,
+                                           mime_type)
+            self._writers[key] = writer
+            return writer
 
     def lookup_reader(self, mime_type, iface):
-        global _adapter_registry
-        reader = self._registry.lookup1(IReadableDocument, iface, mime_type)
-        if reader is None:
-            return
-
-        if not isinstance(reader, BaseReaderWrapper):
-            wrapper = self.reader_wrapper or ReaderWrapper
-            reader = wrapper(self, reader)
-
-        return reader
+        key = (iface, mime_type)
+        try:
+            return self._readers[key]
+        except KeyError:
+            reader = self._registry.lookup1(IReadableDocument, iface,
+                                            mime_type)
+            self._readers[key] = reader
+            return reader
 
     def read(self, document, iface, *args, **kwargs):
         """